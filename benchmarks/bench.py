@@ -0,0 +1,362 @@
+"""
+Python3 -- Benchmarks of the migration scripts against a local mock Gitlab server
+
+Every benchmark starts its own mock_gitlab.py process (so the server does not share
+the GIL of the client) & prints one line per measured configuration.
+
+Usage: python3 benchmarks/bench.py [variables|polling|transfer|batch|all] [--quick] [--json PATH]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIRECTORY), "scripts"))
+
+import batch  # noqa: E402
+import gitlab  # noqa: E402
+import gitlab_async  # noqa: E402
+import logs  # noqa: E402
+import metrics  # noqa: E402
+import polling  # noqa: E402
+import ratelimit  # noqa: E402
+import session as http  # noqa: E402
+import transfer  # noqa: E402
+
+
+TOKEN = "benchmark-token"
+# The mock server has no per endpoint limits, only the optional --rate_limit
+BENCH_LIMITS = {name: (1000, 1) for name in ratelimit.DEFAULT_LIMITS}
+RESULTS = []
+
+
+@contextmanager
+def mock_gitlab(**options):
+    """
+    Function to run a mock Gitlab server for the duration of a benchmark
+    @return: {str} URL of the server
+    """
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARKS_DIRECTORY, "mock_gitlab.py")]
+        + [f"--{name}={value}" for name, value in options.items()],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        yield process.stdout.readline().strip()
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def new_api(server_url: str, pool_size: int = 10, **options):
+    """
+    Function to build a gitlab.API on a fresh session & metrics registry
+    @return: gitlab.API
+    """
+    metrics.REGISTRY = metrics.METRICS()
+    return gitlab.API(
+        server_url,
+        "1",
+        "2",
+        TOKEN,
+        False,
+        http.SESSION(
+            pool_size, scheduler=ratelimit.SCHEDULER(BENCH_LIMITS, backoff=0.1)
+        ),
+        **options,
+    )
+
+
+def new_async_api(server_url: str, pool_size: int = 10, **options):
+    """
+    Function to build a gitlab_async.ASYNC_API on a fresh metrics registry
+    @return: gitlab_async.ASYNC_API
+    """
+    metrics.REGISTRY = metrics.METRICS()
+    return gitlab_async.ASYNC_API(
+        server_url,
+        TOKEN,
+        False,
+        pool_size,
+        scheduler=ratelimit.SCHEDULER(BENCH_LIMITS, backoff=0.1),
+        **options,
+    )
+
+
+def counter(name: str):
+    """
+    Function to sum a counter of the current metrics registry over its labels
+    @return: float
+    """
+    return sum(
+        value
+        for (counter_name, _), value in metrics.REGISTRY.counters.items()
+        if counter_name == name
+    )
+
+
+def report(benchmark: str, configuration: str, **results):
+    """
+    Function to print & keep the results of one measured configuration
+    """
+    RESULTS.append({"benchmark": benchmark, "configuration": configuration, **results})
+    print(
+        f"{benchmark:<10} {configuration:<34} "
+        + "  ".join(
+            f"{name}={value:.2f}" if isinstance(value, float) else f"{name}={value}"
+            for name, value in results.items()
+        ),
+        flush=True,
+    )
+
+
+def bench_variables(quick: bool):
+    """
+    Function to measure the variables written per second, by engine & concurrency,
+    with & without a server rate limit
+    """
+    count = 200 if quick else 1000
+    for rate_limit in [0, 100]:
+        for concurrency in [1, 8, 32]:
+            for engine in ["threads", "asyncio"]:
+                if engine == "asyncio" and gitlab_async.aiohttp is None:
+                    continue
+                with mock_gitlab(
+                    variables=count,
+                    empty_projects=1,
+                    latency=0.005,
+                    rate_limit=rate_limit,
+                ) as server_url:
+                    source_url = f"{server_url}/api/v4/projects/1/variables"
+                    destination_url = f"{server_url}/api/v4/projects/2/variables"
+                    headers = {"PRIVATE-TOKEN": TOKEN}
+                    started_at = time.monotonic()
+                    if engine == "threads":
+                        api = new_api(server_url, concurrency + 1)
+                        failures = api.migrate_variables(
+                            api.copy_source_variables(source_url, headers),
+                            destination_url,
+                            headers,
+                            concurrency,
+                        )
+                    else:
+
+                        async def run():
+                            async with new_async_api(
+                                server_url, concurrency + 1
+                            ) as api:
+                                return await api.migrate_variables(
+                                    api.copy_source_variables(source_url, headers),
+                                    destination_url,
+                                    headers,
+                                    concurrency,
+                                )
+
+                        failures = asyncio.run(run())
+                    elapsed = time.monotonic() - started_at
+                report(
+                    "variables",
+                    f"{engine} c={concurrency} limit={rate_limit or 'none'}/s",
+                    variables_per_second=count / elapsed,
+                    seconds=elapsed,
+                    failures=len(failures),
+                    retries=int(counter("http_retries_total")),
+                )
+
+
+def bench_polling(quick: bool):
+    """
+    Function to measure how late an export is noticed & how many status checks it
+    costs, by polling policy, then the overhead of many exports polled at once
+    """
+    export_delay = 3 if quick else 10
+    for first_delay, max_delay in [(1, 60), (0.25, 5), (2, 30)]:
+        with mock_gitlab(export_delay=export_delay) as server_url:
+            api = new_api(
+                server_url,
+                poller=polling.POLLER(first_delay, max_delay),
+            )
+            started_at = time.monotonic()
+            api.start_export("1")
+            api.finish_export("1")
+            elapsed = time.monotonic() - started_at
+        report(
+            "polling",
+            f"first={first_delay}s max={max_delay}s",
+            overshoot_seconds=elapsed - export_delay,
+            polls=int(counter("polls_total")),
+        )
+
+    projects = 50 if quick else 300
+    for engine in ["threads", "asyncio"]:
+        if engine == "asyncio" and gitlab_async.aiohttp is None:
+            continue
+        with mock_gitlab(projects=projects, export_delay=export_delay) as server_url:
+            started_at = time.monotonic()
+            if engine == "threads":
+                api = new_api(server_url, 50, poller=polling.POLLER(0.5, 2))
+
+                def export(project_id: str):
+                    api.start_export(project_id)
+                    api.finish_export(project_id)
+
+                for _, future in gitlab.bounded_map(
+                    export, [str(i + 1) for i in range(projects)], projects
+                ):
+                    future.result()
+            else:
+
+                async def run():
+                    async with new_async_api(
+                        server_url, 50, poller=polling.POLLER(0.5, 2)
+                    ) as api:
+                        await asyncio.gather(
+                            *(api.finish_export(str(i + 1)) for i in range(projects))
+                        )
+
+                asyncio.run(run())
+            elapsed = time.monotonic() - started_at
+        report(
+            "polling",
+            f"{engine} {projects} exports at once",
+            overshoot_seconds=elapsed - export_delay,
+            polls=int(counter("polls_total")),
+        )
+
+
+def bench_transfer(quick: bool):
+    """
+    Function to measure the download & upload throughput of an archive, by chunk size
+    """
+    archive_mib = 64 if quick else 512
+    for chunk_mib in [1, 4, 16]:
+        with mock_gitlab(
+            archive_mib=archive_mib
+        ) as server_url, tempfile.TemporaryDirectory() as directory:
+            api = new_api(server_url, chunk_size=chunk_mib * transfer.MIB)
+            started_at = time.monotonic()
+            file_path = api.download_from_url(
+                f"{server_url}/api/v4/projects/1/export/download", directory, "1.tar.gz"
+            )
+            download_seconds = time.monotonic() - started_at
+            started_at = time.monotonic()
+            api.verify_api(api.request_import("imported", "", file_path), "import")
+            upload_seconds = time.monotonic() - started_at
+        report(
+            "transfer",
+            f"{archive_mib} MiB chunk={chunk_mib} MiB",
+            download_mib_per_second=archive_mib / download_seconds,
+            upload_mib_per_second=archive_mib / upload_seconds,
+        )
+
+
+def bench_batch(quick: bool):
+    """
+    Function to measure the makespan of a batch migration, by engine & workers
+    """
+    projects = 8 if quick else 40
+    delay = 2 if quick else 5
+    jobs = [
+        {
+            "key": f"{i + 1}->group/project-{i + 1}",
+            "source_project_id": str(i + 1),
+            "path_import": f"group/project-{i + 1}",
+            "destination_project_id": "",
+            "migrate_project": True,
+            "migrate_variables": False,
+        }
+        for i in range(projects)
+    ]
+    for workers in [1, 4, 16]:
+        for engine in ["threads", "asyncio"]:
+            if engine == "asyncio" and gitlab_async.aiohttp is None:
+                continue
+            with mock_gitlab(
+                projects=projects,
+                export_delay=delay,
+                import_delay=delay,
+                archive_mib=16,
+            ) as server_url, tempfile.TemporaryDirectory() as directory:
+                os.chdir(directory)
+                stage_workers = {stage: workers for stage in gitlab_async.BATCH_STAGES}
+                started_at = time.monotonic()
+                poller = polling.POLLER(0.5, 2)
+                if engine == "threads":
+                    api = new_api(server_url, workers * 4, poller=poller)
+                    failed = batch.BATCH(api, TOKEN, workers=stage_workers).run(
+                        [dict(job) for job in jobs]
+                    )
+                else:
+
+                    async def run():
+                        async with new_async_api(
+                            server_url, workers * 4, poller=poller
+                        ) as api:
+                            return await api.run_batch(
+                                [dict(job) for job in jobs], stage_workers, None
+                            )
+
+                    failed = asyncio.run(run())
+                elapsed = time.monotonic() - started_at
+                os.chdir(BENCHMARKS_DIRECTORY)
+            report(
+                "batch",
+                f"{engine} {projects} projects workers={workers}",
+                makespan_seconds=elapsed,
+                failed=len(failed),
+            )
+
+
+BENCHMARKS = {
+    "variables": bench_variables,
+    "polling": bench_polling,
+    "transfer": bench_transfer,
+    "batch": bench_batch,
+}
+
+
+def parse_args():
+    """
+    Function to parse arguements from the CLI
+    @return: list
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "benchmarks", nargs="*", choices=list(BENCHMARKS) + ["all"], default=["all"]
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="Smaller workloads, to check the harness itself",
+    )
+    parser.add_argument(
+        "--json", metavar="PATH", default="", help="Also write the results as JSON"
+    )
+    parser.add_argument(
+        "-D", "--debug", action="store_true", help="Keep the scripts' own logs"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logs.setup(args.debug).setLevel(logging.DEBUG if args.debug else logging.WARNING)
+    names = list(BENCHMARKS) if "all" in args.benchmarks else args.benchmarks
+    for name in names:
+        BENCHMARKS[name](args.quick)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(RESULTS, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,615 @@
+"""
+Python3 -- Local stand-in for the Gitlab API endpoints used by the migration scripts
+
+Simulates variables (paginated), project access tokens, asynchronous export & import
+state machines with configurable delays, large archive downloads (with Range) &
+uploads, and 429 answers once a rate limit is exceeded.
+
+Run standalone: python3 benchmarks/mock_gitlab.py --port 8080 --projects 10
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MIB = 1024 * 1024
+BLOCK = os.urandom(MIB)
+# Every project, imported ones included, holds the same repository
+BRANCHES = {
+    name: hashlib.sha1(name.encode()).hexdigest() for name in ["main", "develop"]
+}
+TAGS = {name: hashlib.sha1(name.encode()).hexdigest() for name in ["v1.0.0"]}
+COMMIT_COUNT = 42
+SETTINGS = [
+    "protected_branches",
+    "protected_tags",
+    "hooks",
+    "deploy_keys",
+    "pipeline_schedules",
+    "approval_rules",
+]
+# Projects holding variables also hold these settings, like a configured project
+SOURCE_SETTINGS = {
+    "protected_branches": [
+        {
+            "name": "main",
+            "push_access_levels": [{"access_level": 40}],
+            "merge_access_levels": [{"access_level": 30}],
+            "allow_force_push": False,
+        }
+    ],
+    "protected_tags": [{"name": "v*", "create_access_levels": [{"access_level": 40}]}],
+    "hooks": [{"url": "https://hooks.example.com/ci", "push_events": True}],
+    "pipeline_schedules": [
+        {
+            "description": "nightly",
+            "ref": "main",
+            "cron": "0 1 * * *",
+            "cron_timezone": "UTC",
+            "active": True,
+            "variables": [{"key": "NIGHTLY", "value": "1", "variable_type": "env_var"}],
+        }
+    ],
+}
+
+
+class MOCK_GITLAB:
+    """In-memory Gitlab state, shared by every request handler thread"""
+
+    def __init__(
+        self,
+        projects: int = 1,
+        variables: int = 0,
+        export_delay: float = 0,
+        import_delay: float = 0,
+        archive_size: int = MIB,
+        rate_limit: float = 0,
+        latency: float = 0,
+        empty_projects: int = 0,
+    ) -> None:
+        """
+        Initiate Mock Gitlab object, `projects` each holding `variables` variables
+        followed by `empty_projects` without any
+        """
+        self.export_delay = export_delay
+        self.import_delay = import_delay
+        self.archive_size = archive_size
+        self.rate_limit = rate_limit
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.projects = {}
+        self.next_id = 1
+        self.next_setting_id = 1
+        for _ in range(projects):
+            project = self.create_project(f"project-{self.next_id}")
+            if variables:
+                for resource, items in SOURCE_SETTINGS.items():
+                    for item in items:
+                        self.add_setting(
+                            project, resource, json.loads(json.dumps(item))
+                        )
+            for index in range(variables):
+                key = f"VARIABLE_{index}"
+                project["variables"][(key, "*")] = {
+                    "variable_type": "env_var",
+                    "key": key,
+                    "value": f"value-{index}",
+                    "protected": False,
+                    "masked": False,
+                    "environment_scope": "*",
+                }
+        for _ in range(empty_projects):
+            self.create_project(f"project-{self.next_id}")
+        self.tokens = float(rate_limit)
+        self.tokens_at = time.monotonic()
+        self.requests = 0
+        self.throttled = 0
+
+    def create_project(self, path: str):
+        """
+        Function to add an empty project
+        @return: dict
+        """
+        with self.lock:
+            project_id = self.next_id
+            self.next_id += 1
+            project = self.projects[project_id] = {
+                "id": project_id,
+                "path": path,
+                "variables": {},
+                "settings": {resource: [] for resource in SETTINGS},
+                "push_rule": None,
+                "access_tokens": [],
+                "export_requested_at": None,
+                "import_requested_at": None,
+                "last_activity_at": "2024-01-01T00:00:00.000Z",
+            }
+        return project
+
+    def add_setting(self, project: dict, resource: str, item: dict):
+        """
+        Function to add an item to a settings list of a project, with a new ID
+        @return: dict
+        """
+        with self.lock:
+            item["id"] = self.next_setting_id
+            self.next_setting_id += 1
+            project["settings"][resource].append(item)
+        return item
+
+    def allow(self):
+        """
+        Function to take a token from the rate limit bucket
+        @return: (allowed, remaining) tuple
+        """
+        with self.lock:
+            self.requests += 1
+            if not self.rate_limit:
+                return True, None
+            now = time.monotonic()
+            self.tokens = min(
+                self.rate_limit, self.tokens + (now - self.tokens_at) * self.rate_limit
+            )
+            self.tokens_at = now
+            if self.tokens < 1:
+                self.throttled += 1
+                return False, 0
+            self.tokens -= 1
+            return True, int(self.tokens)
+
+    @staticmethod
+    def state(requested_at: float, delay: float, steps: list):
+        """
+        Function to walk an export/import through its steps as time passes
+        @return: str
+        """
+        if requested_at is None:
+            return "none"
+        elapsed = time.monotonic() - requested_at
+        if elapsed >= delay:
+            return steps[-1]
+        return steps[int(elapsed / delay * (len(steps) - 1))]
+
+
+class HANDLER(BaseHTTPRequestHandler):
+    """Gitlab API v4 routes of MOCK_GITLAB"""
+
+    protocol_version = "HTTP/1.1"
+    gitlab = None
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status: int, body=None, headers: dict = None):
+        data = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def form(self):
+        body = self.read_body().decode()
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(body or "{}")
+        # Form encoded booleans come back as booleans, like Gitlab stores them
+        return {
+            name: {"True": True, "False": False}.get(value, value)
+            for name, value in urllib.parse.parse_qsl(body)
+        }
+
+    def page(self, items: list, query: dict):
+        """
+        Function to answer one page of a list, with `Link` & `X-Next-Page` headers
+        """
+        page = int(query.get("page", ["1"])[0])
+        per_page = int(query.get("per_page", ["20"])[0])
+        headers = {}
+        if page * per_page < len(items):
+            headers["X-Next-Page"] = str(page + 1)
+            next_query = dict({k: v[0] for k, v in query.items()}, page=page + 1)
+            headers[
+                "Link"
+            ] = f'<http://{self.headers["Host"]}{self.path.split("?")[0]}?{urllib.parse.urlencode(next_query)}>; rel="next"'
+        self.send(200, items[(page - 1) * per_page : page * per_page], headers)
+
+    def route(self, method: str):
+        gitlab = self.gitlab
+        if gitlab.latency:
+            time.sleep(gitlab.latency)
+        allowed, _ = gitlab.allow()
+        if not allowed:
+            self.read_body()
+            self.send(
+                429,
+                {"message": "Retry later"},
+                {
+                    "Retry-After": "1",
+                    "RateLimit-Limit": str(int(gitlab.rate_limit)),
+                    "RateLimit-Remaining": "0",
+                    "RateLimit-Reset": str(int(time.time()) + 1),
+                },
+            )
+            return
+        parsed = urllib.parse.urlsplit(self.path)
+        path, query = parsed.path, urllib.parse.parse_qs(parsed.query)
+        for pattern, methods in ROUTES:
+            match = re.fullmatch(pattern, path)
+            if match and method in methods:
+                return methods[method](self, query, *match.groups())
+        self.read_body()
+        self.send(404, {"message": "404 Not Found"})
+
+    def project(self, project_id: str):
+        project = self.gitlab.projects.get(int(project_id))
+        if project is None:
+            self.read_body()
+            self.send(404, {"message": "404 Project Not Found"})
+        return project
+
+    def get_project(self, query: dict, project_id: str):
+        project = self.project(project_id)
+        if project:
+            self.send(
+                200,
+                {
+                    "id": project["id"],
+                    "path": project["path"],
+                    "last_activity_at": project["last_activity_at"],
+                    "statistics": {
+                        "commit_count": COMMIT_COUNT,
+                        "repository_size": self.gitlab.archive_size,
+                        "lfs_objects_size": 0,
+                        "uploads_size": 0,
+                        "wiki_size": 0,
+                    },
+                },
+            )
+
+    def list_refs(self, query: dict, project_id: str, kind: str):
+        if self.project(project_id):
+            refs = BRANCHES if kind == "branches" else TAGS
+            self.page(
+                [{"name": name, "commit": {"id": sha}} for name, sha in refs.items()],
+                query,
+            )
+
+    def list_variables(self, query: dict, project_id: str):
+        project = self.project(project_id)
+        if project:
+            self.page(list(project["variables"].values()), query)
+
+    def create_variable(self, query: dict, project_id: str):
+        project = self.project(project_id)
+        if project:
+            variable = self.form()
+            key = (variable["key"], variable.get("environment_scope", "*"))
+            if key in project["variables"]:
+                self.send(400, {"message": {"key": ["has already been taken"]}})
+                return
+            project["variables"][key] = variable
+            self.send(201, variable)
+
+    def update_variable(self, query: dict, project_id: str, key: str):
+        project = self.project(project_id)
+        if project:
+            variable = self.form()
+            scope = query.get("filter[environment_scope]", ["*"])[0]
+            project["variables"][(key, scope)] = dict(variable, key=key)
+            self.send(200, variable)
+
+    def delete_variable(self, query: dict, project_id: str, key: str):
+        project = self.project(project_id)
+        if project:
+            scope = query.get("filter[environment_scope]", ["*"])[0]
+            project["variables"].pop((key, scope), None)
+            self.send(204)
+
+    def list_tokens(self, query: dict, project_id: str):
+        project = self.project(project_id)
+        if project:
+            self.page(project["access_tokens"], query)
+
+    def create_token(self, query: dict, project_id: str):
+        project = self.project(project_id)
+        if project:
+            token = dict(
+                self.form(),
+                id=len(project["access_tokens"]) + 1,
+                active=True,
+                token=os.urandom(10).hex(),
+            )
+            project["access_tokens"].append(token)
+            self.send(201, token)
+
+    def revoke_token(self, query: dict, project_id: str, token_id: str):
+        project = self.project(project_id)
+        if project:
+            for token in project["access_tokens"]:
+                if token["id"] == int(token_id):
+                    token["active"] = False
+            self.send(204)
+
+    def token_self(self, query: dict):
+        # Project access tokens are looked up, any other token is the bot's own
+        value = self.headers.get("PRIVATE-TOKEN")
+        for project in list(self.gitlab.projects.values()):
+            for token in project["access_tokens"]:
+                if token["token"] == value:
+                    if not token["active"]:
+                        self.send(401, {"message": "401 Unauthorized"})
+                        return
+                    self.send(200, dict(token, revoked=False))
+                    return
+        self.send(200, {"name": "bot", "active": True, "revoked": False})
+
+    def request_export(self, query: dict, project_id: str):
+        project = self.project(project_id)
+        if project:
+            project["export_requested_at"] = time.monotonic()
+            self.send(202, {"message": "202 Accepted"})
+
+    def export_status(self, query: dict, project_id: str):
+        project = self.project(project_id)
+        if project:
+            status = {
+                "id": project["id"],
+                "export_status": self.gitlab.state(
+                    project["export_requested_at"],
+                    self.gitlab.export_delay,
+                    ["queued", "started", "finished"],
+                ),
+            }
+            if status["export_status"] == "finished":
+                download = f"http://{self.headers['Host']}/api/v4/projects/{project_id}/export/download"
+                status["_links"] = {"api_url": download, "web_url": download}
+            self.send(200, status)
+
+    def download_export(self, query: dict, project_id: str):
+        project = self.project(project_id)
+        if not project:
+            return
+        size = self.gitlab.archive_size
+        # Every export is a new archive, told apart by its ETag
+        etag = f'"{project_id}-{project["export_requested_at"]}"'
+        start = 0
+        match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if match and self.headers.get("If-Range", etag) != etag:
+            match = None
+        if match:
+            start = int(match.group(1))
+            if start >= size:
+                self.send(416, headers={"Content-Range": f"bytes */{size}"})
+                return
+        self.send_response(206 if match else 200)
+        self.send_header("Content-Type", "application/gzip")
+        self.send_header("Content-Length", str(size - start))
+        self.send_header("ETag", etag)
+        if match:
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        self.end_headers()
+        position = start
+        while position < size:
+            offset = position % MIB
+            chunk = BLOCK[offset : offset + min(MIB - offset, size - position)]
+            self.wfile.write(chunk)
+            position += len(chunk)
+
+    def request_import(self, query: dict):
+        remaining = int(self.headers.get("Content-Length") or 0)
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, MIB)))
+        project = self.gitlab.create_project("imported")
+        # Like Gitlab, the import protects the default branch
+        self.gitlab.add_setting(
+            project,
+            "protected_branches",
+            {"name": "main", "push_access_levels": [{"access_level": 40}]},
+        )
+        project["import_requested_at"] = time.monotonic()
+        self.send(201, {"id": project["id"], "import_status": "scheduled"})
+
+    def import_status(self, query: dict, project_id: str):
+        project = self.project(project_id)
+        if project:
+            self.send(
+                200,
+                {
+                    "id": project["id"],
+                    "import_status": self.gitlab.state(
+                        project["import_requested_at"],
+                        self.gitlab.import_delay,
+                        ["scheduled", "started", "finished"],
+                    ),
+                },
+            )
+
+    def list_settings(self, query: dict, project_id: str, resource: str):
+        project = self.project(project_id)
+        if project:
+            self.page(project["settings"][resource], query)
+
+    def create_setting(self, query: dict, project_id: str, resource: str):
+        project = self.project(project_id)
+        if project:
+            item = self.form()
+            if resource == "pipeline_schedules":
+                item.setdefault("variables", [])
+            # Like Gitlab, protected refs answer with lists of access levels
+            for field in [field for field in item if field.endswith("_access_level")]:
+                item[field + "s"] = [{"access_level": item.pop(field)}]
+            self.send(201, self.gitlab.add_setting(project, resource, item))
+
+    def setting(self, project_id: str, resource: str, identity: str):
+        project = self.project(project_id)
+        if project:
+            for item in project["settings"][resource]:
+                if identity in [str(item["id"]), item.get("name")]:
+                    return project, item
+            self.read_body()
+            self.send(404, {"message": "404 Not Found"})
+        return project, None
+
+    def get_setting(self, query: dict, project_id: str, resource: str, identity: str):
+        _, item = self.setting(project_id, resource, urllib.parse.unquote(identity))
+        if item:
+            self.send(200, item)
+
+    def delete_setting(
+        self, query: dict, project_id: str, resource: str, identity: str
+    ):
+        project, item = self.setting(
+            project_id, resource, urllib.parse.unquote(identity)
+        )
+        if item:
+            project["settings"][resource].remove(item)
+            self.send(204)
+
+    def create_schedule_variable(self, query: dict, project_id: str, schedule_id: str):
+        _, schedule = self.setting(project_id, "pipeline_schedules", schedule_id)
+        if schedule:
+            variable = self.form()
+            schedule["variables"].append(variable)
+            self.send(201, variable)
+
+    def get_push_rule(self, query: dict, project_id: str):
+        project = self.project(project_id)
+        if project:
+            self.send(200, project["push_rule"])
+
+    def set_push_rule(self, query: dict, project_id: str):
+        project = self.project(project_id)
+        if project:
+            project["push_rule"] = dict(self.form(), id=project["id"])
+            self.send(201, project["push_rule"])
+
+    def do_GET(self):
+        self.route("GET")
+
+    def do_POST(self):
+        self.route("POST")
+
+    def do_PUT(self):
+        self.route("PUT")
+
+    def do_DELETE(self):
+        self.route("DELETE")
+
+
+PROJECT = r"/api/v4/projects/(\d+)"
+ROUTES = [
+    (PROJECT, {"GET": HANDLER.get_project}),
+    (PROJECT + "/repository/(branches|tags)", {"GET": HANDLER.list_refs}),
+    (
+        PROJECT + f"/({'|'.join(SETTINGS)})",
+        {"GET": HANDLER.list_settings, "POST": HANDLER.create_setting},
+    ),
+    (
+        PROJECT + f"/({'|'.join(SETTINGS)})/([^/]+)",
+        {"GET": HANDLER.get_setting, "DELETE": HANDLER.delete_setting},
+    ),
+    (
+        PROJECT + r"/pipeline_schedules/(\d+)/variables",
+        {"POST": HANDLER.create_schedule_variable},
+    ),
+    (
+        PROJECT + "/push_rule",
+        {
+            "GET": HANDLER.get_push_rule,
+            "POST": HANDLER.set_push_rule,
+            "PUT": HANDLER.set_push_rule,
+        },
+    ),
+    (
+        PROJECT + "/variables",
+        {"GET": HANDLER.list_variables, "POST": HANDLER.create_variable},
+    ),
+    (
+        PROJECT + r"/variables/([^/]+)",
+        {"PUT": HANDLER.update_variable, "DELETE": HANDLER.delete_variable},
+    ),
+    (
+        PROJECT + "/access_tokens",
+        {"GET": HANDLER.list_tokens, "POST": HANDLER.create_token},
+    ),
+    (PROJECT + r"/access_tokens/(\d+)", {"DELETE": HANDLER.revoke_token}),
+    (r"/api/v4/personal_access_tokens/self", {"GET": HANDLER.token_self}),
+    (
+        PROJECT + "/export",
+        {"GET": HANDLER.export_status, "POST": HANDLER.request_export},
+    ),
+    (PROJECT + "/export/download", {"GET": HANDLER.download_export}),
+    (r"/api/v4/projects/import", {"POST": HANDLER.request_import}),
+    (PROJECT + "/import", {"GET": HANDLER.import_status}),
+]
+
+
+def serve(gitlab: MOCK_GITLAB, port: int = 0):
+    """
+    Function to serve `gitlab` from a background thread
+    @return: ThreadingHTTPServer, its URL being http://127.0.0.1:<server.server_port>
+    """
+    handler = type("BOUND_HANDLER", (HANDLER,), {"gitlab": gitlab})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_args():
+    """
+    Function to parse arguements from the CLI
+    @return: list
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--projects", type=int, default=1)
+    parser.add_argument("--variables", type=int, default=0)
+    parser.add_argument("--export_delay", type=float, default=0)
+    parser.add_argument("--import_delay", type=float, default=0)
+    parser.add_argument("--archive_mib", type=float, default=1)
+    parser.add_argument("--rate_limit", type=float, default=0)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--empty_projects", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    server = serve(
+        MOCK_GITLAB(
+            args.projects,
+            args.variables,
+            args.export_delay,
+            args.import_delay,
+            int(args.archive_mib * MIB),
+            args.rate_limit,
+            args.latency,
+            args.empty_projects,
+        ),
+        args.port,
+    )
+    # The first line is read by bench.py to find the server
+    print(f"http://127.0.0.1:{server.server_port}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Python3 -- Class for migrating many projects from a manifest
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import copy
+import csv
+import logging
+import os
+import sys
+
+import gitlab
+import project as init
+import transfer
+from pipeline import BYTE_BUDGET, PIPELINE
+from settings import SETTINGS
+from tokens import DEFAULT_TOKEN_DAYS, TOKEN_STORE
+from verify import VERIFY, fingerprints
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+DEFAULT_WORKERS = 2
+TRUE_VALUES = ["1", "true", "yes", "y"]
+SIZE_STATISTICS = ["repository_size", "lfs_objects_size", "uploads_size", "wiki_size"]
+
+
+def to_bool(value, default: bool):
+    """
+    Function to read a manifest option as a boolean
+    @return: boolean
+    """
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def load_manifest(manifest_path: str):
+    """
+    Function to read a CSV or YAML manifest listing the projects to migrate
+    Columns/keys: source_project_id, path, namespace, destination_project_id,
+    migrate_project, migrate_variables
+    @return: list of job dicts, exiting if two rows share a source & destination path
+    """
+    LOG.info(f"#### Reading manifest: {manifest_path} ####")
+    with open(manifest_path) as f:
+        if manifest_path.endswith((".yml", ".yaml")):
+            if yaml is None:
+                LOG.error(
+                    "## PyYAML is required for YAML manifests (pip install pyyaml) ##"
+                )
+                sys.exit(1)
+            rows = yaml.safe_load(f) or []
+        else:
+            rows = list(csv.DictReader(f))
+
+    jobs = []
+    for row in rows:
+        path = str(row.get("path") or "")
+        namespace = str(row.get("namespace") or "")
+        path_import = f"{namespace}/{path}" if namespace else path
+        source_project_id = str(row["source_project_id"])
+        jobs.append(
+            {
+                "key": f"{source_project_id}->{path_import}",
+                "source_project_id": source_project_id,
+                "path_import": path_import,
+                "destination_project_id": str(row.get("destination_project_id") or ""),
+                "migrate_project": to_bool(row.get("migrate_project"), True),
+                "migrate_variables": to_bool(row.get("migrate_variables"), False),
+            }
+        )
+    keys = [job["key"] for job in jobs]
+    duplicates = sorted({key for key in keys if keys.count(key) > 1})
+    if duplicates:
+        LOG.error(
+            f"## Projects listed more than once in the manifest: {', '.join(duplicates)} ##"
+        )
+        sys.exit(1)
+    LOG.info(f"## Total projects found in manifest: {len(jobs)} ##")
+    return jobs
+
+
+class BATCH:
+    """Migration stages of many projects, run as a pipeline"""
+
+    def __init__(
+        self,
+        api: gitlab.API,
+        bot_access_token: str,
+        destination_access_token: str = None,
+        concurrency: int = 1,
+        workers: dict = None,
+        directory_name: str = "exported_projects",
+        debug: bool = False,
+        token_store: TOKEN_STORE = None,
+        token_days: int = DEFAULT_TOKEN_DAYS,
+        disk_budget: int = None,
+        verify: bool = False,
+        settings: bool = False,
+    ) -> None:
+        """Initiate Batch object, `api` is copied for every job & shares its session"""
+        self.api = api
+        self.bot_access_token = bot_access_token
+        self.destination_access_token = destination_access_token or bot_access_token
+        self.concurrency = concurrency
+        self.workers = workers or {}
+        self.directory_name = directory_name
+        self.debug = debug
+        self.token_store = token_store
+        self.token_days = token_days
+        self.disk_budget = BYTE_BUDGET(disk_budget)
+        self.verify = verify
+        self.settings = settings
+
+    def job_api(self, job: dict):
+        """
+        Function to get the API object of a job, created on its first stage
+        @return: gitlab.API
+        """
+        if "api" not in job:
+            job["api"] = copy.copy(self.api)
+            job["api"].source_project_id = job["source_project_id"]
+            job["api"].destination_project_id = job["destination_project_id"]
+            job["api"].journal_key = job["key"]
+        return job["api"]
+
+    def export(self, job: dict):
+        """
+        Function to request the export of a job's project & wait until it is ready
+        """
+        if not job["migrate_project"]:
+            return
+        api = self.job_api(job)
+        if api.checkpoint("import_requested") is not None:
+            # The archive was already uploaded, by a previous run or another runner
+            job["archive"] = None
+            return
+        job["archive"] = api.exported_archive() or api.cached_archive(
+            job["source_project_id"], job.get("project"), self.directory_name
+        )
+        if job["archive"]:
+            return
+        api.start_export(job["source_project_id"])
+        api.finish_export(job["source_project_id"])
+
+    def download(self, job: dict):
+        """
+        Function to download the exported archive of a job's project
+        """
+        if not job["migrate_project"]:
+            return
+        api = self.job_api(job)
+        if api.checkpoint("import_requested") is not None:
+            return
+        self.disk_budget.acquire(job.get("size", 0))
+        job["reserved"] = job.get("size", 0)
+        try:
+            job["archive"] = job["archive"] or api.download_export(
+                job["source_project_id"], self.directory_name
+            )
+        except BaseException:
+            self.disk_budget.release(job.pop("reserved"))
+            raise
+
+    def import_(self, job: dict):
+        """
+        Function to import the downloaded archive of a job's project, deleting it once
+        imported so that the disk budget bounds what the batch holds on disk
+        """
+        if not job["migrate_project"]:
+            return
+        api = self.job_api(job)
+        try:
+            job["destination_project_id"] = str(
+                api.import_project(job["path_import"], job["archive"])
+            )
+            # A failed import keeps its archive for --resume; a cache hit is only a
+            # link, the export cache keeps its own copy
+            if job["archive"]:
+                LOG.debug(
+                    "## [%s] Deleting imported archive %s ##",
+                    job["key"],
+                    job["archive"],
+                )
+                transfer.remove_archive(job["archive"])
+        finally:
+            self.disk_budget.release(job.pop("reserved", 0))
+
+    def tokens(self, job: dict):
+        """
+        Function to get the temporary tokens of both projects of a job
+        @return: tuple of (source_url, source_header, destination_url, destination_header)
+        """
+        api = self.job_api(job)
+        source_url, source_header = init.PROJECT(
+            job["source_project_id"],
+            api.server_url,
+            self.bot_access_token,
+            self.debug,
+            api.session,
+            self.token_store,
+            self.token_days,
+        ).create_access_token("Tmp_Source_Token")
+        destination_url, destination_header = init.PROJECT(
+            job["destination_project_id"],
+            api.destination_server_url,
+            self.destination_access_token,
+            self.debug,
+            api.session,
+            self.token_store,
+            self.token_days,
+        ).create_access_token("Tmp_Destination_Token")
+        return source_url, source_header, destination_url, destination_header
+
+    def variables(self, job: dict):
+        """
+        Function to migrate the CI/CD variables of a job's project
+        """
+        if not job["migrate_variables"]:
+            return
+        api = self.job_api(job)
+        if api.checkpoint("variables_synced") is not None:
+            LOG.info(f"## [{job['key']}] Variables were migrated by a previous run ##")
+            return
+        source_url, source_header, destination_url, destination_header = self.tokens(
+            job
+        )
+        failures = api.migrate_variables(
+            api.copy_source_variables(source_url, source_header),
+            destination_url,
+            destination_header,
+            self.concurrency,
+        )
+        if failures:
+            LOG.error(f"## {len(failures)} variables could not be migrated ##")
+            sys.exit(1)
+        api.record(
+            "variables_synced", destination_project_id=job["destination_project_id"]
+        )
+
+    def replicate_settings(self, job: dict):
+        """
+        Function to re-create the settings a job's export archive does not carry
+        """
+        if not self.settings:
+            return
+        if not job["destination_project_id"]:
+            LOG.warning(f"## [{job['key']}] No destination project for the settings ##")
+            return
+        api = self.job_api(job)
+        if api.checkpoint("settings_migrated") is not None:
+            LOG.info(f"## [{job['key']}] Settings were migrated by a previous run ##")
+            return
+        failures = SETTINGS(api, debug=self.debug).run(
+            job["source_project_id"], job["destination_project_id"]
+        )
+        if failures:
+            LOG.error(f"## {len(failures)} settings could not be migrated ##")
+            sys.exit(1)
+        api.record(
+            "settings_migrated", destination_project_id=job["destination_project_id"]
+        )
+
+    def verification(self, job: dict):
+        """
+        Function to compare a job's migrated project with its source
+        """
+        if not self.verify:
+            return
+        if not job["destination_project_id"]:
+            LOG.warning(f"## [{job['key']}] No destination project to verify ##")
+            return
+        differences = VERIFY(
+            self.job_api(job),
+            self.concurrency,
+            self.debug,
+            fingerprints(job["migrate_variables"]),
+        ).run([(job["source_project_id"], job["destination_project_id"])])
+        if any(differences.values()):
+            sys.exit(1)
+
+    def measure(self, jobs: list):
+        """
+        Function to fetch the expected archive size of every job (repository, LFS,
+        uploads & wiki) & order them largest first, so the longest jobs start first
+        @return: list of job dicts
+        """
+        LOG.info("#### Measuring the projects to migrate ####")
+
+        def statistics(job: dict):
+            if job["migrate_project"]:
+                return self.api.get_project_statistics(job["source_project_id"])
+
+        for job, future in gitlab.bounded_map(statistics, jobs, self.concurrency):
+            project = future.result() or {}
+            job["project"] = project
+            job["size"] = sum(
+                project.get("statistics", {}).get(field, 0) for field in SIZE_STATISTICS
+            )
+            LOG.debug(
+                "## [%s] Expected archive size: %s bytes ##", job["key"], job["size"]
+            )
+        return sorted(jobs, key=lambda job: job["size"], reverse=True)
+
+    def run(self, jobs: list):
+        """
+        Function to migrate every job: export, download, import, variables, settings &
+        verify stages each run with their own number of workers
+        @return: list of keys of the failed jobs
+        """
+        LOG.info(f"#### Starting batch migration of {len(jobs)} projects ####")
+        jobs = self.measure(jobs)
+        results = PIPELINE(
+            [
+                ("export", self.export, self.workers.get("export", DEFAULT_WORKERS)),
+                (
+                    "download",
+                    self.download,
+                    self.workers.get("download", DEFAULT_WORKERS),
+                ),
+                ("import", self.import_, self.workers.get("import", DEFAULT_WORKERS)),
+                (
+                    "variables",
+                    self.variables,
+                    self.workers.get("variables", DEFAULT_WORKERS),
+                ),
+                (
+                    "settings",
+                    self.replicate_settings,
+                    self.workers.get("settings", DEFAULT_WORKERS),
+                ),
+                (
+                    "verify",
+                    self.verification,
+                    self.workers.get("verify", DEFAULT_WORKERS),
+                ),
+            ],
+            self.debug,
+        ).run(jobs)
+        failed = [key for key, (stage, _) in results.items() if stage]
+        LOG.info(
+            f"## Batch complete: {len(jobs) - len(failed)}/{len(jobs)} projects migrated ##"
+        )
+        for key in failed:
+            LOG.error(f"## [{key}] Failed during the '{results[key][0]}' stage ##")
+        return failed
@@ -0,0 +1,131 @@
+"""
+Python3 -- Class for a local cache of export archives
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+
+import transfer
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+DEFAULT_CACHE_DIRECTORY = os.path.join("exported_projects", "cache")
+
+
+def place(source_path: str, destination_path: str):
+    """
+    Function to hard link a file into place, copying it across file systems
+    """
+    if os.path.abspath(source_path) == os.path.abspath(destination_path):
+        return
+    if os.path.exists(destination_path):
+        os.remove(destination_path)
+    try:
+        os.link(source_path, destination_path)
+    except OSError:
+        shutil.copy2(source_path, destination_path)
+
+
+class EXPORT_CACHE:
+    """Export archives kept per project & reused until the project changes, evicted LRU"""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        directory: str = DEFAULT_CACHE_DIRECTORY,
+        debug: bool = False,
+    ) -> None:
+        """Initiate Export Cache object"""
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.debug = debug
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.entries = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.entries = json.load(f)
+
+    def save(self):
+        """
+        Function to atomically write the cache index
+        """
+        temporary_path = self.index_path + ".tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(temporary_path, self.index_path)
+
+    def lookup(self, project_id: str, last_activity_at: str, destination_path: str):
+        """
+        Function to place the cached archive of a project at `destination_path`, when it
+        was exported after the last activity of the project
+        @return: {str} destination_path, or None on a cache miss
+        """
+        with self.lock:
+            entry = self.entries.get(str(project_id))
+            if (
+                entry is None
+                or entry["last_activity_at"] != last_activity_at
+                or not os.path.exists(entry["archive"])
+                or transfer.read_checksum(entry["archive"]) != entry["sha256"]
+            ):
+                LOG.info(f"## Export cache miss for project: {project_id} ##")
+                return None
+            entry["used_at"] = time.time()
+            self.save()
+        os.makedirs(os.path.dirname(destination_path) or ".", exist_ok=True)
+        place(entry["archive"], destination_path)
+        transfer.write_checksum(destination_path, entry["sha256"])
+        LOG.info(
+            f"## Export cache hit for project: {project_id} (last activity {last_activity_at}) ##"
+        )
+        return destination_path
+
+    def store(self, project_id: str, last_activity_at: str, archive_path: str):
+        """
+        Function to keep a freshly downloaded archive, evicting the least recently used
+        archives beyond `max_bytes`
+        """
+        cached_path = os.path.join(self.directory, f"{project_id}.tar.gz")
+        sha256 = transfer.read_checksum(archive_path)
+        with self.lock:
+            place(archive_path, cached_path)
+            transfer.write_checksum(cached_path, sha256)
+            self.entries[str(project_id)] = {
+                "archive": cached_path,
+                "last_activity_at": last_activity_at,
+                "sha256": sha256,
+                "size": os.path.getsize(cached_path),
+                "used_at": time.time(),
+            }
+            self.evict()
+            self.save()
+
+    def evict(self):
+        """
+        Function to delete the least recently used archives until the cache fits
+        """
+        total = sum(entry["size"] for entry in self.entries.values())
+        for project_id, entry in sorted(
+            self.entries.items(), key=lambda item: item[1]["used_at"]
+        ):
+            if total <= self.max_bytes:
+                break
+            LOG.info(f"## Evicting cached export of project: {project_id} ##")
+            for path in [entry["archive"], entry["archive"] + transfer.CHECKSUM_SUFFIX]:
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= entry["size"]
+            del self.entries[project_id]
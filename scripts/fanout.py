@@ -0,0 +1,165 @@
+"""
+Python3 -- Class for replicating the variables of one project to many projects
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import logging
+import os
+import sys
+import urllib.parse
+
+import gitlab
+import metrics
+import project as init
+from session import base_url
+from tokens import DEFAULT_TOKEN_DAYS, TOKEN_STORE
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+DEFAULT_WORKERS = 4
+
+
+class FANOUT:
+    """Variables of one source project, fetched once & written to many destinations"""
+
+    def __init__(
+        self,
+        api: gitlab.API,
+        bot_access_token: str,
+        destination_access_token: str = None,
+        concurrency: int = 1,
+        workers: int = DEFAULT_WORKERS,
+        debug: bool = False,
+        token_store: TOKEN_STORE = None,
+        token_days: int = DEFAULT_TOKEN_DAYS,
+        sync: bool = False,
+        delete_extra: bool = False,
+        dry_run: bool = False,
+    ) -> None:
+        """Initiate Fanout object, `api` holds the session & tokens of both servers"""
+        self.api = api
+        self.bot_access_token = bot_access_token
+        self.destination_access_token = destination_access_token or bot_access_token
+        self.concurrency = concurrency
+        self.workers = workers
+        self.debug = debug
+        self.token_store = token_store
+        self.token_days = token_days
+        self.sync = sync
+        self.delete_extra = delete_extra
+        self.dry_run = dry_run
+
+    def group_projects(self, destination_group: str):
+        """
+        Function to list the projects of a destination group & its subgroups
+        @return: list of project IDs
+        """
+        LOG.info(f"#### Listing projects of group: {destination_group} ####")
+        project_ids = [
+            str(project["id"])
+            for project in self.api.session.paginate(
+                f"{base_url(self.api.destination_server_url)}/api/v4/groups/{urllib.parse.quote(str(destination_group), safe='')}/projects",
+                headers=self.api.destination_head_token,
+                params={"include_subgroups": "true", "archived": "false"},
+            )
+        ]
+        LOG.info(f"## Total projects found in group: {len(project_ids)} ##")
+        return project_ids
+
+    def source_variables(self, source_project_id: str):
+        """
+        Function to fetch the variables of the source project once, for every destination
+        @return: list of {json} variables
+        """
+        source_url, source_header = init.PROJECT(
+            source_project_id,
+            self.api.server_url,
+            self.bot_access_token,
+            self.debug,
+            self.api.session,
+            self.token_store,
+            self.token_days,
+        ).create_access_token("Tmp_Source_Token")
+        return list(self.api.copy_source_variables(source_url, source_header))
+
+    def replicate(self, variables: list, destination_project_id: str):
+        """
+        Function to write the source variables to one destination project
+        @return: list of failed variables as (key, environment_scope, reason) tuples
+        """
+        destination_url, destination_header = init.PROJECT(
+            destination_project_id,
+            self.api.destination_server_url,
+            self.destination_access_token,
+            self.debug,
+            self.api.session,
+            self.token_store,
+            self.token_days,
+        ).create_access_token("Tmp_Destination_Token")
+        if self.sync:
+            return self.api.sync_variables(
+                variables,
+                destination_url,
+                destination_header,
+                self.concurrency,
+                self.delete_extra,
+                self.dry_run,
+            )
+        return self.api.migrate_variables(
+            variables, destination_url, destination_header, self.concurrency
+        )
+
+    def run(self, source_project_id: str, destination_project_ids: list):
+        """
+        Function to replicate the source variables to every destination project, up to
+        `workers` destinations at a time
+        @return: dict of {destination_project_id: list of failures, or error str}
+        """
+        destination_project_ids = list(
+            dict.fromkeys(
+                project_id
+                for project_id in destination_project_ids
+                if project_id != str(source_project_id)
+                or self.api.destination_server_url != self.api.server_url
+            )
+        )
+        LOG.info(
+            f"#### Replicating variables of project {source_project_id} to {len(destination_project_ids)} projects ####"
+        )
+        variables = self.source_variables(source_project_id)
+
+        results = {}
+        for project_id, future in gitlab.bounded_map(
+            lambda project_id: self.replicate(variables, project_id),
+            destination_project_ids,
+            self.workers,
+        ):
+            try:
+                results[project_id] = future.result()
+            except (Exception, SystemExit) as error:
+                results[project_id] = repr(error)
+            metrics.REGISTRY.count(
+                "fanout_destinations_total",
+                outcome="ok" if not results[project_id] else "failed",
+            )
+
+        LOG.info("#### Fan-out report ####")
+        for project_id in destination_project_ids:
+            result = results[project_id]
+            if isinstance(result, str):
+                LOG.error(f"## Project {project_id}: failed | {result} ##")
+            elif result:
+                LOG.error(
+                    f"## Project {project_id}: {len(result)} variables failed ({', '.join(sorted({key for key, _, _ in result}))}) ##"
+                )
+            else:
+                LOG.info(f"## Project {project_id}: ok ({len(variables)} variables) ##")
+        LOG.info(
+            f"## {sum(1 for result in results.values() if not result)}/{len(results)} projects replicated ##"
+        )
+        return results
@@ -7,20 +7,50 @@ LOG readability (Info, Error, Debug):
 - ## ---> LOG withing a function
 """
 
-import json
+import hashlib
 import logging
 import os
 import sys
-import time
-import urllib
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import requests
 
+import metrics
+import transfer
+from cache import EXPORT_CACHE
+from journal import JOURNAL
+from polling import POLLER
+from session import SESSION, base_url
+from slim import SLIM
+
 __appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
 LOG = logging.getLogger(__appname__)
-BASIC_FORMAT = "[%(levelname)s]:[%(filename)s:%(lineno)s - %(funcName)s()] %(message)s"
-logging.basicConfig(format=BASIC_FORMAT)
-LOG.setLevel(logging.DEBUG)
+
+VARIABLE_FIELDS = ["variable_type", "value", "protected", "masked"]
+EXPORT_STATUS_SUCCESS = ["finished"]
+IMPORT_STATUS_SUCCESS = ["finished"]
+IMPORT_STATUS_FAILED = ["failed"]
+
+
+def bounded_map(function, items, concurrency: int):
+    """
+    Function to run `function` over `items` with at most `concurrency` calls in flight,
+    consuming `items` lazily
+    @return: generator of (item, concurrent.futures.Future) tuples, in completion order
+    """
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        pending = {}
+        for item in items:
+            if len(pending) >= max(concurrency, 1) * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future
+            pending[executor.submit(function, item)] = item
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
 
 
 class API:
@@ -33,30 +63,59 @@ class API:
         destination_project_id: dict,
         bot_access_token: str,
         debug: bool,
+        session: SESSION = None,
+        poller: POLLER = None,
+        chunk_size: int = transfer.DEFAULT_CHUNK_SIZE,
+        override_params: dict = None,
+        destination_server_url: str = None,
+        destination_access_token: str = None,
+        relay_buffer: int = transfer.DEFAULT_RELAY_BUFFER,
+        journal: JOURNAL = None,
+        cache: EXPORT_CACHE = None,
+        slim: SLIM = None,
     ) -> None:
         """Initiate API object"""
+        self.session = session or SESSION(debug=debug)
+        self.poller = poller or POLLER(debug=debug)
         self.server_url = server_url
         self.source_project_id = source_project_id
         self.destination_project_id = destination_project_id
         self.head_token = {"PRIVATE-TOKEN": f"{bot_access_token}"}
+        self.destination_server_url = destination_server_url or server_url
+        self.destination_head_token = {
+            "PRIVATE-TOKEN": f"{destination_access_token or bot_access_token}"
+        }
         self.export_download_link = None
+        self.chunk_size = chunk_size
+        self.override_params = override_params or {}
+        self.relay_buffer = relay_buffer
+        self.journal = journal
+        self.journal_key = None
+        self.cache = cache
+        self.slim = slim
+        self.last_activity_at = None
         self.debug = debug
 
     def copy_source_variables(self, source_url: str, source_headers: str):
         """
-        Function to verify URL/Paths of the source & copy all variables
-        @return: {json} list
+        Function to verify URL/Paths of the source & lazily copy all variables,
+        page by page, so the migration can start before the last page arrives
+        @return: generator of {json} variables
         """
         LOG.info("#### Grabbing variables from Source ####")
-        source_request = requests.get(source_url, headers=source_headers)
-        parsed_request = json.dumps(source_request.json(), indent=4, sort_keys=True)
-
-        LOG.debug(f"Json response from Source {parsed_request}") if self.debug else None
-        LOG.info(f"## Total variables found: {len(source_request.json())} ##")
-        if len(source_request.json()) == 0:
+        count = 0
+        for variable in self.session.paginate(source_url, headers=source_headers):
+            count += 1
+            LOG.debug(
+                "## Variable from Source: %s (%s) ##",
+                variable["key"],
+                variable["environment_scope"],
+            )
+            yield variable
+        LOG.info(f"## Total variables found: {count} ##")
+        if count == 0:
             LOG.error("## No variables found in source. Skipping migration process ##")
             sys.exit(1)
-        return source_request.json()
 
     def paste_destination_variables(
         self,
@@ -81,17 +140,25 @@ class API:
             "environment_scope": v_environment_scope,
         }
         LOG.info(f"## Pasting ({v_name}) ##")
-        LOG.debug(f"## Details for {v_name}: {data} ##") if self.debug else None
-        requests.post(url, headers=headers, data=data)
+        LOG.debug("## Details for %s: %s ##", v_name, data)
+        return self.session.post(url, headers=headers, data=data)
 
     def migrate_variables(
-        self, source_vars: list, destination_url: str, destination_header: str
+        self,
+        source_vars: list,
+        destination_url: str,
+        destination_header: str,
+        concurrency: int = 1,
     ):
         """
-        Function to Copy/Paste all variables from our source to the destination
+        Function to Copy/Paste all variables from our source to the destination,
+        pasting up to `concurrency` variables in parallel
+        @return: list of failed variables as (key, environment_scope, reason) tuples
         """
-        for variable in source_vars:
-            self.paste_destination_variables(
+        LOG.info(f"#### Pasting variables with a concurrency of {concurrency} ####")
+
+        def paste(variable: dict):
+            return self.paste_destination_variables(
                 destination_url,
                 destination_header,
                 variable["variable_type"],
@@ -102,6 +169,175 @@ class API:
                 variable["environment_scope"],
             )
 
+        with metrics.REGISTRY.phase("variables"):
+            return self.report_variables(bounded_map(paste, source_vars, concurrency))
+
+    def report_variables(self, results):
+        """
+        Function to collect the response of every variable write and report the failures
+        @return: list of failed variables as (key, environment_scope, reason) tuples
+        """
+        total = 0
+        failures = []
+        for variable, future in results:
+            total += 1
+            try:
+                response = future.result()
+            except requests.exceptions.RequestException as error:
+                failures.append(
+                    (variable["key"], variable["environment_scope"], str(error))
+                )
+                continue
+            if not 200 <= response.status_code < 300:
+                failures.append(
+                    (
+                        variable["key"],
+                        variable["environment_scope"],
+                        f"Code: {response.status_code} | Text: {response.text}",
+                    )
+                )
+        LOG.info(
+            f"## {total - len(failures)}/{total} variables written successfully ##"
+        )
+        for key, environment_scope, reason in failures:
+            LOG.error(f"## Failed to write ({key}) [{environment_scope}] | {reason} ##")
+        return failures
+
+    def fetch_variables(self, url: str, headers: dict):
+        """
+        Function to fetch every variable of a project, indexed by key & environment scope
+        @return: dict of {(key, environment_scope): variable}
+        """
+        LOG.info("#### Grabbing variables from Destination ####")
+        variables = {
+            (variable["key"], variable["environment_scope"]): variable
+            for variable in self.session.paginate(url, headers=headers)
+        }
+        LOG.info(f"## Total variables found: {len(variables)} ##")
+        return variables
+
+    def plan_variables(self, source: dict, destination: dict, delete_extra: bool):
+        """
+        Function to diff source & destination variables into the writes needed to sync them
+        @return: list of (action, variable) tuples
+        """
+        plan = []
+        for index, variable in source.items():
+            if index not in destination:
+                plan.append(("create", variable))
+            elif any(
+                variable.get(field) != destination[index].get(field)
+                for field in VARIABLE_FIELDS
+            ):
+                plan.append(("update", variable))
+        if delete_extra:
+            plan.extend(
+                ("delete", variable)
+                for index, variable in destination.items()
+                if index not in source
+            )
+        return plan
+
+    def update_destination_variable(self, url: str, headers: dict, variable: dict):
+        """
+        Function to overwrite an existing variable of the destination project
+        @return requests.models.Response
+        """
+        LOG.info(f"## Updating ({variable['key']}) ##")
+        return self.session.put(
+            f"{url}/{urllib.parse.quote(variable['key'], safe='')}",
+            headers=headers,
+            params={"filter[environment_scope]": variable["environment_scope"]},
+            data={field: variable[field] for field in VARIABLE_FIELDS},
+        )
+
+    def delete_destination_variable(self, url: str, headers: dict, variable: dict):
+        """
+        Function to delete a variable of the destination project
+        @return requests.models.Response
+        """
+        LOG.info(f"## Deleting ({variable['key']}) ##")
+        return self.session.delete(
+            f"{url}/{urllib.parse.quote(variable['key'], safe='')}",
+            headers=headers,
+            params={"filter[environment_scope]": variable["environment_scope"]},
+        )
+
+    def sync_variables(
+        self,
+        source_vars,
+        destination_url: str,
+        destination_header: str,
+        concurrency: int = 1,
+        delete_extra: bool = False,
+        dry_run: bool = False,
+    ):
+        """
+        Function to only write the variables that differ between our source and the destination
+        @return: list of failed variables as (key, environment_scope, reason) tuples
+        """
+        LOG.info("#### Syncing variables from Source to Destination ####")
+        source = {
+            (variable["key"], variable["environment_scope"]): variable
+            for variable in source_vars
+        }
+        destination = self.fetch_variables(destination_url, destination_header)
+        plan = self.plan_variables(source, destination, delete_extra)
+        if not plan:
+            LOG.info("## Destination variables are already in sync ##")
+            return []
+        for action, variable in plan:
+            LOG.info(
+                f"## [{action.upper()}] ({variable['key']}) [{variable['environment_scope']}] ##"
+            )
+        if dry_run:
+            LOG.info(f"## Dry run: {len(plan)} changes planned, nothing written ##")
+            return []
+
+        def write(change: tuple):
+            action, variable = change
+            if action == "create":
+                return self.paste_destination_variables(
+                    destination_url,
+                    destination_header,
+                    variable["variable_type"],
+                    variable["key"],
+                    variable["value"],
+                    variable["protected"],
+                    variable["masked"],
+                    variable["environment_scope"],
+                )
+            if action == "update":
+                return self.update_destination_variable(
+                    destination_url, destination_header, variable
+                )
+            return self.delete_destination_variable(
+                destination_url, destination_header, variable
+            )
+
+        with metrics.REGISTRY.phase("variables"):
+            return self.report_variables(
+                (variable, future)
+                for (_, variable), future in bounded_map(write, plan, concurrency)
+            )
+
+    def get_project_statistics(self, project_id: dict):
+        """
+        Function to fetch the storage statistics of a source project
+        @return: {json} project, or None if it could not be fetched
+        """
+        request = self.session.get(
+            f"{base_url(self.server_url)}/api/v4/projects/{project_id}",
+            headers=self.head_token,
+            params={"statistics": "true"},
+        )
+        if request.status_code != 200:
+            LOG.warning(
+                f"## Unable to fetch statistics of project {project_id}. Code: {request.status_code} ##"
+            )
+            return None
+        return request.json()
+
     def request_export(self, project_id: dict):
         """
         Function to export a project
@@ -110,8 +346,8 @@ class API:
         LOG.info(
             f"#### Requesting export from Gitlab API for project: {project_id} ####"
         )
-        return requests.post(
-            f"https://{self.server_url}/api/v4/projects/{project_id}/export",
+        return self.session.post(
+            f"{base_url(self.server_url)}/api/v4/projects/{project_id}/export",
             headers=self.head_token,
         )
 
@@ -121,83 +357,158 @@ class API:
         @return requests.models.Response
         """
         LOG.info(f"#### Checking export status of project: {project_id} ####")
-        return requests.get(
-            f"https://{self.server_url}/api/v4/projects/{project_id}/export",
+        return self.session.get(
+            f"{base_url(self.server_url)}/api/v4/projects/{project_id}/export",
             headers=self.head_token,
         )
 
+    def wait_for_export(self, project_id: dict):
+        """
+        Function to poll the export status until the archive is ready to be downloaded
+        @return: {json} export status holding the download `_links`
+        """
+        LOG.info("## Waiting to complete exporting... ##")
+
+        def check(count: int):
+            export_request = self.request_export_status(project_id)
+            self.verify_api(export_request, "export status request")
+            json = export_request.json()
+            export_status_str = json.get("export_status", "unknown")
+            if export_status_str in EXPORT_STATUS_SUCCESS and "_links" in json.keys():
+                LOG.info("## Export Complete! ##")
+                LOG.debug("## JSON Output of the export: %s ##", json)
+                return True, json
+            LOG.info(f"## ({count}) Export status: {export_status_str.upper()}... ##")
+            LOG.debug("## JSON Output of the export: %s ##", json)
+            return False, json
+
+        return self.poller.poll(check, "export")
+
+    def checkpoint(self, stage: str):
+        """
+        Function to find the journal data of a stage this project already completed
+        @return: dict, or None
+        """
+        if self.journal is None:
+            return None
+        return self.journal.get(self.journal_key or str(self.source_project_id), stage)
+
+    def record(self, stage: str, **data):
+        """
+        Function to record in the journal that this project completed a stage
+        """
+        self.journal.record(
+            self.journal_key or str(self.source_project_id), stage, **data
+        ) if self.journal else None
+
+    def start_export(self, project_id: dict):
+        """
+        Function to request the export of a project, unless a previous run already did
+        """
+        if self.checkpoint("export_requested") is not None:
+            LOG.info("## Re-attaching to the export requested by a previous run ##")
+            return
+        with metrics.REGISTRY.phase("export_request"):
+            self.verify_api(self.request_export(project_id), "export")
+        if self.checkpoint("download_started") is not None:
+            # A partial archive of the previous export must not be resumed
+            self.journal.reset(
+                self.journal_key or str(self.source_project_id), ["download_started"]
+            )
+        self.record("export_requested")
+
+    def finish_export(self, project_id: dict):
+        """
+        Function to wait for the export of a project & keep its download links
+        """
+        with metrics.REGISTRY.phase("export_wait"):
+            self.export_download_link = self.wait_for_export(project_id)["_links"]
+        self.record("export_finished", links=self.export_download_link)
+
+    def exported_archive(self):
+        """
+        Function to find the archive downloaded by a previous run, if it is still intact
+        @return: {str} path of the archive, or None
+        """
+        downloaded = self.checkpoint("downloaded")
+        if (
+            downloaded
+            and os.path.exists(downloaded["archive"])
+            and transfer.read_checksum(downloaded["archive"]) == downloaded["sha256"]
+        ):
+            LOG.info(
+                f"## Reusing the archive downloaded by a previous run: {downloaded['archive']} ##"
+            )
+            return downloaded["archive"]
+        return None
+
+    def cached_archive(
+        self,
+        project_id: dict,
+        project: dict = None,
+        directory_name: str = "exported_projects",
+    ):
+        """
+        Function to reuse the cached archive of a project that did not change since
+        it was exported, instead of exporting it again, slimming it like a download
+        @return: {str} path of the archive, or None
+        """
+        if self.cache is None:
+            return None
+        project = project or self.get_project_statistics(project_id)
+        if not project:
+            return None
+        self.last_activity_at = project["last_activity_at"]
+        file_path = self.cache.lookup(
+            project_id,
+            self.last_activity_at,
+            os.path.join(directory_name, project_id + ".tar.gz"),
+        )
+        if file_path:
+            if self.slim is not None:
+                file_path = self.slim.rewrite(file_path)
+            self.record(
+                "downloaded",
+                archive=file_path,
+                sha256=transfer.read_checksum(file_path),
+            )
+        return file_path
+
+    def download_export(
+        self, project_id: dict, directory_name: str = "exported_projects"
+    ):
+        """
+        Function to download the finished export of a project
+        @return: {str} path of the archive
+        """
+        file_path = self.download_from_url(
+            self.export_download_link["api_url"],
+            directory_name,
+            project_id + ".tar.gz",
+        )
+        # The cache keeps the whole archive, whatever a run slims out of its own copy
+        if self.cache is not None and self.last_activity_at:
+            self.cache.store(project_id, self.last_activity_at, file_path)
+        if self.slim is not None:
+            file_path = self.slim.rewrite(file_path)
+        self.record(
+            "downloaded", archive=file_path, sha256=transfer.read_checksum(file_path)
+        )
+        return file_path
+
     def export_project(self, project_id: dict):
         """
         Function that handles both, exporting the project, checking the export status
         and generating download URLs for the files
+        @return: {str} path of the archive
         """
         LOG.info(f"#### Processing the export of project: {project_id} ####")
-        export_request = self.request_export(project_id)
-        if self.verify_api(export_request, "export"):
-            export_status_str = ""
-            export_status_success = ["finished"]
-            export_status_pending = [
-                "queued",
-                "started",
-                "finished",
-                "regeneration_in_progress",
-            ]
-            export_status_unknown = ["unknown"]
-            export_status_bool = False
-            count = 0
-            while not export_status_bool:
-                LOG.info("## Waiting to complete exporting... ##")
-                export_request = self.request_export_status(project_id)
-                count += 1
-                if count == 10:
-                    LOG.error(
-                        "## Project export is taking way too much time, something is wrong! ##"
-                    )
-                if self.verify_api(export_request, "export status request"):
-                    json = export_request.json()
-                    if "export_status" in json.keys():
-                        export_status_str = json["export_status"]
-                        if (
-                            export_status_str in export_status_success
-                            and "_links" in json.keys()
-                        ):
-                            LOG.info("## Export Complete! ##")
-                            LOG.debug(
-                                f"## JSON Output of the export: {json} ##"
-                            ) if self.debug else None
-                            export_status_bool = True
-                            break
-                        if export_status_str in export_status_pending:
-                            LOG.info(
-                                f"## ({count}) Export status: {export_status_str.upper()}... ##"
-                            )
-                            LOG.debug(
-                                f"## JSON Output of the export: {json} ##"
-                            ) if self.debug else None
-                    else:
-                        export_status_str = export_status_unknown[0]
-                        LOG.info(
-                            f"## ({count}) Export status: {export_status_str.upper()}... ##"
-                        )
-
-                time.sleep(5)
-
-            if export_status_bool:
-                if "_links" in json.keys():
-                    self.export_download_link = json["_links"]
-                    self.download_from_url(
-                        self.export_download_link["api_url"],
-                        "exported_projects",
-                        project_id + ".tar.gz",
-                    )
-                else:
-                    LOG.info(
-                        f"## Unable to find download link in API response: {str(json)} ##"
-                    )
-            else:
-                LOG.error(
-                    f"## Export failed {export_request.reason} | Text: {export_request.text} ##"
-                )
+        archive = self.exported_archive() or self.cached_archive(project_id)
+        if archive:
+            return archive
+        self.start_export(project_id)
+        self.finish_export(project_id)
+        return self.download_export(project_id)
 
     def request_import(
         self, project_path: str, project_namespace: str, upload_from: str
@@ -205,31 +516,125 @@ class API:
         """
         Function to send a POST request for importing a previously exported project
         """
+        with open(upload_from, "rb") as f:
+            return self.upload_import(
+                project_path, project_namespace, f, os.path.getsize(upload_from)
+            )
+
+    def upload_import(
+        self,
+        project_path: str,
+        project_namespace: str,
+        file_object,
+        file_size: int = None,
+    ):
+        """
+        Function to send the import POST request, streaming the archive from `file_object`
+        with bounded memory
+        @return requests.models.Response
+        """
         LOG.info(
             f"#### Requesting import from Gitlab API for project: {project_path} ####"
         )
         import_data = {
             "path": project_path,
             "namespace": project_namespace,
-            # "override_params[squash_option]": "always",
         }
-        return requests.post(
-            f"https://{self.server_url}/api/v4/projects/import",
-            data=import_data,
-            files={"file": ("Upload_Me.tar.gz", open(upload_from, "rb"))},
-            headers=self.head_token,
+        for name, value in self.override_params.items():
+            import_data[f"override_params[{name}]"] = value
+        body = transfer.MULTIPART(
+            import_data,
+            "file",
+            "Upload_Me.tar.gz",
+            file_object,
+            file_size,
+            self.chunk_size,
+            transfer.PROGRESS("Upload", file_size),
+        )
+        import_request = self.session.post(
+            f"{base_url(self.destination_server_url)}/api/v4/projects/import",
+            data=body,
+            headers=dict(
+                self.destination_head_token, **{"Content-Type": body.content_type}
+            ),
         )
+        body.progress.close()
+        return import_request
 
     def request_import_status(self, project_name: str, project_id: str):
         """
         Function to send a GET request and check for the status of an import
         """
         LOG.info(f"#### Checking import status of project: {project_name} ####")
-        return requests.get(
-            f"https://{self.server_url}/api/v4/projects/{project_id}/import",
-            headers=self.head_token,
+        return self.session.get(
+            f"{base_url(self.destination_server_url)}/api/v4/projects/{project_id}/import",
+            headers=self.destination_head_token,
         )
 
+    def wait_for_import(self, project_name: str, imported_project_id: str):
+        """
+        Function to poll the import status until the imported project is ready
+        @return: {json} import status
+        """
+        LOG.info("## Waiting to complete importing... ##")
+
+        def check(count: int):
+            import_request = self.request_import_status(
+                project_name, imported_project_id
+            )
+            self.verify_api(import_request, "import status request")
+            json = import_request.json()
+            import_status_str = json.get("import_status", "unknown")
+            if import_status_str in IMPORT_STATUS_SUCCESS:
+                LOG.info("## Import Complete! ##")
+                LOG.debug("## JSON Output of the import: %s ##", json)
+                return True, json
+            if import_status_str in IMPORT_STATUS_FAILED:
+                LOG.error(
+                    f"## Import has failed! | Error: {json.get('import_error')} ##"
+                )
+                # A resumed run has to upload the archive again
+                self.journal.reset(
+                    self.journal_key or str(self.source_project_id),
+                    ["import_requested"],
+                ) if self.journal else None
+                LOG.debug("## JSON Output of the import: %s ##", json)
+                sys.exit(1)
+            LOG.info(f"## ({count}) Import status: {import_status_str.upper()}... ##")
+            LOG.debug("## JSON Output of the import: %s ##", json)
+            return False, json
+
+        return self.poller.poll(check, "import")
+
+    def start_import(self, project_path: str, upload_from: str):
+        """
+        Function to request the import of an archive, unless a previous run already did
+        @return: {str} ID of the imported project
+        """
+        requested = self.checkpoint("import_requested")
+        if requested is not None:
+            LOG.info("## Re-attaching to the import requested by a previous run ##")
+            return requested["imported_project_id"]
+        with metrics.REGISTRY.phase("upload"):
+            import_request = self.request_import(
+                os.path.basename(project_path),
+                os.path.dirname(project_path),
+                upload_from,
+            )
+            self.verify_api(import_request, "import")
+        imported_project_id = import_request.json()["id"]
+        self.record("import_requested", imported_project_id=imported_project_id)
+        return imported_project_id
+
+    def finish_import(self, project_name: str, imported_project_id: str):
+        """
+        Function to wait for an import, unless a previous run saw it finish
+        """
+        if self.checkpoint("import_finished") is None:
+            with metrics.REGISTRY.phase("import_wait"):
+                self.wait_for_import(project_name, imported_project_id)
+            self.record("import_finished", imported_project_id=imported_project_id)
+
     def import_project(
         self,
         project_path: str,
@@ -237,76 +642,77 @@ class API:
     ):
         """
         Function that processes the import procedure
+        @return: {str} ID of the imported project
         """
         LOG.info(f"#### Processing the import of project: {project_path} ####")
         project_name = os.path.basename(project_path)
         project_namespace = os.path.dirname(project_path)
-        local_file_path = os.path.join(os.getcwd(), upload_from)
+        # None when re-attaching to an import a previous run requested
+        local_file_path = (
+            os.path.join(os.getcwd(), upload_from) if upload_from else None
+        )
         LOG.debug(
-            f"## Import Name: {project_name} | Import Namespace: {project_namespace} | Importing from: {local_file_path}"
+            "## Import Name: %s | Import Namespace: %s | Importing from: %s",
+            project_name,
+            project_namespace,
+            local_file_path,
         )
 
-        import_request = self.request_import(
-            project_name, project_namespace, local_file_path
-        )
+        imported_project_id = self.start_import(project_path, local_file_path)
+        self.finish_import(project_name, imported_project_id)
+        return imported_project_id
 
-        if self.verify_api(import_request, "import"):
-            json = import_request.json()
-            imported_project_id = json["id"]
-            import_status_str = ""
-            import_status_success = ["finished"]
-            import_status_pending = [
-                "scheduled",
-                "started",
-            ]
-            import_status_failed = ["failed"]
-            import_status_unknown = ["unknown", "none"]
-            import_status_bool = False
-            count = 0
-            while not import_status_bool:
-                LOG.info("## Waiting to complete importing... ##")
-                import_request = self.request_import_status(
-                    project_name, imported_project_id
+    def relay_project(self, project_id: dict, project_path: str):
+        """
+        Function to pipe the export of the source project straight into the import
+        on the destination server, through a bounded in-memory buffer instead of a file
+        @return: {str} ID of the imported project
+        """
+        LOG.info(f"#### Relaying project {project_id} to {project_path} ####")
+        project_name = os.path.basename(project_path)
+        project_namespace = os.path.dirname(project_path)
+        requested = self.checkpoint("import_requested")
+        if requested is not None:
+            LOG.info("## Re-attaching to the import requested by a previous run ##")
+            imported_project_id = requested["imported_project_id"]
+            self.finish_import(project_name, imported_project_id)
+            return imported_project_id
+
+        self.start_export(project_id)
+        self.finish_export(project_id)
+        download_request = self.session.get(
+            self.export_download_link["api_url"],
+            allow_redirects=True,
+            stream=True,
+            headers=self.head_token,
+        )
+        self.verify_api(download_request, "download")
+        length = download_request.headers.get("Content-Length")
+        relay = transfer.RELAY(
+            download_request.iter_content(chunk_size=self.chunk_size),
+            self.relay_buffer // self.chunk_size,
+        )
+        try:
+            with metrics.REGISTRY.phase("relay"):
+                import_request = self.upload_import(
+                    project_name,
+                    project_namespace,
+                    relay,
+                    int(length) if length else None,
                 )
-                count += 1
-                if count == 10:
-                    LOG.error(
-                        "## Project import is taking way too much time, something is wrong! ##"
-                    )
-                if self.verify_api(import_request, "import status request"):
-                    json = import_request.json()
-                    if "import_status" in json.keys():
-                        import_status_str = json["import_status"]
-                        if import_status_str in import_status_success:
-                            LOG.info("## Import Complete! ##")
-                            LOG.debug(
-                                f"## JSON Output of the import: {json} ##"
-                            ) if self.debug else None
-                            import_status_bool = True
-                            break
-                        if import_status_str in import_status_pending:
-                            LOG.info(
-                                f"## ({count}) Import status: {import_status_str.upper()}... ##"
-                            )
-                            LOG.debug(
-                                f"## JSON Output of the import: {json} ##"
-                            ) if self.debug else None
-                        if import_status_str in import_status_failed:
-                            LOG.error(f"## Import has failed! ##")
-                            LOG.debug(
-                                f"## JSON Output of the import: {json} ##"
-                            ) if self.debug else None
-                            exit(1)
-                    else:
-                        import_status_str = import_status_unknown[0]
-                        LOG.info(
-                            f"## ({count}) Import status: {import_status_str.upper()}... ##"
-                        )
-                        LOG.debug(
-                            f"## JSON Output of the import: {json} ##"
-                        ) if self.debug else None
-
-                time.sleep(5)
+        finally:
+            # Wake the download thread up first, it may be blocked reading from the
+            # network (shutdown needs urllib3 >= 2.3, close alone waits for a timeout)
+            shutdown = getattr(download_request.raw, "shutdown", None)
+            shutdown() if shutdown else None
+            download_request.close()
+            relay.close()
+        LOG.info(f"## SHA-256 of the relayed project: {relay.digest.hexdigest()} ##")
+        self.verify_api(import_request, "import")
+        imported_project_id = import_request.json()["id"]
+        self.record("import_requested", imported_project_id=imported_project_id)
+        self.finish_import(project_name, imported_project_id)
+        return imported_project_id
 
     def verify_api(self, request: requests.models.Response, usage: str):
         """
@@ -314,9 +720,7 @@ class API:
         @return: boolean
         """
         if request.status_code >= 200 and request.status_code < 300:
-            LOG.debug(
-                f"#### '{request.url}' API Request is OK ####"
-            ) if self.debug else None
+            LOG.debug("#### '%s' API Request is OK ####", request.url)
             return True
         else:
             LOG.error(
@@ -328,24 +732,113 @@ class API:
         self, download_url: str, directory_name: str, project_id: dict
     ):
         """
-        Function to simply download the exported project locally
+        Function to download the exported project locally, resuming a partial archive
+        with HTTP Range requests & hashing it (SHA-256) while streaming
+        @return: {str} path of the downloaded archive
         """
         LOG.info(
             f"#### Attempting to download the exported project locally | {download_url} ####"
         )
-        download_Request = requests.get(
-            download_url, allow_redirects=True, stream=True, headers=self.head_token
+        os.makedirs(directory_name, exist_ok=True)
+        file_path = os.path.join(directory_name, project_id)
+        partial_path = file_path + ".part"
+        LOG.info(
+            f"## Exported project is being saved under {os.path.abspath(file_path)} ##"
         )
-        if self.verify_api(download_Request, "download"):
-            if not os.path.exists(directory_name):
-                os.makedirs(directory_name)
-            file_path = os.path.join(directory_name, project_id)
-            LOG.info(
-                f"## Exported project is being saved under {os.path.abspath(file_path)} ##"
+        # Only a partial archive of the export the journal recorded may be resumed
+        state = dict(self.checkpoint("download_started") or {})
+        if os.path.exists(partial_path):
+            if state.get("validator"):
+                LOG.info(
+                    f"## Resuming from a partial archive of {os.path.getsize(partial_path)} bytes ##"
+                )
+            else:
+                LOG.info("## Discarding a partial archive of another export ##")
+                os.remove(partial_path)
+
+        with metrics.REGISTRY.phase("download"):
+            for attempt in range(1, transfer.DEFAULT_RETRIES + 1):
+                try:
+                    digest = self.stream_download(download_url, partial_path, state)
+                    break
+                except requests.exceptions.RequestException as error:
+                    LOG.warning(
+                        f"## ({attempt}) Download interrupted, resuming: {error} ##"
+                    )
+                    metrics.REGISTRY.count("download_resumes_total")
+            else:
+                LOG.error(
+                    f"## Download failed after {transfer.DEFAULT_RETRIES} attempts ##"
+                )
+                sys.exit(1)
+
+        os.replace(partial_path, file_path)
+        transfer.write_checksum(file_path, digest.hexdigest())
+        LOG.info(f"## SHA-256 of the exported project: {digest.hexdigest()} ##")
+        return file_path
+
+    def stream_download(self, download_url: str, partial_path: str, state: dict):
+        """
+        Function to append the rest of an archive to `partial_path`, fsync-ing once at
+        the end. `state` holds the validator & size of the export being downloaded: a
+        Range request only resumes it `If-Range` it did not change, else the server
+        sends all of it again
+        @return: hashlib digest of the whole partial archive, re-read from the file
+        """
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        if not state.get("validator"):
+            offset = 0
+        headers = dict(self.head_token)
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = state["validator"]
+        download_Request = self.session.get(
+            download_url, allow_redirects=True, stream=True, headers=headers
+        )
+        start, total = transfer.content_range(download_Request.headers)
+        if offset and download_Request.status_code in (206, 416):
+            total = total or state.get("total")
+            if download_Request.status_code == 416 and total == offset:
+                download_Request.close()
+                LOG.info("## Partial archive is already complete ##")
+                return transfer.file_digest(partial_path, self.chunk_size)
+            if (
+                download_Request.status_code == 416
+                or start != offset
+                or total != (state.get("total") or total)
+            ):
+                download_Request.close()
+                LOG.info("## Partial archive does not match the export, restarting ##")
+                os.remove(partial_path)
+                return self.stream_download(download_url, partial_path, state)
+        self.verify_api(download_Request, "download")
+        if download_Request.status_code != 206:
+            if offset:
+                LOG.info("## Server sent the whole archive, restarting download ##")
+            offset = 0
+            length = download_Request.headers.get("Content-Length")
+            state.update(
+                validator=transfer.download_validator(download_Request.headers),
+                total=int(length) if length else None,
             )
-            with open(file_path, "wb") as f:
-                for chunk in download_Request.iter_content(chunk_size=1024 * 8):
-                    if chunk:
-                        f.write(chunk)
-                        f.flush()
-                        os.fsync(f.fileno())
+            self.record("download_started", **state)
+        digest = (
+            transfer.file_digest(partial_path, self.chunk_size)
+            if offset
+            else hashlib.sha256()
+        )
+        length = download_Request.headers.get("Content-Length")
+        progress = transfer.PROGRESS(
+            "Download", offset + int(length) if length else None, offset
+        )
+        with open(
+            partial_path, "ab" if offset else "wb", buffering=self.chunk_size
+        ) as f:
+            for chunk in download_Request.iter_content(chunk_size=self.chunk_size):
+                f.write(chunk)
+                digest.update(chunk)
+                progress.update(len(chunk))
+            f.flush()
+            os.fsync(f.fileno())
+        progress.close()
+        return digest
@@ -0,0 +1,658 @@
+"""
+Python3 -- Class for Gitlab API, on asyncio
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sys
+import time
+import types
+
+import gitlab
+import metrics
+import transfer
+from polling import POLLER
+from ratelimit import SCHEDULER
+from session import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_PER_PAGE,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_READ_TIMEOUT,
+    SESSION,
+    base_url,
+)
+from slim import SLIM
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+BATCH_STAGES = ["export", "download", "import", "variables"]
+
+
+class ASYNC_API:
+    """
+    Gitlab API functions of gitlab.API on a single event loop, so that many status
+    polls & variable writes can wait at the same time without a thread each
+    """
+
+    def __init__(
+        self,
+        server_url: str,
+        bot_access_token: str,
+        debug: bool,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        poller: POLLER = None,
+        scheduler: SCHEDULER = None,
+        chunk_size: int = transfer.DEFAULT_CHUNK_SIZE,
+        override_params: dict = None,
+        destination_server_url: str = None,
+        destination_access_token: str = None,
+        slim: SLIM = None,
+    ) -> None:
+        """Initiate Async API object, its HTTP session is opened with `async with`"""
+        if aiohttp is None:
+            LOG.error(
+                "## aiohttp is required for the asyncio engine (pip install aiohttp) ##"
+            )
+            sys.exit(1)
+        self.server_url = server_url
+        self.head_token = {"PRIVATE-TOKEN": f"{bot_access_token}"}
+        self.destination_server_url = destination_server_url or server_url
+        self.destination_head_token = {
+            "PRIVATE-TOKEN": f"{destination_access_token or bot_access_token}"
+        }
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(
+            sock_connect=connect_timeout, sock_read=read_timeout
+        )
+        self.poller = poller or POLLER(debug=debug)
+        self.scheduler = scheduler
+        self.chunk_size = chunk_size
+        self.override_params = override_params or {}
+        self.slim = slim
+        self.session = None
+        self.debug = debug
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_size),
+            timeout=self.timeout,
+            headers={"User-Agent": "gitlab-migrator"},
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def request(self, method: str, url: str, **kwargs):
+        """
+        Function to send a request through the pooled connections, waiting for its
+        rate limit & retrying 429/5xx answers when the call & its body can be sent again
+        @return aiohttp.ClientResponse, its body still to be read
+        """
+        attempt = 0
+        while True:
+            name = (
+                await self.scheduler.acquire_async(method, url)
+                if self.scheduler
+                else None
+            )
+            LOG.debug("## %s %s ##", method, url)
+            response = await self.timed(method, url, **kwargs)
+            if self.scheduler is None:
+                return response
+            # The scheduler reads the status the way requests names it
+            delay = self.scheduler.retry_delay(
+                name,
+                method,
+                types.SimpleNamespace(
+                    status_code=response.status,
+                    headers=response.headers,
+                    url=response.url,
+                ),
+                attempt,
+            )
+            if delay is None or not SESSION.rewind(kwargs.get("data")):
+                return response
+            response.release()
+            metrics.REGISTRY.count(
+                "http_retries_total", endpoint=name, status=response.status
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def timed(self, method: str, url: str, **kwargs):
+        """
+        Function to send a single request, counting it & timing it until its headers
+        @return aiohttp.ClientResponse
+        """
+        endpoint = SCHEDULER.classify(method, url)
+        started_at = time.monotonic()
+        try:
+            response = await self.session.request(method, url, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            metrics.REGISTRY.count(
+                "http_requests_total", method=method, endpoint=endpoint, status="error"
+            )
+            raise
+        metrics.REGISTRY.observe(
+            "http_request_seconds",
+            time.monotonic() - started_at,
+            method=method,
+            endpoint=endpoint,
+        )
+        metrics.REGISTRY.count(
+            "http_requests_total",
+            method=method,
+            endpoint=endpoint,
+            status=response.status,
+        )
+        return response
+
+    async def paginate(
+        self,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        per_page: int = DEFAULT_PER_PAGE,
+    ):
+        """
+        Function to lazily walk every page of a Gitlab list endpoint, following the
+        `Link` header and falling back on `X-Next-Page`
+        @return: async generator of {json} items
+        """
+        params = dict(params or {})
+        params.setdefault("per_page", per_page)
+        page = 1
+        while url:
+            response = await self.request("GET", url, headers=headers, params=params)
+            if response.status != 200:
+                LOG.error(
+                    f"## Unable to fetch page {page} of '{response.url}'. Code: {response.status} | Reason: {response.reason} | Text: {await response.text()} ##"
+                )
+                sys.exit(1)
+            items = await response.json()
+            LOG.debug("## Page %s of '%s' returned %s items ##", page, url, len(items))
+            for item in items:
+                yield item
+            page += 1
+            if "next" in response.links:
+                url, params = str(response.links["next"]["url"]), None
+            elif response.headers.get("X-Next-Page"):
+                params = dict(params or {}, page=response.headers["X-Next-Page"])
+            else:
+                url = None
+
+    async def verify_api(self, response, usage: str):
+        """
+        Function to check for Valid API status codes
+        @return: boolean
+        """
+        if 200 <= response.status < 300:
+            LOG.debug("#### '%s' API Request is OK ####", response.url)
+            return True
+        LOG.error(
+            f"## '{response.url}' API is NOT OK -- Aborting the {usage}. Code: {response.status} | Reason: {response.reason} | Text: {await response.text()} ##"
+        )
+        sys.exit(1)
+
+    async def copy_source_variables(self, source_url: str, source_headers: dict):
+        """
+        Function to lazily copy all variables of the source, page by page
+        @return: async generator of {json} variables
+        """
+        LOG.info("#### Grabbing variables from Source ####")
+        count = 0
+        async for variable in self.paginate(source_url, headers=source_headers):
+            count += 1
+            LOG.debug(
+                "## Variable from Source: %s (%s) ##",
+                variable["key"],
+                variable["environment_scope"],
+            )
+            yield variable
+        LOG.info(f"## Total variables found: {count} ##")
+        if count == 0:
+            LOG.error("## No variables found in source. Skipping migration process ##")
+            sys.exit(1)
+
+    async def paste_destination_variable(self, url: str, headers: dict, variable: dict):
+        """
+        Function to copy one variable to the destination project
+        @return: None, or the reason the write failed
+        """
+        data = {
+            field: variable[field]
+            for field in gitlab.VARIABLE_FIELDS + ["key", "environment_scope"]
+        }
+        LOG.info(f"## Pasting ({variable['key']}) ##")
+        LOG.debug("## Details for %s: %s ##", variable["key"], data)
+        try:
+            response = await self.request("POST", url, headers=headers, data=data)
+            text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            # A timeout has no message of its own
+            return str(error) or type(error).__name__
+        if not 200 <= response.status < 300:
+            return f"Code: {response.status} | Text: {text}"
+        return None
+
+    async def migrate_variables(
+        self,
+        source_vars,
+        destination_url: str,
+        destination_header: dict,
+        concurrency: int = 1,
+    ):
+        """
+        Function to Copy/Paste all variables from our source to the destination,
+        pasting up to `concurrency` variables at the same time
+        @return: list of failed variables as (key, environment_scope, reason) tuples
+        """
+        LOG.info(f"#### Pasting variables with a concurrency of {concurrency} ####")
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def paste(variable: dict):
+            async with semaphore:
+                reason = await self.paste_destination_variable(
+                    destination_url, destination_header, variable
+                )
+            return variable["key"], variable["environment_scope"], reason
+
+        with metrics.REGISTRY.phase("variables"):
+            pasting = [
+                asyncio.ensure_future(paste(variable)) async for variable in source_vars
+            ]
+            results = await asyncio.gather(*pasting)
+        failures = [result for result in results if result[2] is not None]
+        LOG.info(
+            f"## {len(results) - len(failures)}/{len(results)} variables written successfully ##"
+        )
+        for key, environment_scope, reason in failures:
+            LOG.error(f"## Failed to write ({key}) [{environment_scope}] | {reason} ##")
+        return failures
+
+    async def request_export(self, project_id: str):
+        """
+        Function to export a project
+        @return aiohttp.ClientResponse
+        """
+        LOG.info(
+            f"#### Requesting export from Gitlab API for project: {project_id} ####"
+        )
+        return await self.request(
+            "POST",
+            f"{base_url(self.server_url)}/api/v4/projects/{project_id}/export",
+            headers=self.head_token,
+        )
+
+    async def request_export_status(self, project_id: str):
+        """
+        Function to check the current status of an export
+        @return aiohttp.ClientResponse
+        """
+        LOG.info(f"#### Checking export status of project: {project_id} ####")
+        return await self.request(
+            "GET",
+            f"{base_url(self.server_url)}/api/v4/projects/{project_id}/export",
+            headers=self.head_token,
+        )
+
+    async def wait_for_export(self, project_id: str):
+        """
+        Function to poll the export status until the archive is ready to be downloaded
+        @return: {json} export status holding the download `_links`
+        """
+        LOG.info("## Waiting to complete exporting... ##")
+
+        async def check(count: int):
+            export_request = await self.request_export_status(project_id)
+            await self.verify_api(export_request, "export status request")
+            json = await export_request.json()
+            export_status_str = json.get("export_status", "unknown")
+            if (
+                export_status_str in gitlab.EXPORT_STATUS_SUCCESS
+                and "_links" in json.keys()
+            ):
+                LOG.info(f"## [{project_id}] Export Complete! ##")
+                return True, json
+            LOG.info(
+                f"## [{project_id}] ({count}) Export status: {export_status_str.upper()}... ##"
+            )
+            return False, json
+
+        return await self.poller.poll_async(check, "export")
+
+    async def download_from_url(
+        self, download_url: str, directory_name: str, file_name: str
+    ):
+        """
+        Function to download an exported project locally, resuming an interrupted
+        transfer with HTTP Range requests & hashing it (SHA-256) while streaming
+        @return: {str} path of the downloaded archive
+        """
+        LOG.info(
+            f"#### Attempting to download the exported project locally | {download_url} ####"
+        )
+        os.makedirs(directory_name, exist_ok=True)
+        file_path = os.path.join(directory_name, file_name)
+        partial_path = file_path + ".part"
+        # No journal to tell which export a partial archive belongs to
+        if os.path.exists(partial_path):
+            LOG.info("## Discarding a partial archive of another export ##")
+            os.remove(partial_path)
+        state = {}
+
+        with metrics.REGISTRY.phase("download"):
+            for attempt in range(1, transfer.DEFAULT_RETRIES + 1):
+                try:
+                    digest = await self.stream_download(
+                        download_url, partial_path, state
+                    )
+                    break
+                except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                    LOG.warning(
+                        f"## ({attempt}) Download interrupted, resuming: {error!r} ##"
+                    )
+                    metrics.REGISTRY.count("download_resumes_total")
+            else:
+                LOG.error(
+                    f"## Download failed after {transfer.DEFAULT_RETRIES} attempts ##"
+                )
+                sys.exit(1)
+
+        os.replace(partial_path, file_path)
+        transfer.write_checksum(file_path, digest.hexdigest())
+        LOG.info(f"## SHA-256 of the exported project: {digest.hexdigest()} ##")
+        return file_path
+
+    async def stream_download(self, download_url: str, partial_path: str, state: dict):
+        """
+        Function to append the rest of an archive to `partial_path`, writing from a
+        worker thread so the event loop keeps serving the other transfers. `state`
+        holds the validator & size of the export, a Range request only resuming it
+        `If-Range` it did not change
+        @return: hashlib digest of the whole partial archive, re-read from the file
+        """
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        if not state.get("validator"):
+            offset = 0
+        headers = dict(self.head_token)
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = state["validator"]
+        response = await self.request("GET", download_url, headers=headers)
+        start, total = transfer.content_range(response.headers)
+        if offset and response.status in (206, 416):
+            total = total or state.get("total")
+            if response.status == 416 and total == offset:
+                response.release()
+                LOG.info("## Partial archive is already complete ##")
+                return await asyncio.to_thread(
+                    transfer.file_digest, partial_path, self.chunk_size
+                )
+            if (
+                response.status == 416
+                or start != offset
+                or total != (state.get("total") or total)
+            ):
+                response.release()
+                LOG.info("## Partial archive does not match the export, restarting ##")
+                os.remove(partial_path)
+                return await self.stream_download(download_url, partial_path, state)
+        async with response:
+            await self.verify_api(response, "download")
+            if response.status != 206:
+                if offset:
+                    LOG.info("## Server sent the whole archive, restarting download ##")
+                offset = 0
+                state.update(
+                    validator=transfer.download_validator(response.headers),
+                    total=response.content_length,
+                )
+            digest = (
+                await asyncio.to_thread(
+                    transfer.file_digest, partial_path, self.chunk_size
+                )
+                if offset
+                else hashlib.sha256()
+            )
+            progress = transfer.PROGRESS(
+                "Download",
+                offset + response.content_length if response.content_length else None,
+                offset,
+            )
+            with open(
+                partial_path, "ab" if offset else "wb", buffering=self.chunk_size
+            ) as f:
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    await asyncio.to_thread(f.write, chunk)
+                    digest.update(chunk)
+                    progress.update(len(chunk))
+                f.flush()
+                await asyncio.to_thread(os.fsync, f.fileno())
+            progress.close()
+        return digest
+
+    async def finish_export(self, project_id: str):
+        """
+        Function to request the export of a project & wait until it is ready
+        @return: {json} download `_links` of the export
+        """
+        with metrics.REGISTRY.phase("export_request"):
+            await self.verify_api(await self.request_export(project_id), "export")
+        with metrics.REGISTRY.phase("export_wait"):
+            return (await self.wait_for_export(project_id))["_links"]
+
+    async def export_project(
+        self, project_id: str, directory_name: str = "exported_projects"
+    ):
+        """
+        Function that handles exporting the project, waiting for it & downloading it
+        @return: {str} path of the archive
+        """
+        LOG.info(f"#### Processing the export of project: {project_id} ####")
+        links = await self.finish_export(project_id)
+        return await self.slim_archive(
+            await self.download_from_url(
+                links["api_url"], directory_name, f"{project_id}.tar.gz"
+            )
+        )
+
+    async def slim_archive(self, file_path: str):
+        """
+        Function to slim a downloaded archive from a worker thread, if asked to
+        @return: {str} path of the archive
+        """
+        if self.slim is None:
+            return file_path
+        return await asyncio.to_thread(self.slim.rewrite, file_path)
+
+    async def request_import(
+        self, project_path: str, project_namespace: str, upload_from: str
+    ):
+        """
+        Function to send the import POST request, streaming the archive from a worker
+        thread in `chunk_size` chunks
+        @return aiohttp.ClientResponse
+        """
+        LOG.info(
+            f"#### Requesting import from Gitlab API for project: {project_path} ####"
+        )
+        import_data = {
+            "path": project_path,
+            "namespace": project_namespace,
+        }
+        for name, value in self.override_params.items():
+            import_data[f"override_params[{name}]"] = value
+        file_size = os.path.getsize(upload_from)
+        with open(upload_from, "rb") as f:
+            body = transfer.MULTIPART(
+                import_data,
+                "file",
+                "Upload_Me.tar.gz",
+                f,
+                file_size,
+                self.chunk_size,
+                transfer.PROGRESS("Upload", file_size),
+            )
+
+            async def chunks():
+                iterator = iter(body)
+                while True:
+                    chunk = await asyncio.to_thread(next, iterator, None)
+                    if chunk is None:
+                        return
+                    yield chunk
+
+            # An explicit Content-Length keeps aiohttp from a chunked upload
+            import_request = await self.request(
+                "POST",
+                f"{base_url(self.destination_server_url)}/api/v4/projects/import",
+                data=chunks(),
+                headers=dict(
+                    self.destination_head_token,
+                    **{
+                        "Content-Type": body.content_type,
+                        "Content-Length": str(body.len),
+                    },
+                ),
+            )
+        body.progress.close()
+        return import_request
+
+    async def request_import_status(self, project_name: str, project_id: str):
+        """
+        Function to send a GET request and check for the status of an import
+        @return aiohttp.ClientResponse
+        """
+        LOG.info(f"#### Checking import status of project: {project_name} ####")
+        return await self.request(
+            "GET",
+            f"{base_url(self.destination_server_url)}/api/v4/projects/{project_id}/import",
+            headers=self.destination_head_token,
+        )
+
+    async def wait_for_import(self, project_name: str, imported_project_id: str):
+        """
+        Function to poll the import status until the imported project is ready
+        @return: {json} import status
+        """
+        LOG.info("## Waiting to complete importing... ##")
+
+        async def check(count: int):
+            import_request = await self.request_import_status(
+                project_name, imported_project_id
+            )
+            await self.verify_api(import_request, "import status request")
+            json = await import_request.json()
+            import_status_str = json.get("import_status", "unknown")
+            if import_status_str in gitlab.IMPORT_STATUS_SUCCESS:
+                LOG.info(f"## [{project_name}] Import Complete! ##")
+                return True, json
+            if import_status_str in gitlab.IMPORT_STATUS_FAILED:
+                LOG.error(
+                    f"## [{project_name}] Import has failed! | Error: {json.get('import_error')} ##"
+                )
+                sys.exit(1)
+            LOG.info(
+                f"## [{project_name}] ({count}) Import status: {import_status_str.upper()}... ##"
+            )
+            return False, json
+
+        return await self.poller.poll_async(check, "import")
+
+    async def import_project(self, project_path: str, upload_from: str):
+        """
+        Function that processes the import procedure
+        @return: {str} ID of the imported project
+        """
+        LOG.info(f"#### Processing the import of project: {project_path} ####")
+        project_name = os.path.basename(project_path)
+        with metrics.REGISTRY.phase("upload"):
+            import_request = await self.request_import(
+                project_name, os.path.dirname(project_path), upload_from
+            )
+            await self.verify_api(import_request, "import")
+        imported_project_id = (await import_request.json())["id"]
+        with metrics.REGISTRY.phase("import_wait"):
+            await self.wait_for_import(project_name, imported_project_id)
+        return imported_project_id
+
+    async def run_batch(self, jobs: list, workers: dict, tokens, concurrency: int = 1):
+        """
+        Function to migrate every job as its own coroutine, each stage limited to its
+        number of `workers` at once; `tokens(job)` is run in a worker thread & returns
+        (source_url, source_header, destination_url, destination_header)
+        @return: list of keys of the failed jobs
+        """
+        LOG.info(f"#### Starting asyncio batch migration of {len(jobs)} projects ####")
+        semaphores = {
+            stage: asyncio.Semaphore(max(workers.get(stage, 1), 1))
+            for stage in BATCH_STAGES
+        }
+
+        async def migrate(job: dict):
+            stage = None
+            try:
+                if job["migrate_project"]:
+                    stage = "export"
+                    async with semaphores[stage]:
+                        links = await self.finish_export(job["source_project_id"])
+                    stage = "download"
+                    async with semaphores[stage]:
+                        archive = await self.slim_archive(
+                            await self.download_from_url(
+                                links["api_url"],
+                                "exported_projects",
+                                f"{job['source_project_id']}.tar.gz",
+                            )
+                        )
+                    stage = "import"
+                    async with semaphores[stage]:
+                        job["destination_project_id"] = str(
+                            await self.import_project(job["path_import"], archive)
+                        )
+                if job["migrate_variables"]:
+                    stage = "variables"
+                    async with semaphores[stage]:
+                        (
+                            source_url,
+                            source_header,
+                            destination_url,
+                            destination_header,
+                        ) = await asyncio.to_thread(tokens, job)
+                        if await self.migrate_variables(
+                            self.copy_source_variables(source_url, source_header),
+                            destination_url,
+                            destination_header,
+                            concurrency,
+                        ):
+                            sys.exit(1)
+            except (Exception, SystemExit) as error:
+                LOG.error(
+                    f"## [{job['key']}] Failed during the '{stage}' stage: {error!r} ##"
+                )
+                return job["key"]
+            LOG.info(f"## [{job['key']}] Completed every stage ##")
+            return None
+
+        failed = [key for key in await asyncio.gather(*map(migrate, jobs)) if key]
+        LOG.info(
+            f"## Batch complete: {len(jobs) - len(failed)}/{len(jobs)} projects migrated ##"
+        )
+        return failed
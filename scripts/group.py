@@ -0,0 +1,164 @@
+"""
+Python3 -- Class for a Gitlab group migration
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import logging
+import os
+import posixpath
+import sys
+import urllib.parse
+
+import gitlab
+from session import base_url
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+
+class GROUP:
+    """Gitlab group whose projects are mirrored under another group"""
+
+    def __init__(
+        self,
+        api: gitlab.API,
+        source_group: str,
+        destination_group: str,
+        debug: bool,
+    ) -> None:
+        """Initiate Group object, `api` holds the session & tokens of both servers"""
+        self.api = api
+        self.source_group = source_group
+        self.destination_group = destination_group
+        self.destination_full_path = None
+        self.debug = debug
+
+    def source_url(self, group: str, resource: str = ""):
+        """
+        Function to build the API URL of a source group (ID or full path)
+        @return: str
+        """
+        return f"{base_url(self.api.server_url)}/api/v4/groups/{urllib.parse.quote(str(group), safe='')}{resource}"
+
+    def destination_url(self, group: str, resource: str = ""):
+        """
+        Function to build the API URL of a destination group (ID or full path)
+        @return: str
+        """
+        return f"{base_url(self.api.destination_server_url)}/api/v4/groups/{urllib.parse.quote(str(group), safe='')}{resource}"
+
+    def get_group(self, url: str, headers: dict):
+        """
+        Function to fetch a group
+        @return: {json} group, or None if it does not exist
+        """
+        request = self.api.session.get(url, headers=headers)
+        if request.status_code == 404:
+            return None
+        self.api.verify_api(request, "group lookup")
+        return request.json()
+
+    def ensure_namespace(self, full_path: str):
+        """
+        Function to create a destination (sub)group & its missing parents
+        @return: {json} group
+        """
+        group = self.get_group(
+            self.destination_url(full_path), self.api.destination_head_token
+        )
+        if group:
+            return group
+        parent_path, path = posixpath.split(full_path)
+        if not parent_path:
+            LOG.error(f"## Top level group '{full_path}' does not exist ##")
+            sys.exit(1)
+        parent = self.ensure_namespace(parent_path)
+        LOG.info(f"## Creating destination subgroup: {full_path} ##")
+        request = self.api.session.post(
+            f"{base_url(self.api.destination_server_url)}/api/v4/groups",
+            headers=self.api.destination_head_token,
+            data={"name": path, "path": path, "parent_id": parent["id"]},
+        )
+        self.api.verify_api(request, "subgroup creation")
+        return request.json()
+
+    def list_jobs(self, migrate_variables: bool, create_namespaces: bool = True):
+        """
+        Function to page through every project of the source group & its subgroups, and
+        map each of them to the same relative path under the destination group, whose
+        missing subgroups are created unless `create_namespaces` is False
+        @return: list of job dicts
+        """
+        LOG.info(f"#### Listing projects of group: {self.source_group} ####")
+        source = self.get_group(self.source_url(self.source_group), self.api.head_token)
+        if source is None:
+            LOG.error(f"## Source group '{self.source_group}' does not exist ##")
+            sys.exit(1)
+        if create_namespaces:
+            destination = self.ensure_namespace(str(self.destination_group))
+        else:
+            destination = self.get_group(
+                self.destination_url(self.destination_group),
+                self.api.destination_head_token,
+            )
+            if destination is None:
+                LOG.error(
+                    f"## Destination group '{self.destination_group}' does not exist ##"
+                )
+                sys.exit(1)
+        self.destination_full_path = destination["full_path"]
+
+        jobs = []
+        namespaces = set()
+        for project in self.api.session.paginate(
+            self.source_url(self.source_group, "/projects"),
+            headers=self.api.head_token,
+            params={"include_subgroups": "true", "archived": "false"},
+        ):
+            relative_namespace = posixpath.relpath(
+                project["namespace"]["full_path"], source["full_path"]
+            )
+            namespace = posixpath.normpath(
+                posixpath.join(destination["full_path"], relative_namespace)
+            )
+            namespaces.add(namespace)
+            path_import = f"{namespace}/{project['path']}"
+            jobs.append(
+                {
+                    "key": f"{project['id']}->{path_import}",
+                    "source_project_id": str(project["id"]),
+                    "path_import": path_import,
+                    "destination_project_id": "",
+                    "migrate_project": True,
+                    "migrate_variables": migrate_variables,
+                }
+            )
+        LOG.info(f"## Total projects found in group: {len(jobs)} ##")
+        for namespace in sorted(namespaces) if create_namespaces else []:
+            self.ensure_namespace(namespace)
+        return jobs
+
+    def migrate_variables(self, concurrency: int = 1):
+        """
+        Function to copy the group level CI/CD variables to the destination group
+        @return: list of failed variables as (key, environment_scope, reason) tuples
+        """
+        LOG.info("#### Migrating group variables ####")
+        variables = []
+        for variable in self.api.session.paginate(
+            self.source_url(self.source_group, "/variables"),
+            headers=self.api.head_token,
+        ):
+            variable.setdefault("environment_scope", "*")
+            variables.append(variable)
+        LOG.info(f"## Total group variables found: {len(variables)} ##")
+        return self.api.migrate_variables(
+            variables,
+            self.destination_url(self.destination_group, "/variables"),
+            self.api.destination_head_token,
+            concurrency,
+        )
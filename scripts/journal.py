@@ -0,0 +1,118 @@
+"""
+Python3 -- Class for a crash-safe migration journal
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+DEFAULT_JOURNAL_PATH = os.path.join("exported_projects", "journal.jsonl")
+
+
+class JOURNAL:
+    """
+    Append-only JSON lines journal of the stages every project went through:
+    export_requested, export_finished, download_started, downloaded, import_requested,
+    import_finished & variables_synced
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_JOURNAL_PATH,
+        resume: bool = False,
+        debug: bool = False,
+    ) -> None:
+        """Initiate Journal object, only reading previous runs when resuming"""
+        self.path = path
+        self.resume = resume
+        self.debug = debug
+        self.lock = threading.Lock()
+        self.projects = self.load() if resume else {}
+        self.started = set()
+
+    def load(self):
+        """
+        Function to replay the journal, ignoring a torn last line
+        @return: dict of {key: {stage: data}}
+        """
+        projects = {}
+        if not os.path.exists(self.path):
+            return projects
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                stages = projects.setdefault(entry["key"], {})
+                if entry["stage"] == "new":
+                    stages.clear()
+                elif entry["stage"] == "reset":
+                    for stage in entry["data"]["stages"]:
+                        stages.pop(stage, None)
+                else:
+                    stages[entry["stage"]] = entry["data"]
+        LOG.info(f"## Resuming {len(projects)} projects from journal {self.path} ##")
+        return projects
+
+    def append(self, key: str, stage: str, data: dict):
+        """
+        Function to durably append one entry to the journal
+        """
+        line = json.dumps(
+            {"key": key, "stage": stage, "time": time.time(), "data": data}
+        )
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def start(self, key: str):
+        """
+        Function to forget the previous runs of a project, unless resuming
+        """
+        with self.lock:
+            if self.resume or key in self.started:
+                return
+            self.started.add(key)
+        self.append(key, "new", {})
+
+    def record(self, key: str, stage: str, **data):
+        """
+        Function to record that a project completed a stage
+        """
+        self.start(key)
+        with self.lock:
+            self.projects.setdefault(key, {})[stage] = data
+        self.append(key, stage, data)
+        LOG.debug("## [%s] Journal: %s %s ##", key, stage, data)
+
+    def reset(self, key: str, stages: list):
+        """
+        Function to forget stages of a project that have to be run again
+        """
+        with self.lock:
+            for stage in stages:
+                self.projects.get(key, {}).pop(stage, None)
+        self.append(key, "reset", {"stages": stages})
+
+    def get(self, key: str, stage: str):
+        """
+        Function to find the data recorded when a project completed a stage
+        @return: dict, or None if the stage was not completed
+        """
+        with self.lock:
+            return self.projects.get(key, {}).get(stage)
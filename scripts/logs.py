@@ -0,0 +1,131 @@
+"""
+Python3 -- Logging setup shared by every module: text or JSON lines, with redaction
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+BASIC_FORMAT = "[%(levelname)s]:[%(filename)s:%(lineno)s - %(funcName)s()] %(message)s"
+REDACTED = "[REDACTED]"
+# Token headers, token/value fields of a logged dict or JSON, and Gitlab personal tokens
+SECRET_PATTERNS = [
+    re.compile(r"""(PRIVATE-TOKEN['"]?\s*[:=]\s*['"]?)[^'"\s,}]+"""),
+    re.compile(r"""(['"](?:token|value)['"]\s*:\s*['"])[^'"]*"""),
+    re.compile(r"(glpat-)[\w-]+"),
+]
+# Attributes of every LogRecord, anything else was passed with `extra=`
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class LAZY:
+    """Log argument only computed when the record is actually emitted"""
+
+    def __init__(self, function, *args, **kwargs) -> None:
+        """Initiate Lazy object"""
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.function(*self.args, **self.kwargs))
+
+
+class REDACT_FILTER(logging.Filter):
+    """Masks known secrets & secret looking fields in every emitted message"""
+
+    def __init__(self) -> None:
+        """Initiate Redact Filter object"""
+        super().__init__()
+        self.secrets = set()
+        self.lock = threading.Lock()
+
+    def add(self, secret: str):
+        """
+        Function to mask a secret value, e.g. an access token, wherever it is logged
+        """
+        if secret:
+            with self.lock:
+                self.secrets.add(str(secret))
+
+    def redact(self, message: str):
+        """
+        Function to mask the secrets of a message
+        @return: str
+        """
+        with self.lock:
+            secrets = sorted(self.secrets, key=len, reverse=True)
+        for secret in secrets:
+            message = message.replace(secret, REDACTED)
+        for pattern in SECRET_PATTERNS:
+            message = pattern.sub(rf"\1{REDACTED}", message)
+        return message
+
+    def filter(self, record: logging.LogRecord):
+        record.msg = self.redact(record.getMessage())
+        record.args = None
+        return True
+
+
+class JSON_FORMATTER(logging.Formatter):
+    """One JSON object per line, with the `extra=` fields of the record"""
+
+    def format(self, record: logging.LogRecord):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "file": record.filename,
+            "line": record.lineno,
+            "function": record.funcName,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        entry.update(
+            {
+                name: value
+                for name, value in vars(record).items()
+                if name not in RECORD_ATTRIBUTES
+            }
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+REDACTION = REDACT_FILTER()
+
+
+def secret(value: str):
+    """
+    Function to mask a secret value in every later log message
+    """
+    REDACTION.add(value)
+
+
+def setup(debug: bool = False, json_lines: bool = False, stream=None):
+    """
+    Function to configure the logger shared by every module, once per run
+    @return: logging.Logger
+    """
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(
+        JSON_FORMATTER() if json_lines else logging.Formatter(BASIC_FORMAT)
+    )
+    handler.addFilter(REDACTION)
+    for previous in list(LOG.handlers):
+        LOG.removeHandler(previous)
+    LOG.addHandler(handler)
+    LOG.setLevel(logging.DEBUG if debug else logging.INFO)
+    LOG.propagate = False
+    return LOG
@@ -0,0 +1,191 @@
+"""
+Python3 -- Class for run metrics, written as JSON or a Prometheus textfile
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+PREFIX = "gitlab_migrator_"
+# Seconds, from a fast API call up to a long export/import wait
+DEFAULT_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600]
+
+
+class HISTOGRAM:
+    """Cumulative histogram of observed values, in the Prometheus layout"""
+
+    def __init__(self, buckets: list = None) -> None:
+        """Initiate Histogram object"""
+        self.buckets = buckets or DEFAULT_BUCKETS
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """
+        Function to count a value in every bucket it fits in
+        """
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class METRICS:
+    """Counters & histograms of a run, labelled like Prometheus metrics"""
+
+    def __init__(self) -> None:
+        """Initiate Metrics object"""
+        self.counters = {}
+        self.histograms = {}
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(name: str, labels: dict):
+        """
+        Function to build the key of a metric from its name & labels
+        @return: tuple
+        """
+        return name, tuple(
+            sorted((label, str(value)) for label, value in labels.items())
+        )
+
+    def count(self, name: str, value: float = 1, **labels):
+        """
+        Function to add `value` to a counter
+        """
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Function to add a value to a histogram
+        """
+        key = self.key(name, labels)
+        with self.lock:
+            self.histograms.setdefault(key, HISTOGRAM()).observe(value)
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Function to time a phase of the migration, failed or not
+        """
+        started_at = time.monotonic()
+        outcome = "failed"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            self.observe(
+                "phase_seconds",
+                time.monotonic() - started_at,
+                phase=name,
+                outcome=outcome,
+            )
+
+    def summary(self):
+        """
+        Function to gather every metric, with the throughput of every transfer direction
+        @return: dict
+        """
+        with self.lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "mean": histogram.sum / histogram.count if histogram.count else 0,
+                    "buckets": dict(zip(map(str, histogram.buckets), histogram.counts)),
+                }
+                for (name, labels), histogram in sorted(self.histograms.items())
+            ]
+            throughput = {
+                dict(labels)["direction"]: self.counters[(name, labels)]
+                / max(self.counters.get(("transfer_seconds_total", labels), 0), 1e-6)
+                for (name, labels) in self.counters
+                if name == "transfer_bytes_total"
+            }
+        return {
+            "started_at": self.started_at,
+            "duration_seconds": time.time() - self.started_at,
+            "counters": counters,
+            "histograms": histograms,
+            "throughput_bytes_per_second": throughput,
+        }
+
+    def write_json(self, path: str):
+        """
+        Function to write the summary of the run as JSON
+        """
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2, sort_keys=True)
+        LOG.info(f"## Metrics written to {path} ##")
+
+    def write_prometheus(self, path: str):
+        """
+        Function to atomically write every metric in the Prometheus textfile format
+        """
+
+        def labels_text(labels: dict):
+            if not labels:
+                return ""
+            return (
+                "{"
+                + ",".join(f'{label}="{value}"' for label, value in labels.items())
+                + "}"
+            )
+
+        summary = self.summary()
+        lines, typed = [], set()
+        for counter in summary["counters"]:
+            name = PREFIX + counter["name"]
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{labels_text(counter['labels'])} {counter['value']}")
+        for histogram in summary["histograms"]:
+            name = PREFIX + histogram["name"]
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            for bound, count in list(histogram["buckets"].items()) + [
+                ("+Inf", histogram["count"])
+            ]:
+                lines.append(
+                    f"{name}_bucket{labels_text(dict(histogram['labels'], le=bound))} {count}"
+                )
+            lines.append(
+                f"{name}_sum{labels_text(histogram['labels'])} {histogram['sum']}"
+            )
+            lines.append(
+                f"{name}_count{labels_text(histogram['labels'])} {histogram['count']}"
+            )
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temporary_path, path)
+        LOG.info(f"## Prometheus metrics written to {path} ##")
+
+
+# Shared by every module of a run, like the root logger
+REGISTRY = METRICS()
@@ -10,18 +10,36 @@ LOG readability (Info, Error, Debug):
 """
 
 import argparse
+import asyncio
+import atexit
 import logging
 import os
+import re
 import sys
 
+import batch
+import cache
+import fanout
 import gitlab
+import gitlab_async
+import group
+import journal
+import logs
+import metrics
+import polling
+import preflight
 import project as init
+import ratelimit
+import session as http
+import settings
+import slim
+import tokens
+import transfer
+import verify
+import workqueue
 
 __appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
 LOG = logging.getLogger(__appname__)
-BASIC_FORMAT = "[%(levelname)s]:[%(filename)s:%(lineno)s - %(funcName)s()] %(message)s"
-logging.basicConfig(format=BASIC_FORMAT)
-LOG.setLevel(logging.DEBUG)
 
 
 def parse_args():
@@ -33,13 +51,47 @@ def parse_args():
         description="Minimal script to Migrate CI/CD variables from 1 project to another in Gitlab",
         usage="%(prog)s "
         "[-u GITLAB_SERVER_URL] "
+        "[-du DESTINATION_GITLAB_SERVER_URL] "
         "[-mv] "
+        "[-sv [--delete_extra] [--dry_run]] "
         "[-mp] "
+        "[-ms] "
         "[-p GITLAB_PATH_FOR_PROJECT_IMPORT] "
         "[-f LOCAL_PATH_FOR_PROJECT_IMPORT] "
+        "[-o NAME=VALUE ...] "
+        "[-m MANIFEST [--export_workers N] [--download_workers N] [--import_workers N] [--variable_workers N] [--settings_workers N] [--verify_workers N]] "
+        "[-sg SOURCE_GROUP -dg DESTINATION_GROUP] "
+        "[--preflight PLAN_PATH [--preflight_batch N]] "
+        "[--queue PATH [--worker_id ID] [--lease SECONDS] [--queue_claim N]] "
+        "[-fo DESTINATION_PROJECT_ID[,...] ...] [-fg DESTINATION_GROUP] [--fan_out_workers N] "
+        "[--disk_budget GIB] "
+        "[--export_cache GIB] "
+        "[--slim PATTERN ...] [--slim_max_mib MIB] [--slim_threads N] "
         "[-s SOURCE_PROJECT_ID] "
         "[-d DESTINATION_PROJECT_ID] "
         "[-ba BOT_ACCESS_TOKEN] "
+        "[-dba DESTINATION_BOT_ACCESS_TOKEN] "
+        "[-r [--relay_buffer MIB]] "
+        "[--journal PATH] "
+        "[--resume] "
+        "[--token_store PATH] "
+        "[--token_days DAYS] "
+        "[--cleanup_tokens] "
+        "[--verify] "
+        "[--async] "
+        "[--metrics_json PATH] "
+        "[--metrics_prom PATH] "
+        "[--concurrency N] "
+        "[--rate_limit CLASS=REQUESTS/SECONDS ...] "
+        "[--max_retries N] "
+        "[--pool_size POOL_SIZE] "
+        "[--connect_timeout SECONDS] "
+        "[--read_timeout SECONDS] "
+        "[--chunk_size MIB] "
+        "[--poll_first_delay SECONDS] "
+        "[--poll_max_delay SECONDS] "
+        "[--poll_timeout SECONDS] "
+        "[--log_json] "
         "[-D]",
         formatter_class=argparse.RawTextHelpFormatter,
     )
@@ -54,7 +106,16 @@ def parse_args():
         action="store",
         default="",
         required=True,
-        help="Gitlab Server URL",
+        help="Gitlab Server URL, over https unless a scheme is given (http://host:port)",
+    )
+    parser.add_argument(
+        "-du",
+        "--destination_server_url",
+        dest="destination_server_url",
+        action="store",
+        default="",
+        required=False,
+        help="Gitlab Server URL of the destination, if different from the source",
     )
     parser.add_argument(
         "-mv",
@@ -65,6 +126,31 @@ def parse_args():
         required=False,
         help="Enables variable migration",
     )
+    parser.add_argument(
+        "-sv",
+        "--sync_variables",
+        dest="sync_variables",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Enables incremental variable sync (only writes what changed)",
+    )
+    parser.add_argument(
+        "--delete_extra",
+        dest="delete_extra",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Delete destination variables missing from the source when syncing",
+    )
+    parser.add_argument(
+        "--dry_run",
+        dest="dry_run",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Only print the variable sync plan, without writing anything",
+    )
     parser.add_argument(
         "-mp",
         "--migrate_project",
@@ -74,6 +160,16 @@ def parse_args():
         required=False,
         help="Enables full project migration",
     )
+    parser.add_argument(
+        "-ms",
+        "--migrate_settings",
+        dest="migrate_settings",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Re-create what the export does not carry on the imported project:\n"
+        + ", ".join(settings.RESOURCES),
+    )
     parser.add_argument(
         "-p",
         "--path_import",
@@ -90,7 +186,212 @@ def parse_args():
         action="store",
         default="",
         required=False,
-        help="Local file of the project to be imported",
+        help="Local file of the project to be imported (default: the exported archive)",
+    )
+    parser.add_argument(
+        "-o",
+        "--override_param",
+        dest="override_params",
+        action="append",
+        metavar="NAME=VALUE",
+        default=[],
+        required=False,
+        help="Project setting overridden on import, as override_params[NAME]=VALUE (repeatable)",
+    )
+    parser.add_argument(
+        "-m",
+        "--manifest",
+        dest="manifest",
+        action="store",
+        default="",
+        required=False,
+        help="CSV/YAML file listing many projects to migrate in one run\n"
+        "(source_project_id, path, namespace, destination_project_id, migrate_project, migrate_variables)",
+    )
+    parser.add_argument(
+        "-sg",
+        "--source_group",
+        dest="source_group",
+        action="store",
+        default="",
+        required=False,
+        help="Source group ID or path, every project of it & its subgroups is migrated",
+    )
+    parser.add_argument(
+        "-dg",
+        "--destination_group",
+        dest="destination_group",
+        action="store",
+        default="",
+        required=False,
+        help="Destination group ID or path, mirroring the subgroups of the source group",
+    )
+    parser.add_argument(
+        "--preflight",
+        dest="preflight",
+        action="store",
+        metavar="PLAN_PATH",
+        default="",
+        required=False,
+        help="Only check the sources, destination namespaces, bot permissions & path\n"
+        "collisions of a batch with GraphQL, writing the jobs that pass as a manifest",
+    )
+    parser.add_argument(
+        "--preflight_batch",
+        dest="preflight_batch",
+        action="store",
+        type=int,
+        metavar="N",
+        default=preflight.DEFAULT_BATCH_SIZE,
+        required=False,
+        help="Projects or namespaces looked up per GraphQL request",
+    )
+    parser.add_argument(
+        "--queue",
+        dest="queue",
+        action="store",
+        metavar="PATH",
+        default="",
+        required=False,
+        help="SQLite work queue on a shared volume: the jobs of -m/-sg are added to it, and\n"
+        "every runner given the same PATH claims & migrates them until none is left",
+    )
+    parser.add_argument(
+        "--worker_id",
+        dest="worker_id",
+        action="store",
+        metavar="ID",
+        default="",
+        required=False,
+        help="Name of this runner in the work queue (default: hostname:pid)",
+    )
+    parser.add_argument(
+        "--lease",
+        dest="lease",
+        action="store",
+        type=float,
+        metavar="SECONDS",
+        default=workqueue.DEFAULT_LEASE_SECONDS,
+        required=False,
+        help="Lease of a claimed job, renewed by heartbeats; another runner takes the job\n"
+        "over once it expires",
+    )
+    parser.add_argument(
+        "--queue_claim",
+        dest="queue_claim",
+        action="store",
+        type=int,
+        metavar="N",
+        default=batch.DEFAULT_WORKERS,
+        required=False,
+        help="Jobs claimed from the work queue at a time",
+    )
+    parser.add_argument(
+        "-fo",
+        "--fan_out",
+        dest="fan_out",
+        action="append",
+        metavar="DESTINATION_PROJECT_ID[,...]",
+        default=[],
+        required=False,
+        help="Destination project IDs the variables of -s are written to, fetching them\n"
+        "once (repeatable, with -mv or -sv)",
+    )
+    parser.add_argument(
+        "-fg",
+        "--fan_out_group",
+        dest="fan_out_group",
+        action="store",
+        default="",
+        required=False,
+        help="Destination group ID or path, every project of it & its subgroups gets the\n"
+        "variables of -s (with -mv or -sv)",
+    )
+    parser.add_argument(
+        "--fan_out_workers",
+        dest="fan_out_workers",
+        action="store",
+        type=int,
+        metavar="N",
+        default=fanout.DEFAULT_WORKERS,
+        required=False,
+        help="Destination projects written to at the same time in a fan-out",
+    )
+    for stage, usage in [
+        ("export", "Projects exported at the same time in a batch"),
+        ("download", "Exported projects downloaded at the same time in a batch"),
+        ("import", "Projects imported at the same time in a batch"),
+        (
+            "variable",
+            "Projects having their variables migrated at the same time in a batch",
+        ),
+        (
+            "settings",
+            "Projects having their settings migrated at the same time in a batch",
+        ),
+        ("verify", "Migrated projects verified at the same time in a batch"),
+    ]:
+        parser.add_argument(
+            f"--{stage}_workers",
+            dest=f"{stage}_workers",
+            action="store",
+            type=int,
+            metavar="N",
+            default=batch.DEFAULT_WORKERS,
+            required=False,
+            help=usage,
+        )
+    parser.add_argument(
+        "--disk_budget",
+        dest="disk_budget",
+        action="store",
+        type=float,
+        metavar="GIB",
+        default=0,
+        required=False,
+        help="Expected size of the archives a batch may hold on disk at once, each deleted once imported (0: unlimited)",
+    )
+    parser.add_argument(
+        "--export_cache",
+        dest="export_cache",
+        action="store",
+        type=float,
+        metavar="GIB",
+        default=0,
+        required=False,
+        help="Reuse export archives of unchanged projects, keeping up to GIB under "
+        + cache.DEFAULT_CACHE_DIRECTORY
+        + " (0: disabled)",
+    )
+    parser.add_argument(
+        "--slim",
+        dest="slim_patterns",
+        action="append",
+        metavar="PATTERN",
+        default=[],
+        required=False,
+        help="Drop archive members matching PATTERN (e.g. 'uploads/*', 'lfs-objects/*')\n"
+        "from downloaded exports before importing them (repeatable)",
+    )
+    parser.add_argument(
+        "--slim_max_mib",
+        dest="slim_max_mib",
+        action="store",
+        type=float,
+        metavar="MIB",
+        default=0,
+        required=False,
+        help="Drop archive members bigger than MIB from downloaded exports (0: none)",
+    )
+    parser.add_argument(
+        "--slim_threads",
+        dest="slim_threads",
+        action="store",
+        type=int,
+        metavar="N",
+        default=0,
+        required=False,
+        help="Threads recompressing a slimmed archive (0: one per CPU)",
     )
     parser.add_argument(
         "-s",
@@ -98,8 +399,8 @@ def parse_args():
         dest="source_project_id",
         action="store",
         default="0",
-        required=True,
-        help="Source project ID",
+        required=False,
+        help="Source project ID (required unless a batch mode is used)",
     )
     parser.add_argument(
         "-d",
@@ -107,8 +408,8 @@ def parse_args():
         dest="destination_project_id",
         action="store",
         default="0",
-        required=True,
-        help="Destination project ID",
+        required=False,
+        help="Destination project ID (required unless a batch mode is used)",
     )
     parser.add_argument(
         "-ba",
@@ -119,6 +420,220 @@ def parse_args():
         required=True,
         help="Access token for the bot that will be doing the API calls",
     )
+    parser.add_argument(
+        "-dba",
+        "--destination_bot_access_token",
+        dest="destination_bot_access_token",
+        action="store",
+        default="",
+        required=False,
+        help="Access token for the bot on the destination server, if different from the source",
+    )
+    parser.add_argument(
+        "-r",
+        "--relay",
+        dest="relay",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Pipe the export download straight into the import upload, without a local file",
+    )
+    parser.add_argument(
+        "--relay_buffer",
+        dest="relay_buffer",
+        action="store",
+        type=int,
+        metavar="MIB",
+        default=transfer.DEFAULT_RELAY_BUFFER // transfer.MIB,
+        required=False,
+        help="Memory used to buffer a relayed export between download & upload",
+    )
+    parser.add_argument(
+        "--journal",
+        dest="journal",
+        action="store",
+        default=journal.DEFAULT_JOURNAL_PATH,
+        required=False,
+        help="File where the completed stages of every project are recorded",
+    )
+    parser.add_argument(
+        "--resume",
+        dest="resume",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Skip the stages a previous run completed & re-attach to its exports/imports",
+    )
+    parser.add_argument(
+        "--token_store",
+        dest="token_store",
+        action="store",
+        default=tokens.DEFAULT_STORE_PATH,
+        required=False,
+        help="File (chmod 600) where temporary project tokens are kept & reused between runs",
+    )
+    parser.add_argument(
+        "--token_days",
+        dest="token_days",
+        action="store",
+        type=int,
+        metavar="DAYS",
+        default=tokens.DEFAULT_TOKEN_DAYS,
+        required=False,
+        help="Lifetime of the temporary project tokens, at least 2 days so that they are reused between runs",
+    )
+    parser.add_argument(
+        "--cleanup_tokens",
+        dest="cleanup_tokens",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Revoke every stored & leftover temporary token, then exit",
+    )
+    parser.add_argument(
+        "--verify",
+        dest="verify",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Compare branches, tags & variable keys (statistics only warned) of the\n"
+        "migrated project(s) with the source (alone: compares -s with -d)",
+    )
+    parser.add_argument(
+        "--async",
+        dest="async_engine",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Run the API calls on asyncio (needs aiohttp), polling every export/import\n"
+        "of a batch from a single thread",
+    )
+    parser.add_argument(
+        "--metrics_json",
+        dest="metrics_json",
+        action="store",
+        metavar="PATH",
+        default="",
+        required=False,
+        help="Write request, phase, transfer & polling metrics of the run as JSON at exit",
+    )
+    parser.add_argument(
+        "--metrics_prom",
+        dest="metrics_prom",
+        action="store",
+        metavar="PATH",
+        default="",
+        required=False,
+        help="Write the same metrics as a Prometheus textfile (node_exporter) at exit",
+    )
+    parser.add_argument(
+        "--concurrency",
+        dest="concurrency",
+        action="store",
+        type=int,
+        metavar="N",
+        default=1,
+        required=False,
+        help="Number of variables pasted in parallel",
+    )
+    parser.add_argument(
+        "--rate_limit",
+        dest="rate_limits",
+        action="append",
+        metavar="CLASS=REQUESTS/SECONDS",
+        default=[],
+        required=False,
+        help="Override a rate limit of the server, CLASS being one of: "
+        + ", ".join(ratelimit.DEFAULT_LIMITS)
+        + " (repeatable)",
+    )
+    parser.add_argument(
+        "--max_retries",
+        dest="max_retries",
+        action="store",
+        type=int,
+        metavar="N",
+        default=ratelimit.DEFAULT_MAX_RETRIES,
+        required=False,
+        help="Retries of an API call answered with 429, or with 5xx for GET/PUT/DELETE",
+    )
+    parser.add_argument(
+        "--pool_size",
+        dest="pool_size",
+        action="store",
+        type=int,
+        default=http.DEFAULT_POOL_SIZE,
+        required=False,
+        help="Number of keep-alive connections kept open to the Gitlab server",
+    )
+    parser.add_argument(
+        "--connect_timeout",
+        dest="connect_timeout",
+        action="store",
+        type=float,
+        metavar="SECONDS",
+        default=http.DEFAULT_CONNECT_TIMEOUT,
+        required=False,
+        help="Seconds to wait for a connection to the Gitlab server",
+    )
+    parser.add_argument(
+        "--read_timeout",
+        dest="read_timeout",
+        action="store",
+        type=float,
+        metavar="SECONDS",
+        default=http.DEFAULT_READ_TIMEOUT,
+        required=False,
+        help="Seconds to wait for data from the Gitlab server",
+    )
+    parser.add_argument(
+        "--chunk_size",
+        dest="chunk_size",
+        action="store",
+        type=int,
+        metavar="MIB",
+        default=transfer.DEFAULT_CHUNK_SIZE // transfer.MIB,
+        required=False,
+        help="Buffer size used when transferring export archives",
+    )
+    parser.add_argument(
+        "--poll_first_delay",
+        dest="poll_first_delay",
+        action="store",
+        type=float,
+        metavar="SECONDS",
+        default=polling.DEFAULT_FIRST_DELAY,
+        required=False,
+        help="Delay before the second export/import status check, doubled after every check",
+    )
+    parser.add_argument(
+        "--poll_max_delay",
+        dest="poll_max_delay",
+        action="store",
+        type=float,
+        metavar="SECONDS",
+        default=polling.DEFAULT_MAX_DELAY,
+        required=False,
+        help="Maximum delay between two export/import status checks",
+    )
+    parser.add_argument(
+        "--poll_timeout",
+        dest="poll_timeout",
+        action="store",
+        type=float,
+        metavar="SECONDS",
+        default=polling.DEFAULT_TIMEOUT,
+        required=False,
+        help="Give up on an export/import that is not complete after this long",
+    )
+    parser.add_argument(
+        "--log_json",
+        dest="log_json",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Output logs as JSON lines, for log shipping",
+    )
     parser.add_argument(
         "-D",
         "--debug",
@@ -128,20 +643,425 @@ def parse_args():
         required=False,
         help="Output debugging messages",
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    try:
+        args.rate_limits = {
+            name: (int(requests), float(seconds))
+            for name, requests, seconds in (
+                re.fullmatch(r"(\w+)=(\d+)/(\d+(?:\.\d+)?)", rate_limit).groups()
+                for rate_limit in args.rate_limits
+            )
+        }
+    except AttributeError:
+        parser.error("--rate_limit expects CLASS=REQUESTS/SECONDS, e.g. export=6/60")
+    try:
+        args.override_params = dict(
+            re.fullmatch(r"(\w+)=(.*)", param, re.DOTALL).groups()
+            for param in args.override_params
+        )
+    except AttributeError:
+        parser.error(
+            "-o/--override_param expects NAME=VALUE, e.g. squash_option=always"
+        )
+    if args.token_days <= tokens.DEFAULT_EXPIRY_MARGIN_DAYS:
+        parser.error(
+            f"--token_days must be more than {tokens.DEFAULT_EXPIRY_MARGIN_DAYS}, "
+            "stored tokens that close to expiry are never reused"
+        )
+    if args.queue and (args.async_engine or args.preflight):
+        parser.error("--queue does not support --async or --preflight")
+    if args.preflight and not (args.manifest or args.source_group):
+        parser.error("--preflight needs -m/--manifest or -sg/--source_group")
+    if bool(args.source_group) != bool(args.destination_group):
+        parser.error("-sg/--source_group & -dg/--destination_group go together")
+    if args.async_engine and (
+        args.sync_variables
+        or args.relay
+        or args.resume
+        or args.journal != journal.DEFAULT_JOURNAL_PATH
+        or args.export_cache
+        or args.disk_budget
+    ):
+        parser.error(
+            "--async does not support -sv/--sync_variables, -r/--relay, --resume, "
+            "--journal, --export_cache or --disk_budget"
+        )
+    if args.relay and (args.slim_patterns or args.slim_max_mib):
+        parser.error("-r/--relay does not support --slim or --slim_max_mib")
+    args.fan_out = [
+        project_id.strip()
+        for value in args.fan_out
+        for project_id in value.split(",")
+        if project_id.strip()
+    ]
+    if args.fan_out or args.fan_out_group:
+        if not (args.migrate_variables or args.sync_variables):
+            parser.error("-fo/--fan_out & -fg/--fan_out_group need -mv or -sv")
+        if args.migrate_project or args.async_engine:
+            parser.error(
+                "-fo/--fan_out & -fg/--fan_out_group do not support -mp or --async"
+            )
+        if args.source_project_id == "0":
+            parser.error("-s/--source_project_id is required for a fan-out")
+    if not (
+        args.manifest
+        or args.source_group
+        or args.queue
+        or args.cleanup_tokens
+        or args.fan_out
+        or args.fan_out_group
+    ) and "0" in [
+        args.source_project_id,
+        args.destination_project_id,
+    ]:
+        parser.error(
+            "-s/--source_project_id & -d/--destination_project_id are required"
+        )
+    return args
+
+
+def write_metrics():
+    """
+    Function to write the metrics of the run, including runs that exit early
+    """
+    metrics.REGISTRY.write_json(args.metrics_json) if args.metrics_json else None
+    metrics.REGISTRY.write_prometheus(args.metrics_prom) if args.metrics_prom else None
+
+
+def archive_slim():
+    """
+    Function to build the archive slimming step from the arguments, if asked for
+    @return: slim.SLIM, or None
+    """
+    if not (args.slim_patterns or args.slim_max_mib):
+        return None
+    return slim.SLIM(
+        args.slim_patterns,
+        int(args.slim_max_mib * transfer.MIB),
+        args.slim_threads or None,
+        debug=args.debug,
+    )
+
+
+def async_api(destination_server_url: str, destination_bot_access_token: str):
+    """
+    Function to build the asyncio engine from the arguments
+    @return: gitlab_async.ASYNC_API
+    """
+    return gitlab_async.ASYNC_API(
+        args.server_url,
+        args.bot_access_token,
+        args.debug,
+        max(args.pool_size, args.concurrency),
+        args.connect_timeout,
+        args.read_timeout,
+        polling.POLLER(
+            args.poll_first_delay,
+            args.poll_max_delay,
+            timeout=args.poll_timeout,
+            debug=args.debug,
+        ),
+        ratelimit.SCHEDULER(args.rate_limits, args.max_retries, debug=args.debug),
+        args.chunk_size * transfer.MIB,
+        args.override_params,
+        destination_server_url,
+        destination_bot_access_token,
+        archive_slim(),
+    )
+
+
+async def migrate_async(
+    API: gitlab_async.ASYNC_API,
+    source_project_id: str,
+    source_url: str,
+    source_header: dict,
+    destination_url: str,
+    destination_header: dict,
+):
+    """
+    Function to migrate the variables & the project of the single project flow on asyncio
+    @return: (list of failed variables, ID of the imported project or None) tuple
+    """
+    failures, imported_project_id = [], None
+    async with API:
+        if args.migrate_variables:
+            LOG.info("#### 'Migrate Variables' (-mv) flag detected ####")
+            failures = await API.migrate_variables(
+                API.copy_source_variables(source_url, source_header),
+                destination_url,
+                destination_header,
+                args.concurrency,
+            )
+        if args.migrate_project:
+            LOG.info("#### 'Migrate Project' (-mp) flag detected ####")
+            archive = await API.export_project(source_project_id)
+            imported_project_id = await API.import_project(
+                args.path_import, args.file_path_import or archive
+            )
+    return failures, imported_project_id
+
+
+def run_queue(queue: workqueue.WORK_QUEUE, batch_migration: batch.BATCH):
+    """
+    Function to claim jobs from the work queue & migrate them, `--queue_claim` at a
+    time, until no job is left to claim
+    @return: list of keys of the failed jobs
+    """
+    LOG.info(f"#### Working on queue {queue.path} as {queue.worker_id} ####")
+    failed = []
+    while True:
+        jobs = queue.claim(args.queue_claim)
+        if not jobs:
+            break
+        with queue.keep_alive(jobs):
+            batch_failed = batch_migration.run(jobs)
+        for job in jobs:
+            queue.release(
+                job,
+                f"failed on {queue.worker_id}" if job["key"] in batch_failed else None,
+            )
+        failed += batch_failed
+    LOG.info(f"## No job left to claim, queue: {queue.summary()} ##")
+    return failed
 
 
 def main():
-    LOG.info("#### Reading Arguments ####")
     global args
     args = parse_args()
+    logs.setup(args.debug, args.log_json)
+    logs.secret(args.bot_access_token)
+    logs.secret(args.destination_bot_access_token)
+    atexit.register(write_metrics)
     LOG.info("#### Starting Migration Process ####")
 
+    session = http.SESSION(
+        max(args.pool_size, args.concurrency),
+        args.connect_timeout,
+        args.read_timeout,
+        debug=args.debug,
+        scheduler=ratelimit.SCHEDULER(
+            args.rate_limits, args.max_retries, debug=args.debug
+        ),
+    )
+    destination_server_url = args.destination_server_url or args.server_url
+    destination_bot_access_token = (
+        args.destination_bot_access_token or args.bot_access_token
+    )
+    API = gitlab.API(
+        args.server_url,
+        args.source_project_id,
+        args.destination_project_id,
+        args.bot_access_token,
+        args.debug,
+        session,
+        polling.POLLER(
+            args.poll_first_delay,
+            args.poll_max_delay,
+            timeout=args.poll_timeout,
+            debug=args.debug,
+        ),
+        args.chunk_size * transfer.MIB,
+        args.override_params,
+        destination_server_url,
+        destination_bot_access_token,
+        args.relay_buffer * transfer.MIB,
+        journal.JOURNAL(args.journal, args.resume, args.debug),
+        cache.EXPORT_CACHE(
+            int(args.export_cache * 1024 * transfer.MIB), debug=args.debug
+        )
+        if args.export_cache
+        else None,
+        archive_slim(),
+    )
+    API.journal_key = f"{args.source_project_id}->{args.path_import}"
+
+    token_store = tokens.TOKEN_STORE(args.token_store, debug=args.debug)
+
+    if args.cleanup_tokens:
+        LOG.info("#### 'Cleanup Tokens' (--cleanup_tokens) flag detected ####")
+        projects = {}
+        for server_url, access_token, project_id in [
+            (args.server_url, args.bot_access_token, args.source_project_id),
+            (
+                destination_server_url,
+                destination_bot_access_token,
+                args.destination_project_id,
+            ),
+        ]:
+            for project_key in [project_id] + [
+                entry["project_id"] for entry in token_store.pop(server_url)
+            ]:
+                if project_key != "0":
+                    projects[(server_url, project_key)] = init.PROJECT(
+                        project_key, server_url, access_token, args.debug, session
+                    )
+        for _, future in gitlab.bounded_map(
+            lambda project: project.cleanup_tokens(
+                ["Tmp_Source_Token", "Tmp_Destination_Token"]
+            ),
+            projects.values(),
+            args.concurrency,
+        ):
+            future.result()
+        session.close()
+        sys.exit(0)
+
+    if args.manifest or args.source_group or args.queue:
+        jobs = []
+        if args.manifest:
+            LOG.info("#### 'Manifest' (-m) flag detected ####")
+            jobs = batch.load_manifest(args.manifest)
+        elif args.source_group:
+            LOG.info("#### 'Source Group' (-sg) flag detected ####")
+            source_group = group.GROUP(
+                API, args.source_group, args.destination_group, args.debug
+            )
+            jobs = source_group.list_jobs(
+                args.migrate_variables, create_namespaces=not args.preflight
+            )
+        if args.preflight:
+            LOG.info("#### 'Preflight' (--preflight) flag detected ####")
+            check = preflight.PREFLIGHT(API, args.preflight_batch, args.debug)
+            results = check.check(
+                jobs, None if args.manifest else source_group.destination_full_path
+            )
+            check.write_plan(jobs, results, args.preflight)
+            session.close()
+            sys.exit(1 if any(results.values()) else 0)
+        queue = None
+        if args.queue:
+            LOG.info("#### 'Queue' (--queue) flag detected ####")
+            queue = workqueue.WORK_QUEUE(
+                args.queue, args.worker_id, args.lease, debug=args.debug
+            )
+            added = queue.load(jobs)
+            # Stages are kept in the queue, for the runner that takes a job over
+            API.journal = queue
+        # With a queue, only the runner that adds the group's jobs copies its variables
+        if args.source_group and (queue is None or added):
+            if args.migrate_variables and source_group.migrate_variables(
+                args.concurrency
+            ):
+                LOG.error("## Some group variables could not be migrated ##")
+        batch_migration = batch.BATCH(
+            API,
+            args.bot_access_token,
+            destination_bot_access_token,
+            args.concurrency,
+            {
+                "export": args.export_workers,
+                "download": args.download_workers,
+                "import": args.import_workers,
+                "variables": args.variable_workers,
+                "settings": args.settings_workers,
+                "verify": args.verify_workers,
+            },
+            debug=args.debug,
+            token_store=token_store,
+            token_days=args.token_days,
+            disk_budget=int(args.disk_budget * 1024 * transfer.MIB),
+            verify=args.verify,
+            settings=args.migrate_settings,
+        )
+        if args.async_engine:
+
+            async def run_async():
+                async with async_api(
+                    destination_server_url, destination_bot_access_token
+                ) as async_API:
+                    return await async_API.run_batch(
+                        jobs,
+                        batch_migration.workers,
+                        batch_migration.tokens,
+                        args.concurrency,
+                    )
+
+            # Largest first, like the threaded pipeline
+            jobs = batch_migration.measure(jobs)
+            failed = asyncio.run(run_async())
+            if args.migrate_settings:
+                for job, future in gitlab.bounded_map(
+                    batch_migration.replicate_settings,
+                    [
+                        job
+                        for job in jobs
+                        if job["key"] not in failed and job["destination_project_id"]
+                    ],
+                    args.settings_workers,
+                ):
+                    try:
+                        future.result()
+                    except SystemExit:
+                        failed.append(job["key"])
+            if args.verify:
+                for variables in [True, False]:
+                    verified = {
+                        (job["source_project_id"], job["destination_project_id"]): job
+                        for job in jobs
+                        if job["key"] not in failed
+                        and job["destination_project_id"]
+                        and job["migrate_variables"] == variables
+                    }
+                    if not verified:
+                        continue
+                    differences = verify.VERIFY(
+                        API,
+                        args.verify_workers * len(verify.FINGERPRINTS),
+                        args.debug,
+                        verify.fingerprints(variables),
+                    ).run(list(verified))
+                    failed += [
+                        verified[pair]["key"]
+                        for pair, found in differences.items()
+                        if found
+                    ]
+        elif queue is not None:
+            failed = run_queue(queue, batch_migration)
+            queue.close()
+        else:
+            failed = batch_migration.run(jobs)
+        session.close()
+        sys.exit(1 if failed else 0)
+
+    if args.fan_out or args.fan_out_group:
+        LOG.info("#### 'Fan Out' (-fo/-fg) flag detected ####")
+        replication = fanout.FANOUT(
+            API,
+            args.bot_access_token,
+            destination_bot_access_token,
+            args.concurrency,
+            args.fan_out_workers,
+            args.debug,
+            token_store,
+            args.token_days,
+            args.sync_variables,
+            args.delete_extra,
+            args.dry_run,
+        )
+        destination_project_ids = args.fan_out + (
+            replication.group_projects(args.fan_out_group) if args.fan_out_group else []
+        )
+        results = replication.run(args.source_project_id, destination_project_ids)
+        session.close()
+        sys.exit(1 if any(results.values()) else 0)
+
     source_project = init.PROJECT(
-        args.source_project_id, args.server_url, args.bot_access_token, args.debug
+        args.source_project_id,
+        args.server_url,
+        args.bot_access_token,
+        args.debug,
+        session,
+        token_store,
+        args.token_days,
     )
     destination_project = init.PROJECT(
-        args.destination_project_id, args.server_url, args.bot_access_token, args.debug
+        args.destination_project_id,
+        destination_server_url,
+        destination_bot_access_token,
+        args.debug,
+        session,
+        token_store,
+        args.token_days,
     )
 
     source_url, source_header = source_project.create_access_token("Tmp_Source_Token")
@@ -149,26 +1069,101 @@ def main():
         "Tmp_Destination_Token"
     )
 
-    API = gitlab.API(
-        args.server_url,
-        source_project.project_id,
-        destination_project.project_id,
-        args.bot_access_token,
-        args.debug,
-    )
+    imported_project_id = None
+    if args.async_engine:
+        failures, imported_project_id = asyncio.run(
+            migrate_async(
+                async_api(destination_server_url, destination_bot_access_token),
+                source_project.project_id,
+                source_url,
+                source_header,
+                destination_url,
+                destination_header,
+            )
+        )
+        if failures:
+            LOG.error(f"## {len(failures)} variables could not be migrated ##")
+            session.close()
+            sys.exit(1)
 
-    if args.migrate_variables:
+    if args.migrate_variables and not args.async_engine:
         LOG.info("#### 'Migrate Variables' (-mv) flag detected ####")
+        if API.checkpoint("variables_synced") is not None:
+            LOG.info("## Variables were migrated by a previous run ##")
+        else:
+            source_variables = API.copy_source_variables(source_url, source_header)
+            failures = API.migrate_variables(
+                source_variables, destination_url, destination_header, args.concurrency
+            )
+            if failures:
+                LOG.error(f"## {len(failures)} variables could not be migrated ##")
+                session.close()
+                sys.exit(1)
+            API.record("variables_synced")
+
+    if args.sync_variables:
+        LOG.info("#### 'Sync Variables' (-sv) flag detected ####")
         source_variables = API.copy_source_variables(source_url, source_header)
-        API.migrate_variables(source_variables, destination_url, destination_header)
+        failures = API.sync_variables(
+            source_variables,
+            destination_url,
+            destination_header,
+            args.concurrency,
+            args.delete_extra,
+            args.dry_run,
+        )
+        if failures:
+            LOG.error(f"## {len(failures)} variables could not be synced ##")
+            session.close()
+            sys.exit(1)
 
-    if args.migrate_project:
+    if args.migrate_project and not args.async_engine:
         if args.path_import is not None or args.file_path_import is not None:
             LOG.info("#### 'Migrate Project' (-mp) flag detected ####")
-            API.export_project(source_project.project_id)
-            API.import_project(args.path_import, args.file_path_import)
+            if args.relay:
+                imported_project_id = API.relay_project(
+                    source_project.project_id, args.path_import
+                )
+            else:
+                archive = API.export_project(source_project.project_id)
+                imported_project_id = API.import_project(
+                    args.path_import, args.file_path_import or archive
+                )
         else:
-            LOG.ERROR("#### Both of the following arguments are required: -p/--path_import, -f/--file_path_import for a project migration ####")
+            LOG.ERROR(
+                "#### Both of the following arguments are required: -p/--path_import, -f/--file_path_import for a project migration ####"
+            )
+
+    if args.migrate_settings:
+        LOG.info("#### 'Migrate Settings' (-ms) flag detected ####")
+        if settings.SETTINGS(API, debug=args.debug).run(
+            args.source_project_id,
+            str(imported_project_id or args.destination_project_id),
+        ):
+            session.close()
+            sys.exit(1)
+
+    if args.verify:
+        LOG.info("#### 'Verify' (--verify) flag detected ####")
+        differences = verify.VERIFY(
+            API,
+            debug=args.debug,
+            fingerprints=verify.fingerprints(
+                args.migrate_variables or args.sync_variables
+            ),
+        ).run(
+            [
+                (
+                    args.source_project_id,
+                    str(imported_project_id or args.destination_project_id),
+                )
+            ]
+        )
+        if any(differences.values()):
+            session.close()
+            sys.exit(1)
+
+    session.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+"""
+Python3 -- Class for a staged worker pipeline
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+
+class BYTE_BUDGET:
+    """Bytes shared by concurrent jobs, a job larger than the budget runs alone"""
+
+    def __init__(self, budget: int = None) -> None:
+        """Initiate Byte Budget object, `budget` None meaning unlimited"""
+        self.budget = budget
+        self.in_use = 0
+        self.lock = threading.Condition()
+
+    def acquire(self, size: int):
+        """
+        Function to block until `size` bytes fit in the budget
+        """
+        if not self.budget:
+            return
+        with self.lock:
+            self.lock.wait_for(
+                lambda: self.in_use == 0 or self.in_use + size <= self.budget
+            )
+            self.in_use += size
+
+    def release(self, size: int):
+        """
+        Function to give `size` bytes back to the budget
+        """
+        if not self.budget:
+            return
+        with self.lock:
+            self.in_use -= size
+            self.lock.notify_all()
+
+
+class PIPELINE:
+    """Jobs flowing through stages, each stage with its own bounded pool of workers"""
+
+    def __init__(self, stages: list, debug: bool = False) -> None:
+        """
+        Initiate Pipeline object
+        `stages` is a list of (name, function, workers), `function(job)` is called once per job
+        """
+        self.stages = stages
+        self.debug = debug
+        self.results = {}
+        self.lock = threading.Condition()
+
+    def run(self, jobs: list):
+        """
+        Function to push every job through every stage, so that different jobs can be
+        in different stages at the same time
+        @return: dict of {job key: (failed stage name or None, error or None)}
+        """
+        LOG.info(f"#### Running {len(jobs)} jobs through the pipeline ####")
+        executors = [
+            ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix=name)
+            for name, _, workers in self.stages
+        ]
+        self.results = {}
+        finished = []
+
+        def submit(index: int, job: dict):
+            if index == len(self.stages):
+                finish(job, None, None)
+                return
+            name, function, _ = self.stages[index]
+            future = executors[index].submit(function, job)
+            future.add_done_callback(lambda f: advance(index, job, f))
+
+        def advance(index: int, job: dict, future):
+            error = future.exception()
+            if error is not None:
+                finish(job, self.stages[index][0], error)
+            else:
+                submit(index + 1, job)
+
+        def finish(job: dict, stage: str, error):
+            with self.lock:
+                self.results[job["key"]] = (stage, error)
+                finished.append(job["key"])
+                if stage:
+                    LOG.error(
+                        f"## [{job['key']}] Failed during the '{stage}' stage: {error!r} ##"
+                    )
+                else:
+                    LOG.info(f"## [{job['key']}] Completed every stage ##")
+                self.lock.notify_all()
+
+        for job in jobs:
+            submit(0, job)
+        with self.lock:
+            # Completions rather than results, which share the key of duplicate jobs
+            self.lock.wait_for(lambda: len(finished) == len(jobs))
+        for executor in executors:
+            executor.shutdown()
+        return self.results
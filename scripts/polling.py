@@ -0,0 +1,112 @@
+"""
+Python3 -- Class for polling long running Gitlab operations
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+import metrics
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+DEFAULT_FIRST_DELAY = 1
+DEFAULT_MAX_DELAY = 60
+DEFAULT_FACTOR = 2
+DEFAULT_JITTER = 0.2
+DEFAULT_TIMEOUT = 3600
+
+
+class POLLER:
+    """Backoff policy shared by the export & import status waits"""
+
+    def __init__(
+        self,
+        first_delay: float = DEFAULT_FIRST_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        factor: float = DEFAULT_FACTOR,
+        jitter: float = DEFAULT_JITTER,
+        timeout: float = DEFAULT_TIMEOUT,
+        debug: bool = False,
+    ) -> None:
+        """Initiate Poller object"""
+        self.first_delay = first_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.timeout = timeout
+        self.debug = debug
+
+    def delays(self):
+        """
+        Function to generate the sleeps between two checks: exponential, jittered & capped
+        @return: generator of float
+        """
+        delay = self.first_delay
+        while True:
+            yield min(
+                delay * random.uniform(1 - self.jitter, 1 + self.jitter),
+                self.max_delay,
+            )
+            delay = min(delay * self.factor, self.max_delay)
+
+    def poll(self, check, usage: str):
+        """
+        Function to call `check(count)` until it returns (True, result), checking once
+        right away & backing off between the next checks until the overall deadline
+        @return: result of the successful check
+        """
+        deadline = time.monotonic() + self.timeout
+        delays = self.delays()
+        count = 0
+        while True:
+            count += 1
+            metrics.REGISTRY.count("polls_total", usage=usage)
+            done, result = check(count)
+            if done:
+                return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                LOG.error(
+                    f"## The {usage} did not complete within {self.timeout} seconds, giving up ##"
+                )
+                sys.exit(1)
+            delay = min(next(delays), remaining)
+            LOG.debug("## (%s) Next %s check in %.1f seconds ##", count, usage, delay)
+            metrics.REGISTRY.count("poll_sleep_seconds_total", delay, usage=usage)
+            time.sleep(delay)
+
+    async def poll_async(self, check, usage: str):
+        """
+        Function to await `check(count)` until it returns (True, result), like `poll`
+        but sleeping without blocking the other coroutines
+        @return: result of the successful check
+        """
+        deadline = time.monotonic() + self.timeout
+        delays = self.delays()
+        count = 0
+        while True:
+            count += 1
+            metrics.REGISTRY.count("polls_total", usage=usage)
+            done, result = await check(count)
+            if done:
+                return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                LOG.error(
+                    f"## The {usage} did not complete within {self.timeout} seconds, giving up ##"
+                )
+                sys.exit(1)
+            delay = min(next(delays), remaining)
+            LOG.debug("## (%s) Next %s check in %.1f seconds ##", count, usage, delay)
+            metrics.REGISTRY.count("poll_sleep_seconds_total", delay, usage=usage)
+            await asyncio.sleep(delay)
@@ -0,0 +1,281 @@
+"""
+Python3 -- Class for checking a batch migration up front with batched GraphQL queries
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import csv
+import logging
+import os
+import posixpath
+import sys
+
+import gitlab
+import metrics
+from session import base_url
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+# Projects or namespaces looked up per GraphQL request, within Gitlab's query complexity
+DEFAULT_BATCH_SIZE = 50
+PROJECTS_QUERY = """
+query($ids: [ID!], $fullPaths: [String!], $first: Int, $after: String) {
+  projects(ids: $ids, fullPaths: $fullPaths, first: $first, after: $after) {
+    nodes { id fullPath archived userPermissions { adminProject } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+# Group permissions, or only the namespace for a user's personal namespace
+NAMESPACE_FIELDS = """
+  g{index}: group(fullPath: $path{index}) {{ fullPath userPermissions {{ createProjects }} }}
+  n{index}: namespace(fullPath: $path{index}) {{ fullPath }}
+"""
+PLAN_COLUMNS = [
+    "source_project_id",
+    "path",
+    "namespace",
+    "destination_project_id",
+    "migrate_project",
+    "migrate_variables",
+    "source_full_path",
+]
+
+
+def global_id(project_id: str):
+    """
+    Function to turn a REST project ID into a GraphQL global ID
+    @return: str
+    """
+    return f"gid://gitlab/Project/{project_id}"
+
+
+class PREFLIGHT:
+    """Sources, destination namespaces, bot permissions & path collisions of a batch"""
+
+    def __init__(
+        self,
+        api: gitlab.API,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        debug: bool = False,
+    ) -> None:
+        """Initiate Preflight object, `api` holds the session & tokens of both servers"""
+        self.api = api
+        self.batch_size = batch_size
+        self.debug = debug
+
+    def graphql(self, server_url: str, headers: dict, query: str, variables: dict):
+        """
+        Function to send a GraphQL query
+        @return: dict, the `data` of the answer
+        """
+        request = self.api.session.post(
+            f"{base_url(server_url)}/api/graphql",
+            headers=headers,
+            json={"query": query, "variables": variables},
+        )
+        self.api.verify_api(request, "preflight")
+        answer = request.json()
+        if answer.get("errors"):
+            LOG.error(f"## GraphQL query failed: {answer['errors']} ##")
+            sys.exit(1)
+        metrics.REGISTRY.count("preflight_queries_total")
+        return answer["data"]
+
+    def projects(
+        self, server_url: str, headers: dict, ids: list = None, full_paths: list = None
+    ):
+        """
+        Function to look projects up by REST ID or full path, `batch_size` per request
+        & following the pages of every request
+        @return: dict of {REST ID or full path: {json} project}, visible projects only
+        """
+        keys = sorted(set(ids or full_paths or []))
+        found = {}
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start : start + self.batch_size]
+            variables = {"first": self.batch_size, "after": None}
+            if ids:
+                variables["ids"] = [global_id(project_id) for project_id in batch]
+            else:
+                variables["fullPaths"] = batch
+            while True:
+                projects = self.graphql(server_url, headers, PROJECTS_QUERY, variables)[
+                    "projects"
+                ]
+                for project in projects["nodes"]:
+                    key = (
+                        project["id"].rsplit("/", 1)[-1] if ids else project["fullPath"]
+                    )
+                    found[key] = project
+                if not projects["pageInfo"]["hasNextPage"]:
+                    break
+                variables["after"] = projects["pageInfo"]["endCursor"]
+        return found
+
+    def namespaces(self, full_paths: list):
+        """
+        Function to look destination namespaces up, `batch_size` per request, as aliased
+        fields of a single query
+        @return: dict of {full path: {json} group, or {json} namespace for a user}
+        """
+        keys = sorted(set(full_paths))
+        found = {}
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start : start + self.batch_size]
+            query = (
+                "query("
+                + ", ".join(f"$path{index}: ID!" for index in range(len(batch)))
+                + ") {"
+                + "".join(
+                    NAMESPACE_FIELDS.format(index=index) for index in range(len(batch))
+                )
+                + "}"
+            )
+            data = self.graphql(
+                self.api.destination_server_url,
+                self.api.destination_head_token,
+                query,
+                {f"path{index}": path for index, path in enumerate(batch)},
+            )
+            for index, path in enumerate(batch):
+                namespace = data[f"g{index}"] or data[f"n{index}"]
+                if namespace:
+                    found[path] = namespace
+        return found
+
+    def check(self, jobs: list, creatable_namespaces: str = None):
+        """
+        Function to check every job, namespaces under `creatable_namespaces` being
+        created by the migration itself
+        @return: dict of {job key: list of problems}
+        """
+        LOG.info(f"#### Preflight of {len(jobs)} projects ####")
+        source_ids = [job["source_project_id"] for job in jobs]
+        sources = self.projects(
+            self.api.server_url,
+            self.api.head_token,
+            ids=[project_id for project_id in source_ids if project_id.isdigit()],
+        )
+        sources.update(
+            self.projects(
+                self.api.server_url,
+                self.api.head_token,
+                full_paths=[
+                    project_id for project_id in source_ids if not project_id.isdigit()
+                ],
+            )
+        )
+        imported = [job for job in jobs if job["migrate_project"]]
+        taken = self.projects(
+            self.api.destination_server_url,
+            self.api.destination_head_token,
+            full_paths=[job["path_import"] for job in imported],
+        )
+        namespaces = self.namespaces(
+            [
+                posixpath.dirname(job["path_import"])
+                for job in imported
+                if posixpath.dirname(job["path_import"])
+            ]
+        )
+        destinations = self.projects(
+            self.api.destination_server_url,
+            self.api.destination_head_token,
+            ids=[
+                job["destination_project_id"]
+                for job in jobs
+                if job["destination_project_id"]
+            ],
+        )
+
+        paths = {}
+        for job in imported:
+            paths[job["path_import"]] = paths.get(job["path_import"], 0) + 1
+        results = {}
+        for job in jobs:
+            problems = []
+            source = sources.get(job["source_project_id"])
+            if source is None:
+                problems.append("source project not found or not visible to the bot")
+            else:
+                job["source_full_path"] = source["fullPath"]
+                if not source["userPermissions"]["adminProject"]:
+                    problems.append(
+                        "bot lacks Maintainer access on the source project (export & tokens)"
+                    )
+            if job["migrate_project"]:
+                namespace_path = posixpath.dirname(job["path_import"])
+                namespace = namespaces.get(namespace_path)
+                if namespace_path and namespace is None:
+                    if not (
+                        creatable_namespaces
+                        and (namespace_path + "/").startswith(
+                            creatable_namespaces + "/"
+                        )
+                    ):
+                        problems.append(
+                            f"destination namespace '{namespace_path}' does not exist"
+                        )
+                elif namespace and not namespace.get("userPermissions", {}).get(
+                    "createProjects", True
+                ):
+                    problems.append(f"bot cannot create projects in '{namespace_path}'")
+                if job["path_import"] in taken:
+                    problems.append(
+                        f"destination path '{job['path_import']}' is already taken"
+                    )
+                if paths[job["path_import"]] > 1:
+                    problems.append(
+                        f"destination path '{job['path_import']}' is used by {paths[job['path_import']]} jobs"
+                    )
+            if job["destination_project_id"]:
+                destination = destinations.get(job["destination_project_id"])
+                if destination is None:
+                    problems.append(
+                        "destination project not found or not visible to the bot"
+                    )
+                elif not destination["userPermissions"]["adminProject"]:
+                    problems.append(
+                        "bot lacks Maintainer access on the destination project"
+                    )
+            elif job["migrate_variables"] and not job["migrate_project"]:
+                problems.append("no destination project for the variables")
+            results[job["key"]] = problems
+
+        for job in jobs:
+            for problem in results[job["key"]]:
+                LOG.error(f"## [{job['key']}] {problem} ##")
+        LOG.info(
+            f"## {sum(1 for problems in results.values() if not problems)}/{len(jobs)} projects passed the preflight ##"
+        )
+        return results
+
+    def write_plan(self, jobs: list, results: dict, plan_path: str):
+        """
+        Function to write the jobs that passed the preflight as a CSV manifest, ready
+        to be given to -m/--manifest
+        """
+        with open(plan_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=PLAN_COLUMNS)
+            writer.writeheader()
+            for job in jobs:
+                if results[job["key"]]:
+                    continue
+                namespace, path = posixpath.split(job["path_import"])
+                writer.writerow(
+                    {
+                        "source_project_id": job["source_project_id"],
+                        "path": path,
+                        "namespace": namespace,
+                        "destination_project_id": job["destination_project_id"],
+                        "migrate_project": str(job["migrate_project"]).lower(),
+                        "migrate_variables": str(job["migrate_variables"]).lower(),
+                        "source_full_path": job.get("source_full_path", ""),
+                    }
+                )
+        LOG.info(f"## Validated plan written to {plan_path} ##")
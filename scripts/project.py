@@ -13,22 +13,31 @@ import os
 import sys
 from datetime import datetime, timedelta
 
-import requests
+import logs
+from session import SESSION, base_url
+from tokens import DEFAULT_TOKEN_DAYS, TOKEN_STORE
 
 __appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
 LOG = logging.getLogger(__appname__)
-BASIC_FORMAT = "[%(levelname)s]:[%(filename)s:%(lineno)s - %(funcName)s()] %(message)s"
-logging.basicConfig(format=BASIC_FORMAT)
-LOG.setLevel(logging.DEBUG)
 
 
 class PROJECT:
     """Gitlab project as objects"""
 
     def __init__(
-        self, project_id: dict, server_url: str, bot_access_token: str, debug: bool
+        self,
+        project_id: dict,
+        server_url: str,
+        bot_access_token: str,
+        debug: bool,
+        session: SESSION = None,
+        token_store: TOKEN_STORE = None,
+        token_days: int = DEFAULT_TOKEN_DAYS,
     ) -> None:
         """Initiate API object"""
+        self.session = session or SESSION(debug=debug)
+        self.token_store = token_store
+        self.token_days = token_days
         self.project_id = project_id
         self.server_url = server_url
         self.bot_access_token = bot_access_token
@@ -37,44 +46,88 @@ class PROJECT:
 
     def create_access_token(self, token_name: str):
         """
-        Function to create Access Token w/ API for a project along with the URL/Header
+        Function to create Access Token w/ API for a project along with the URL/Header,
+        reusing the stored token of a previous run while it is not about to expire
         @return: {str} tuple
         """
         data = {
             "name": token_name,
             "scopes": ["api"],
-            "expires_at": (datetime.today() + timedelta(days=1)).strftime("%Y-%m-%d"),
+            "expires_at": (datetime.today() + timedelta(days=self.token_days)).strftime(
+                "%Y-%m-%d"
+            ),
         }
         LOG.info("#### Constructing project URL/Path ####")
-        url_variables = f"https://{self.server_url}/api/v4/projects/{self.project_id}/variables?per_page=50"
-        url_token = (
-            f"https://{self.server_url}/api/v4/projects/{self.project_id}/access_tokens"
+        url_variables = (
+            f"{base_url(self.server_url)}/api/v4/projects/{self.project_id}/variables"
         )
+        url_token = f"{base_url(self.server_url)}/api/v4/projects/{self.project_id}/access_tokens"
+        stored_token = (
+            self.token_store.get(self.server_url, self.project_id, token_name)
+            if self.token_store
+            else None
+        )
+        if stored_token:
+            logs.secret(stored_token["token"])
+            if self.token_active(stored_token["token"]):
+                LOG.info(
+                    f"## Reusing stored Access Token: ({token_name}) until {stored_token['expires_at']} ##"
+                )
+                return url_variables, {"PRIVATE-TOKEN": f"{stored_token['token']}"}
+            LOG.info(
+                f"## Stored Access Token ({token_name}) was revoked, creating a new one ##"
+            )
+            self.token_store.drop(self.server_url, self.project_id, token_name)
         self.head_token["Content-Type"] = "application/json"
         tokens_ids_list = self.get_tokens_list(url_token, token_name)
         self.revoke_tokens(
             tokens_ids_list, url_token, token_name
         ) if tokens_ids_list else None
-        LOG.debug(f"## Headers data {self.head_token} ##") if self.debug else None
+        LOG.debug("## Headers data %s ##", self.head_token)
         LOG.info(f"## Creating Access Token: ({token_name}) ##")
-        LOG.debug(
-            f"## Details for {token_name}: {json.dumps(data)} ##"
-        ) if self.debug else None
+        LOG.debug("## Details for %s: %s ##", token_name, data)
         self.verify(url_token, self.head_token)
         self.head_token["Content-Type"] = "application/json"
-        request = requests.post(
+        request = self.session.post(
             url_token, headers=self.head_token, data=json.dumps(data)
         )
-        parsed_request = json.dumps(request.json(), indent=4, sort_keys=True)
-        json_obj = json.loads(parsed_request)
-        LOG.info(f"## Access Token: ({json_obj['token']}) ##")
+        json_obj = request.json()
+        logs.secret(json_obj["token"])
+        LOG.info(
+            f"## Access Token created: ({token_name}) until {data['expires_at']} ##"
+        )
         header_variable = {"PRIVATE-TOKEN": f"{json_obj['token']}"}
         LOG.debug(
-            f"Response output for {token_name}: {parsed_request}"
-        ) if self.debug else None
+            "## Response output for %s: %s ##",
+            token_name,
+            logs.LAZY(json.dumps, json_obj, indent=4, sort_keys=True),
+        )
+        self.token_store.put(
+            self.server_url,
+            self.project_id,
+            token_name,
+            json_obj["token"],
+            json_obj["id"],
+            data["expires_at"],
+        ) if self.token_store else None
 
         return url_variables, header_variable
 
+    def token_active(self, token: str):
+        """
+        Function to check that a stored token still works: it may have been revoked by
+        --cleanup_tokens, by hand, or by another run creating a token of the same name
+        @return: boolean
+        """
+        request = self.session.get(
+            f"{base_url(self.server_url)}/api/v4/personal_access_tokens/self",
+            headers={"PRIVATE-TOKEN": token},
+        )
+        if request.status_code != 200:
+            return False
+        details = request.json()
+        return details.get("active", True) and not details.get("revoked", False)
+
     def verify(self, url: str, headers: str):
         """
         Function to verify URL/Paths of the project
@@ -82,7 +135,7 @@ class PROJECT:
         """
         LOG.info("#### Verifying URL/Path ####")
         del headers["Content-Type"]
-        request = requests.get(url, headers=headers)
+        request = self.session.get(url, headers=headers)
 
         if request.status_code != 200:
             LOG.error(
@@ -97,16 +150,14 @@ class PROJECT:
         """
         LOG.info(f"#### Checking for any old {token_name} Tokens ####")
         token_id_list = []
-        tokens_request = requests.get(url, headers=self.head_token)
-        for value in tokens_request.json():
-            if token_name == value["name"]:
+        for value in self.session.paginate(url, headers=self.head_token):
+            if token_name == value["name"] and value.get("active", True):
                 token_id_list.append(value["id"])
         LOG.info(
             f"## Detected a total of {len(token_id_list)} '{token_name}' tokens ##"
         ) if len(token_id_list) != 0 else None
-        LOG.debug(f"## Token IDs: {token_id_list} ##") if len(
-            token_id_list
-        ) != 0 and self.debug else None
+        if len(token_id_list) != 0:
+            LOG.debug("## Token IDs: %s ##", token_id_list)
         return (
             token_id_list
             if len(token_id_list) != 0
@@ -120,8 +171,20 @@ class PROJECT:
         """
         LOG.info(f"#### Attempting to revoke redundant '{token_name}' tokens ##")
         for token_id in token_ids:
-            requests.delete(url=url + f"/{token_id}", headers=self.head_token)
-            LOG.debug(
-                f"## Token of ID '{token_id}' has been revoked ##"
-            ) if self.debug else None
+            self.session.delete(url + f"/{token_id}", headers=self.head_token)
+            LOG.debug("## Token of ID '%s' has been revoked ##", token_id)
         LOG.info(f"## All previous '{token_name}' tokens have been revoked ##")
+
+    def cleanup_tokens(self, token_names: list):
+        """
+        Function to revoke every temporary token left on the project by previous runs
+        """
+        LOG.info(
+            f"#### Cleaning up temporary tokens of project: {self.project_id} ####"
+        )
+        url_token = f"{base_url(self.server_url)}/api/v4/projects/{self.project_id}/access_tokens"
+        for token_name in token_names:
+            tokens_ids_list = self.get_tokens_list(url_token, token_name)
+            self.revoke_tokens(
+                tokens_ids_list, url_token, token_name
+            ) if tokens_ids_list else None
@@ -0,0 +1,239 @@
+"""
+Python3 -- Class for scheduling API calls under Gitlab's rate limits
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import metrics
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+# Gitlab's default per user limits, as (requests, seconds)
+DEFAULT_LIMITS = {
+    "export": (6, 60),
+    "download": (1, 60),
+    "import": (6, 60),
+    "general": (2000, 60),
+}
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF = 2
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+# A 5xx may come after the server acted on the call, only these are safe to send again
+IDEMPOTENT_METHODS = ["GET", "HEAD", "OPTIONS", "PUT", "DELETE"]
+LOW_REMAINING_RATIO = 0.1
+
+
+class TOKEN_BUCKET:
+    """Token bucket allowing `requests` calls every `seconds`, in bursts of up to `requests`"""
+
+    def __init__(self, name: str, requests: int, seconds: float) -> None:
+        """Initiate Token Bucket object"""
+        self.name = name
+        self.capacity = max(requests, 1)
+        self.rate = self.capacity / seconds
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Function to take a call if one is allowed right now
+        @return: None if the call was taken, else float seconds to wait before trying again
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            if now >= self.paused_until and self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return max(self.paused_until - now, (1 - self.tokens) / self.rate)
+
+    def acquire(self):
+        """
+        Function to block until a call is allowed
+        @return: float seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            delay = self.reserve()
+            if delay is None:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self):
+        """
+        Function to wait until a call is allowed without holding a thread, so that a
+        coroutine waiting on the download limit does not starve the default executor
+        @return: float seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            delay = self.reserve()
+            if delay is None:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """
+        Function to hold every call of this bucket for `seconds`
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class SCHEDULER:
+    """Rate limit aware scheduling shared by every API call of a run"""
+
+    def __init__(
+        self,
+        limits: dict = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        debug: bool = False,
+    ) -> None:
+        """Initiate Scheduler object, `limits` overrides DEFAULT_LIMITS per endpoint class"""
+        self.buckets = {
+            name: TOKEN_BUCKET(name, requests, seconds)
+            for name, (requests, seconds) in dict(
+                DEFAULT_LIMITS, **(limits or {})
+            ).items()
+        }
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.debug = debug
+
+    @staticmethod
+    def classify(method: str, url: str):
+        """
+        Function to find which rate limit an API call counts against
+        @return: {str} endpoint class
+        """
+        path = url.split("?")[0].rstrip("/")
+        if method == "POST" and path.endswith("/export"):
+            return "export"
+        if method == "GET" and path.endswith("/export/download"):
+            return "download"
+        if method == "POST" and path.endswith("/projects/import"):
+            return "import"
+        return "general"
+
+    def acquire(self, method: str, url: str):
+        """
+        Function to wait for the bucket of an API call
+        @return: {str} endpoint class
+        """
+        name = self.classify(method, url)
+        self.waited(name, self.buckets[name].acquire())
+        return name
+
+    async def acquire_async(self, method: str, url: str):
+        """
+        Function to wait for the bucket of an API call on the event loop
+        @return: {str} endpoint class
+        """
+        name = self.classify(method, url)
+        self.waited(name, await self.buckets[name].acquire_async())
+        return name
+
+    def waited(self, name: str, waited: float):
+        """
+        Function to count the time spent waiting for a bucket
+        """
+        metrics.REGISTRY.count("rate_limit_wait_seconds_total", waited, endpoint=name)
+        if waited:
+            LOG.debug("## Waited %.1f seconds for the '%s' rate limit ##", waited, name)
+
+    @staticmethod
+    def header_delay(value: str):
+        """
+        Function to read a Retry-After header, either seconds or an HTTP date
+        @return: float seconds, or None
+        """
+        if not value:
+            return None
+        if re.fullmatch(r"\d+(\.\d+)?", value.strip()):
+            return float(value)
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return None
+
+    def observe(self, name: str, response):
+        """
+        Function to slow a bucket down when the server says its limit is almost reached
+        """
+        remaining = response.headers.get("RateLimit-Remaining")
+        limit = response.headers.get("RateLimit-Limit")
+        reset = response.headers.get("RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining, reset = int(remaining), float(reset)
+            limit = int(limit) if limit else None
+        except ValueError:
+            return
+        until_reset = max(reset - time.time(), 0)
+        if remaining <= 0:
+            LOG.warning(
+                f"## '{name}' rate limit reached, holding calls for {until_reset:.0f} seconds ##"
+            )
+            self.buckets[name].pause(until_reset)
+        elif limit and remaining < limit * LOW_REMAINING_RATIO:
+            # Spread the remaining calls until the reset instead of bursting into a 429
+            self.buckets[name].pause(until_reset / remaining)
+
+    @staticmethod
+    def retryable(method: str, response):
+        """
+        Function to tell whether a call may be sent again: any call the server turned
+        down before acting on it (429, or 503 with Retry-After), idempotent calls on
+        any other 5xx. A POST answered 502/504 may have been carried out all the same,
+        e.g. an import accepted behind a load balancer that timed out.
+        @return: boolean
+        """
+        if response.status_code == 429:
+            return True
+        if response.status_code == 503 and response.headers.get("Retry-After"):
+            return True
+        return (
+            response.status_code in RETRY_STATUS_CODES
+            and method.upper() in IDEMPOTENT_METHODS
+        )
+
+    def retry_delay(self, name: str, method: str, response, attempt: int):
+        """
+        Function to decide whether a response is worth retrying, and when
+        @return: float seconds to wait before retrying, or None to keep the response
+        """
+        self.observe(name, response)
+        if not self.retryable(method, response) or attempt >= self.max_retries:
+            return None
+        delay = self.header_delay(response.headers.get("Retry-After"))
+        if delay is None:
+            delay = self.backoff * 2**attempt * random.uniform(0.5, 1.5)
+        if response.status_code == 429:
+            self.buckets[name].pause(delay)
+        LOG.warning(
+            f"## ({attempt + 1}) '{response.url}' answered {response.status_code}, retrying in {delay:.1f} seconds ##"
+        )
+        return delay
@@ -0,0 +1,192 @@
+"""
+Python3 -- Class for a shared HTTP Session
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import logging
+import os
+import sys
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from ratelimit import SCHEDULER
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 300
+DEFAULT_PER_PAGE = 100
+
+
+def base_url(server_url: str):
+    """
+    Function to build the base URL of a Gitlab server, over https unless
+    `server_url` names its own scheme (e.g. http://localhost:8080)
+    @return: str
+    """
+    return server_url.rstrip("/") if "://" in server_url else f"https://{server_url}"
+
+
+class SESSION:
+    """Keep-alive HTTP transport shared by every API call of a run"""
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        headers: dict = None,
+        debug: bool = False,
+        scheduler: SCHEDULER = None,
+    ) -> None:
+        """Initiate Session object"""
+        self.scheduler = scheduler
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.debug = debug
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": "gitlab-migrator"})
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, **kwargs):
+        """
+        Function to send a request through the pooled connections, waiting for its
+        rate limit & retrying 429/5xx answers when the call & its body can be sent again
+        @return requests.models.Response
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            name = self.scheduler.acquire(method, url) if self.scheduler else None
+            LOG.debug("## %s %s ##", method, url)
+            response = self.timed(method, url, **kwargs)
+            if self.scheduler is None:
+                return response
+            delay = self.scheduler.retry_delay(name, method, response, attempt)
+            if delay is None or not self.rewind(kwargs.get("data")):
+                return response
+            response.close()
+            metrics.REGISTRY.count(
+                "http_retries_total", endpoint=name, status=response.status_code
+            )
+            time.sleep(delay)
+            attempt += 1
+
+    def timed(self, method: str, url: str, **kwargs):
+        """
+        Function to send a single request, counting it & timing it until its headers
+        @return requests.models.Response
+        """
+        endpoint = SCHEDULER.classify(method, url)
+        started_at = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            metrics.REGISTRY.count(
+                "http_requests_total", method=method, endpoint=endpoint, status="error"
+            )
+            raise
+        metrics.REGISTRY.observe(
+            "http_request_seconds",
+            time.monotonic() - started_at,
+            method=method,
+            endpoint=endpoint,
+        )
+        metrics.REGISTRY.count(
+            "http_requests_total",
+            method=method,
+            endpoint=endpoint,
+            status=response.status_code,
+        )
+        return response
+
+    @staticmethod
+    def rewind(body):
+        """
+        Function to get a request body ready to be sent again
+        @return: boolean, False if the body is a stream that cannot be replayed
+        """
+        if body is None or isinstance(body, (str, bytes, dict, list, tuple)):
+            return True
+        if hasattr(body, "rewind"):
+            return body.rewind()
+        return False
+
+    def get(self, url: str, **kwargs):
+        """
+        Function to send a GET request
+        @return requests.models.Response
+        """
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        """
+        Function to send a POST request
+        @return requests.models.Response
+        """
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        """
+        Function to send a PUT request
+        @return requests.models.Response
+        """
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs):
+        """
+        Function to send a DELETE request
+        @return requests.models.Response
+        """
+        return self.request("DELETE", url, **kwargs)
+
+    def paginate(
+        self,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        per_page: int = DEFAULT_PER_PAGE,
+    ):
+        """
+        Function to lazily walk every page of a Gitlab list endpoint, following the
+        `Link` header (keyset or offset) and falling back on `X-Next-Page`
+        @return: generator of {json} items
+        """
+        params = dict(params or {})
+        params.setdefault("per_page", per_page)
+        page = 1
+        while url:
+            response = self.get(url, headers=headers, params=params)
+            if response.status_code != 200:
+                LOG.error(
+                    f"## Unable to fetch page {page} of '{response.url}'. Code: {response.status_code} | Reason: {response.reason} | Text: {response.text} ##"
+                )
+                sys.exit(1)
+            items = response.json()
+            LOG.debug("## Page %s of '%s' returned %s items ##", page, url, len(items))
+            yield from items
+            page += 1
+            if "next" in response.links:
+                url, params = response.links["next"]["url"], None
+            elif response.headers.get("X-Next-Page"):
+                params = dict(params or {}, page=response.headers["X-Next-Page"])
+            else:
+                url = None
+
+    def close(self):
+        """
+        Function to close every pooled connection
+        """
+        self.session.close()
@@ -0,0 +1,373 @@
+"""
+Python3 -- Class for replicating the project settings an export archive does not carry
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import logging
+import os
+import sys
+import urllib.parse
+
+import gitlab
+import metrics
+from session import DEFAULT_PER_PAGE, base_url
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+# Resource type: field identifying an item on both projects
+RESOURCES = {
+    "protected_branches": "name",
+    "protected_tags": "name",
+    "hooks": "url",
+    "deploy_keys": "key",
+    "pipeline_schedules": "description",
+    "push_rule": None,
+    "approval_rules": "name",
+}
+# The import protects the default branch on its own, these are replaced when they differ
+REPLACED_RESOURCES = ["protected_branches", "protected_tags"]
+# Feature missing from the edition/tier of the server, or not enabled on the project
+UNAVAILABLE_STATUS_CODES = [403, 404]
+HOOK_FIELDS = [
+    "url",
+    "name",
+    "description",
+    "enable_ssl_verification",
+    "push_events_branch_filter",
+    "branch_filter_strategy",
+    "custom_webhook_template",
+]
+PUSH_RULE_IGNORED_FIELDS = ["id", "project_id", "created_at"]
+# Rules Gitlab manages itself (security reports, CODEOWNERS)
+SYSTEM_APPROVAL_RULES = ["report_approver", "code_owner"]
+
+
+def access_level(levels: list):
+    """
+    Function to reduce the access levels of a protected ref to its role based level,
+    users & groups having other IDs on the destination
+    @return: int, or None if the levels only name users or groups
+    """
+    roles = [
+        level["access_level"]
+        for level in levels
+        if not level.get("user_id") and not level.get("group_id")
+    ]
+    return min(roles) if roles else None
+
+
+def access_levels(name: str, levels: dict):
+    """
+    Function to build the role based access levels of a protected ref, leaving out
+    the ones the source does not list (Gitlab's default then applies)
+    @return: dict, or None if one of them only names users or groups, as a role
+    based level would widen it
+    """
+    data = {}
+    for field, value in levels.items():
+        if not value:
+            continue
+        data[field] = access_level(value)
+        if data[field] is None:
+            LOG.warning(
+                f"## Protected ref ({name}): {field} only allows users or groups, skipped rather than widened ##"
+            )
+            return None
+    return data
+
+
+class SETTINGS:
+    """Project settings of a source project, re-created on its imported project"""
+
+    def __init__(
+        self,
+        api: gitlab.API,
+        resources: list = None,
+        debug: bool = False,
+    ) -> None:
+        """Initiate Settings object, `api` holds the session & tokens of both servers"""
+        self.api = api
+        self.resources = resources or list(RESOURCES)
+        self.debug = debug
+
+    def source_url(self, project_id: str, resource: str):
+        """
+        Function to build the API URL of a resource of the source project
+        @return: str
+        """
+        return (
+            f"{base_url(self.api.server_url)}/api/v4/projects/{project_id}/{resource}"
+        )
+
+    def destination_url(self, project_id: str, resource: str):
+        """
+        Function to build the API URL of a resource of the destination project
+        @return: str
+        """
+        return f"{base_url(self.api.destination_server_url)}/api/v4/projects/{project_id}/{resource}"
+
+    def fetch(self, url: str, headers: dict):
+        """
+        Function to fetch every item of a resource, the first page telling whether the
+        feature is available at all
+        @return: list of {json} items, or None when the resource is not available
+        """
+        response = self.api.session.get(
+            url, headers=headers, params={"per_page": DEFAULT_PER_PAGE}
+        )
+        if response.status_code in UNAVAILABLE_STATUS_CODES:
+            return None
+        self.api.verify_api(response, "settings lookup")
+        items = response.json() if response.content else None
+        if not isinstance(items, list):
+            # Single object resources (push_rule) answer null when not set
+            return [items] if items else []
+        if "next" in response.links:
+            items += self.api.session.paginate(
+                response.links["next"]["url"], headers=headers
+            )
+        elif response.headers.get("X-Next-Page"):
+            items += self.api.session.paginate(
+                url, headers=headers, params={"page": response.headers["X-Next-Page"]}
+            )
+        return items
+
+    def payload(self, resource: str, item: dict):
+        """
+        Function to turn a source item into the body creating it on the destination
+        @return: dict, or None if the item cannot be re-created
+        """
+        if resource == "protected_branches":
+            levels = access_levels(
+                item["name"],
+                {
+                    "push_access_level": item.get("push_access_levels"),
+                    "merge_access_level": item.get("merge_access_levels"),
+                    "unprotect_access_level": item.get("unprotect_access_levels"),
+                },
+            )
+            return (
+                dict(
+                    levels,
+                    name=item["name"],
+                    allow_force_push=item.get("allow_force_push", False),
+                    code_owner_approval_required=item.get(
+                        "code_owner_approval_required", False
+                    ),
+                )
+                if levels is not None
+                else None
+            )
+        if resource == "protected_tags":
+            levels = access_levels(
+                item["name"], {"create_access_level": item.get("create_access_levels")}
+            )
+            return dict(levels, name=item["name"]) if levels is not None else None
+        if resource == "hooks":
+            return {
+                field: value
+                for field, value in item.items()
+                if (field.endswith("_events") or field in HOOK_FIELDS)
+                and value is not None
+            }
+        if resource == "deploy_keys":
+            return {
+                "title": item["title"],
+                "key": item["key"],
+                "can_push": item.get("can_push", False),
+            }
+        if resource == "pipeline_schedules":
+            return {
+                field: item[field]
+                for field in ["description", "ref", "cron", "cron_timezone", "active"]
+                if field in item
+            }
+        if resource == "push_rule":
+            return {
+                field: value
+                for field, value in item.items()
+                if field not in PUSH_RULE_IGNORED_FIELDS
+            }
+        if item.get("rule_type") in SYSTEM_APPROVAL_RULES:
+            return None
+        data = {"name": item["name"], "approvals_required": item["approvals_required"]}
+        if item.get("rule_type") == "any_approver":
+            data["rule_type"] = "any_approver"
+        if item.get("users") or item.get("groups"):
+            LOG.warning(
+                f"## Approval rule ({item['name']}): eligible users & groups are not copied ##"
+            )
+        return data
+
+    def schedule_variables(
+        self, source_project_id: str, schedule: dict, url: str, headers: dict
+    ):
+        """
+        Function to copy the variables of a pipeline schedule, only listed by its details
+        @return: list of failures as (resource, name, reason) tuples
+        """
+        request = self.api.session.get(
+            self.source_url(
+                source_project_id, f"pipeline_schedules/{schedule['source_id']}"
+            ),
+            headers=self.api.head_token,
+        )
+        self.api.verify_api(request, "pipeline schedule lookup")
+        failures = []
+        for variable in request.json().get("variables", []):
+            response = self.api.session.post(
+                f"{url}/{schedule['id']}/variables",
+                headers=headers,
+                json={
+                    "key": variable["key"],
+                    "value": variable["value"],
+                    "variable_type": variable.get("variable_type", "env_var"),
+                },
+            )
+            if not 200 <= response.status_code < 300:
+                failures.append(
+                    (
+                        "pipeline_schedules",
+                        f"{schedule['description']} ({variable['key']})",
+                        f"Code: {response.status_code} | Text: {response.text}",
+                    )
+                )
+        return failures
+
+    def restore(
+        self, url: str, headers: dict, resource: str, name: str, previous: dict
+    ):
+        """
+        Function to protect a ref again the way the destination had it, when replacing
+        its protection failed, rather than leave it unprotected
+        """
+        response = (
+            self.api.session.post(url, headers=headers, json=previous)
+            if previous
+            else None
+        )
+        if response is None or not 200 <= response.status_code < 300:
+            LOG.error(
+                f"## [{resource}] ({name}) is left UNPROTECTED on the destination, protect it by hand ##"
+            )
+        else:
+            LOG.warning(f"## [{resource}] ({name}) previous protection restored ##")
+
+    def replicate(
+        self, resource: str, source_project_id: str, destination_project_id: str
+    ):
+        """
+        Function to re-create the items of one resource type on the destination project,
+        skipping the ones it already has
+        @return: list of failures as (resource, name, reason) tuples
+        """
+        field = RESOURCES[resource]
+        source_items = self.fetch(
+            self.source_url(source_project_id, resource), self.api.head_token
+        )
+        if source_items is None:
+            LOG.warning(f"## [{resource}] Not available on the source, skipped ##")
+            return []
+        url = self.destination_url(destination_project_id, resource)
+        headers = self.api.destination_head_token
+        destination_items = {
+            item.get(field) if field else resource: item
+            for item in self.fetch(url, headers) or []
+        }
+
+        failures = []
+        created = 0
+        for item in source_items:
+            identity = item.get(field) if field else resource
+            name = str(item.get("title") or identity)
+            data = self.payload(resource, item)
+            if data is None:
+                continue
+            if resource == "push_rule":
+                method = "put" if destination_items else "post"
+            elif identity in destination_items:
+                if resource not in REPLACED_RESOURCES:
+                    LOG.info(f"## [{resource}] ({name}) already exists ##")
+                    continue
+                previous = self.payload(resource, destination_items[identity])
+                if previous == data:
+                    LOG.info(f"## [{resource}] ({name}) already matches ##")
+                    continue
+                response = self.api.session.delete(
+                    f"{url}/{urllib.parse.quote(str(identity), safe='')}",
+                    headers=headers,
+                )
+                if not 200 <= response.status_code < 300:
+                    # The previous protection is still in place, nothing to restore
+                    failures.append(
+                        (
+                            resource,
+                            name,
+                            f"Unable to remove the previous protection. Code: {response.status_code} | Text: {response.text}",
+                        )
+                    )
+                    continue
+                method = "post"
+            else:
+                method = "post"
+            LOG.info(f"## [{resource}] Creating ({name}) ##")
+            LOG.debug("## Details for %s: %s ##", name, data)
+            response = getattr(self.api.session, method)(
+                url, headers=headers, json=data
+            )
+            if not 200 <= response.status_code < 300:
+                failures.append(
+                    (
+                        resource,
+                        name,
+                        f"Code: {response.status_code} | Text: {response.text}",
+                    )
+                )
+                if resource in REPLACED_RESOURCES and identity in destination_items:
+                    self.restore(url, headers, resource, name, previous)
+                continue
+            created += 1
+            if resource == "hooks":
+                LOG.warning(
+                    f"## [hooks] ({name}) secret token cannot be read, set it again on the destination ##"
+                )
+            if resource == "pipeline_schedules":
+                failures += self.schedule_variables(
+                    source_project_id,
+                    dict(response.json(), source_id=item["id"]),
+                    url,
+                    headers,
+                )
+        LOG.info(f"## [{resource}] {created}/{len(source_items)} created ##")
+        return failures
+
+    def run(self, source_project_id: str, destination_project_id: str):
+        """
+        Function to replicate every resource type at the same time, as they do not
+        depend on each other
+        @return: list of failures as (resource, name, reason) tuples
+        """
+        LOG.info(
+            f"#### Replicating settings of project {source_project_id} to {destination_project_id} ####"
+        )
+        failures = []
+        with metrics.REGISTRY.phase("settings"):
+            for resource, future in gitlab.bounded_map(
+                lambda resource: self.replicate(
+                    resource, source_project_id, destination_project_id
+                ),
+                self.resources,
+                len(self.resources),
+            ):
+                try:
+                    failures += future.result()
+                except (Exception, SystemExit) as error:
+                    failures.append((resource, "*", repr(error)))
+        for resource, name, reason in failures:
+            LOG.error(f"## [{resource}] Failed to create ({name}) | {reason} ##")
+        return failures
@@ -0,0 +1,228 @@
+"""
+Python3 -- Class for slimming export archives between their download & their import
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import fnmatch
+import hashlib
+import logging
+import os
+import struct
+import sys
+import tarfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import transfer
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+DEFAULT_BLOCK_SIZE = 4 * transfer.MIB
+DEFAULT_COMPRESS_LEVEL = 6
+# Members an import cannot do without, kept whatever the patterns & threshold say
+KEPT_MEMBERS = ["VERSION", "project.json", "tree", "tree/*", "project.bundle"]
+SLIM_SUFFIX = ".slim"
+# Gzip header without a name nor time, deflate compression, unknown OS
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+
+def deflate_block(block: bytes, compress_level: int = DEFAULT_COMPRESS_LEVEL):
+    """
+    Function to compress a block as raw deflate on its own, ending on a byte boundary
+    without closing the stream, so that blocks can be concatenated
+    @return: bytes
+    """
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+class PARALLEL_GZIP:
+    """Write-only file object compressing fixed size blocks on many threads
+
+    Every block is deflated without the dictionary of the previous one (like pigz
+    --independent) & the blocks are written as a single gzip member, so that any gzip
+    reader, tarfile's "r|gz" & Gitlab's `tar -xzf` included, reads it. zlib releases
+    the GIL, so the blocks really are compressed in parallel.
+    """
+
+    def __init__(
+        self,
+        file_object,
+        threads: int = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        compress_level: int = DEFAULT_COMPRESS_LEVEL,
+    ) -> None:
+        """Initiate Parallel Gzip object, holding at most 2 blocks per thread in memory"""
+        self.file_object = file_object
+        self.threads = threads or os.cpu_count() or 1
+        self.block_size = block_size
+        self.compress_level = compress_level
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.threads, thread_name_prefix="gzip"
+        )
+        self.pending = []
+        self.buffer = bytearray()
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.crc = 0
+        self.length = 0
+        self.write_compressed(GZIP_HEADER)
+
+    def write(self, data: bytes):
+        """
+        Function to buffer uncompressed data, submitting every full block
+        @return: int, number of bytes written
+        """
+        self.crc = zlib.crc32(data, self.crc)
+        self.length += len(data)
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self.submit(bytes(self.buffer[: self.block_size]))
+            del self.buffer[: self.block_size]
+        return len(data)
+
+    def submit(self, block: bytes):
+        """
+        Function to compress a block in the background, writing the oldest compressed
+        blocks once too many are in flight
+        """
+        self.pending.append(
+            self.executor.submit(deflate_block, block, self.compress_level)
+        )
+        while len(self.pending) > self.threads * 2:
+            self.flush_block()
+
+    def flush_block(self):
+        """
+        Function to write the oldest compressed block, keeping the order of the blocks
+        """
+        self.write_compressed(self.pending.pop(0).result())
+
+    def write_compressed(self, compressed: bytes):
+        """
+        Function to write compressed bytes to the file, hashing them on the way
+        """
+        self.file_object.write(compressed)
+        self.digest.update(compressed)
+        self.size += len(compressed)
+
+    def close(self):
+        """
+        Function to write the remaining blocks, then the last (empty) deflate block &
+        the gzip trailer
+        """
+        if self.buffer:
+            self.submit(bytes(self.buffer))
+            self.buffer = bytearray()
+        while self.pending:
+            self.flush_block()
+        self.executor.shutdown()
+        # An empty final deflate block closes the stream the blocks left open
+        last_block = zlib.compressobj(
+            self.compress_level, zlib.DEFLATED, -zlib.MAX_WBITS
+        ).flush(zlib.Z_FINISH)
+        self.write_compressed(
+            last_block + struct.pack("<II", self.crc, self.length & 0xFFFFFFFF)
+        )
+
+
+class SLIM:
+    """Streaming rewrite of an export archive without the members we do not migrate"""
+
+    def __init__(
+        self,
+        patterns: list = None,
+        max_member_size: int = 0,
+        threads: int = None,
+        compress_level: int = DEFAULT_COMPRESS_LEVEL,
+        debug: bool = False,
+    ) -> None:
+        """
+        Initiate Slim object, dropping members matching `patterns` (fnmatch, e.g.
+        uploads/*) or bigger than `max_member_size` bytes (0: no threshold)
+        """
+        self.patterns = patterns or []
+        self.max_member_size = max_member_size
+        self.threads = threads
+        self.compress_level = compress_level
+        self.debug = debug
+
+    def dropped(self, member: tarfile.TarInfo):
+        """
+        Function to tell whether an archive member is left out of the slim archive
+        @return: boolean
+        """
+        name = member.name[2:] if member.name.startswith("./") else member.name
+        if any(fnmatch.fnmatch(name, pattern) for pattern in KEPT_MEMBERS):
+            return False
+        if any(fnmatch.fnmatch(name, pattern) for pattern in self.patterns):
+            return True
+        return bool(
+            self.max_member_size
+            and member.isfile()
+            and member.size > self.max_member_size
+        )
+
+    def copy(self, source, destination):
+        """
+        Function to copy the kept members of a tar.gz stream into a tar stream
+        @return: (members dropped, uncompressed bytes dropped) tuple
+        """
+        members, size = 0, 0
+        with tarfile.open(fileobj=source, mode="r|gz") as archive, tarfile.open(
+            fileobj=destination, mode="w|", format=tarfile.PAX_FORMAT
+        ) as slim_archive:
+            for member in archive:
+                if self.dropped(member):
+                    LOG.debug("## Dropping %s (%s bytes) ##", member.name, member.size)
+                    members += 1
+                    size += member.size
+                    continue
+                slim_archive.addfile(
+                    member, archive.extractfile(member) if member.isfile() else None
+                )
+        return members, size
+
+    def rewrite(self, file_path: str):
+        """
+        Function to rewrite an archive in place in one pass, member by member, so that
+        memory does not grow with the size of the archive
+        @return: {str} path of the archive
+        """
+        LOG.info(f"#### Slimming archive: {file_path} ####")
+        slim_path = file_path + SLIM_SUFFIX
+        original_size = os.path.getsize(file_path)
+        with metrics.REGISTRY.phase("slim"):
+            try:
+                with open(file_path, "rb") as source, open(slim_path, "wb") as f:
+                    compressor = PARALLEL_GZIP(
+                        f, self.threads, compress_level=self.compress_level
+                    )
+                    try:
+                        members, size = self.copy(source, compressor)
+                    finally:
+                        compressor.close()
+                    f.flush()
+                    os.fsync(f.fileno())
+            except BaseException:
+                os.remove(slim_path) if os.path.exists(slim_path) else None
+                raise
+            # A new file: hard links to the original, the export cache's, keep it whole
+            os.replace(slim_path, file_path)
+            transfer.write_checksum(file_path, compressor.digest.hexdigest())
+
+        saved = original_size - compressor.size
+        metrics.REGISTRY.count("slim_members_dropped_total", members)
+        metrics.REGISTRY.count("slim_bytes_saved_total", saved)
+        LOG.info(
+            f"## Dropped {members} members ({size / transfer.MIB:.1f} MiB uncompressed): "
+            f"{original_size / transfer.MIB:.1f} MiB -> {compressor.size / transfer.MIB:.1f} MiB, "
+            f"{saved / transfer.MIB:.1f} MiB saved ##"
+        )
+        return file_path
@@ -0,0 +1,138 @@
+"""
+Python3 -- Class for a local store of temporary access tokens
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+from datetime import date, timedelta
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+DEFAULT_STORE_PATH = os.path.join(
+    os.path.expanduser("~"), ".gitlab-migrator", "tokens.json"
+)
+DEFAULT_TOKEN_DAYS = 7
+DEFAULT_EXPIRY_MARGIN_DAYS = 1
+
+
+class TOKEN_STORE:
+    """Temporary project access tokens, kept in a file only readable by its owner"""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_STORE_PATH,
+        margin_days: int = DEFAULT_EXPIRY_MARGIN_DAYS,
+        debug: bool = False,
+    ) -> None:
+        """Initiate Token Store object"""
+        self.path = path
+        self.margin_days = margin_days
+        self.debug = debug
+        self.lock = threading.Lock()
+        self.tokens = self.load()
+
+    def load(self):
+        """
+        Function to read the stored tokens, refusing a file readable by other users
+        @return: dict of {key: token entry}
+        """
+        if not os.path.exists(self.path):
+            return {}
+        if os.stat(self.path).st_mode & 0o077:
+            LOG.error(
+                f"## Token store {self.path} is readable by other users, run: chmod 600 {self.path} ##"
+            )
+            sys.exit(1)
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self):
+        """
+        Function to atomically write the stored tokens with 0600 permissions
+        """
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        descriptor = os.open(
+            temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+        )
+        with os.fdopen(descriptor, "w") as f:
+            json.dump(self.tokens, f, indent=2, sort_keys=True)
+        os.replace(temporary_path, self.path)
+
+    @staticmethod
+    def key(server_url: str, project_id: str, token_name: str):
+        """
+        Function to build the key of a token
+        @return: str
+        """
+        return f"{server_url}|{project_id}|{token_name}"
+
+    def get(self, server_url: str, project_id: str, token_name: str):
+        """
+        Function to find a stored token that does not expire within the margin
+        @return: {dict} token entry, or None
+        """
+        with self.lock:
+            entry = self.tokens.get(self.key(server_url, project_id, token_name))
+        if entry is None:
+            return None
+        if date.fromisoformat(entry["expires_at"]) <= date.today() + timedelta(
+            days=self.margin_days
+        ):
+            LOG.info(f"## Stored '{token_name}' token is about to expire ##")
+            return None
+        return entry
+
+    def put(
+        self,
+        server_url: str,
+        project_id: str,
+        token_name: str,
+        token: str,
+        token_id: int,
+        expires_at: str,
+    ):
+        """
+        Function to store a freshly created token
+        """
+        with self.lock:
+            self.tokens[self.key(server_url, project_id, token_name)] = {
+                "server_url": server_url,
+                "project_id": str(project_id),
+                "token_name": token_name,
+                "token": token,
+                "token_id": token_id,
+                "expires_at": expires_at,
+            }
+            self.save()
+
+    def drop(self, server_url: str, project_id: str, token_name: str):
+        """
+        Function to forget a stored token that no longer works
+        """
+        with self.lock:
+            if self.tokens.pop(self.key(server_url, project_id, token_name), None):
+                self.save()
+
+    def pop(self, server_url: str):
+        """
+        Function to remove & return every stored token of a server
+        @return: list of token entries
+        """
+        with self.lock:
+            entries = [
+                self.tokens.pop(key)
+                for key, entry in list(self.tokens.items())
+                if entry["server_url"] == server_url
+            ]
+            self.save()
+        return entries
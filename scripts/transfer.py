@@ -0,0 +1,287 @@
+"""
+Python3 -- Helpers for large archive transfers
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import hashlib
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+
+import metrics
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+MIB = 1024 * 1024
+DEFAULT_CHUNK_SIZE = 4 * MIB
+DEFAULT_RETRIES = 5
+DEFAULT_RELAY_BUFFER = 64 * MIB
+DEFAULT_PROGRESS_INTERVAL = 10
+CHECKSUM_SUFFIX = ".sha256"
+
+
+class PROGRESS:
+    """Byte counter reporting the progress & throughput of a transfer"""
+
+    def __init__(
+        self,
+        usage: str,
+        total: int = None,
+        start: int = 0,
+        interval: float = DEFAULT_PROGRESS_INTERVAL,
+    ) -> None:
+        """Initiate Progress object"""
+        self.usage = usage
+        self.total = total
+        self.start = start
+        self.transferred = start
+        self.interval = interval
+        self.started_at = time.monotonic()
+        self.reported_at = self.started_at
+
+    def update(self, size: int):
+        """
+        Function to count `size` more bytes & report once every `interval` seconds
+        """
+        self.transferred += size
+        now = time.monotonic()
+        if now - self.reported_at >= self.interval:
+            self.reported_at = now
+            self.report()
+
+    def throughput(self):
+        """
+        Function to compute the average throughput of this transfer (resumed bytes excluded)
+        @return: float MiB/s
+        """
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        return (self.transferred - self.start) / MIB / elapsed
+
+    def report(self):
+        """
+        Function to log how far the transfer went
+        """
+        done = f"{self.transferred / MIB:.1f}"
+        if self.total:
+            done += (
+                f"/{self.total / MIB:.1f} MiB ({100 * self.transferred // self.total}%)"
+            )
+        else:
+            done += " MiB"
+        LOG.info(f"## {self.usage}: {done} at {self.throughput():.1f} MiB/s ##")
+
+    def close(self):
+        """
+        Function to log the final size & average throughput of the transfer
+        """
+        direction = self.usage.lower()
+        metrics.REGISTRY.count(
+            "transfer_bytes_total", self.transferred - self.start, direction=direction
+        )
+        metrics.REGISTRY.count(
+            "transfer_seconds_total",
+            time.monotonic() - self.started_at,
+            direction=direction,
+        )
+        LOG.info(
+            f"## {self.usage} complete: {self.transferred / MIB:.1f} MiB in {time.monotonic() - self.started_at:.1f} seconds ({self.throughput():.1f} MiB/s) ##"
+        )
+
+
+class MULTIPART:
+    """multipart/form-data body streamed from a file object in fixed-size chunks"""
+
+    def __init__(
+        self,
+        fields: dict,
+        file_field: str,
+        file_name: str,
+        file_object,
+        file_size: int = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        progress: PROGRESS = None,
+    ) -> None:
+        """Initiate Multipart object"""
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self.preamble = (
+            b"".join(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+                for name, value in fields.items()
+            )
+            + (
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{file_name}"\r\n'
+                "Content-Type: application/octet-stream\r\n\r\n"
+            ).encode()
+        )
+        self.epilogue = f"\r\n--{boundary}--\r\n".encode()
+        self.file_object = file_object
+        self.chunk_size = chunk_size
+        self.progress = progress
+        # `len` is what requests reads to send a Content-Length, chunked encoding otherwise
+        self.len = (
+            len(self.preamble) + file_size + len(self.epilogue)
+            if file_size is not None
+            else None
+        )
+
+    def rewind(self):
+        """
+        Function to restart the body from its first byte, when the file can seek
+        @return: boolean
+        """
+        if not (hasattr(self.file_object, "seekable") and self.file_object.seekable()):
+            return False
+        self.file_object.seek(0)
+        if self.progress:
+            self.progress.transferred = self.progress.start
+        return True
+
+    def __iter__(self):
+        """
+        Function to yield the body, never holding more than `chunk_size` bytes of the file
+        @return: generator of bytes
+        """
+        yield self.preamble
+        for chunk in iter(lambda: self.file_object.read(self.chunk_size), b""):
+            self.progress.update(len(chunk)) if self.progress else None
+            yield chunk
+        yield self.epilogue
+
+
+class RELAY:
+    """Bounded buffer piping the chunks of a download into an upload, without touching disk"""
+
+    def __init__(self, chunks, max_chunks: int) -> None:
+        """Initiate Relay object & start filling the buffer"""
+        self.buffer = queue.Queue(maxsize=max(max_chunks, 1))
+        self.digest = hashlib.sha256()
+        self.closed = threading.Event()
+        self.pending = b""
+        self.thread = threading.Thread(target=self.fill, args=(chunks,), daemon=True)
+        self.thread.start()
+
+    def put(self, item):
+        """
+        Function to wait for room in the buffer, unless the upload side went away
+        """
+        while not self.closed.is_set():
+            try:
+                self.buffer.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def fill(self, chunks):
+        """
+        Function run by the download thread, hashing every chunk it hands over
+        """
+        try:
+            for chunk in chunks:
+                self.digest.update(chunk)
+                self.put(chunk)
+            self.put(b"")
+        except Exception as error:
+            self.put(error)
+
+    def read(self, size: int = -1):
+        """
+        Function to hand the next downloaded bytes to the upload, b"" once the download is over
+        @return: bytes
+        """
+        if not self.pending:
+            item = self.buffer.get()
+            if isinstance(item, Exception):
+                raise item
+            self.pending = item
+        if size < 0:
+            size = len(self.pending)
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+    def close(self):
+        """
+        Function to release the download thread
+        """
+        self.closed.set()
+        self.thread.join()
+
+
+def write_checksum(file_path: str, checksum: str):
+    """
+    Function to store the SHA-256 of an archive next to it, in `sha256sum` format
+    """
+    with open(file_path + CHECKSUM_SUFFIX, "w") as f:
+        f.write(f"{checksum}  {os.path.basename(file_path)}\n")
+
+
+def read_checksum(file_path: str):
+    """
+    Function to read the SHA-256 stored next to an archive, without re-reading the archive
+    @return: {str} hex digest, or None if none was stored
+    """
+    try:
+        with open(file_path + CHECKSUM_SUFFIX) as f:
+            return f.read().split()[0]
+    except (OSError, IndexError):
+        return None
+
+
+def remove_archive(file_path: str):
+    """
+    Function to delete an archive & the SHA-256 stored next to it
+    """
+    for path in [file_path, file_path + CHECKSUM_SUFFIX]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def file_digest(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Function to hash (SHA-256) what a file holds so far
+    @return: hashlib digest, to be updated with the rest of the file
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest
+
+
+def download_validator(headers):
+    """
+    Function to read what tells one export archive from another, for `If-Range`: a
+    strong ETag, else Last-Modified
+    @return: str, or None if the server sent neither
+    """
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def content_range(headers):
+    """
+    Function to read the `Content-Range` header of a 206/416 answer
+    @return: (first byte or None, total size or None) tuple
+    """
+    match = re.fullmatch(
+        r"bytes (?:(\d+)-\d+|\*)/(\d+|\*)", headers.get("Content-Range") or ""
+    )
+    if not match:
+        return None, None
+    start, total = match.groups()
+    return (
+        int(start) if start is not None else None,
+        int(total) if total != "*" else None,
+    )
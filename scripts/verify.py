@@ -0,0 +1,192 @@
+"""
+Python3 -- Class for verifying migrated projects against their source
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import logging
+import os
+import sys
+
+import gitlab
+from session import base_url
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+DEFAULT_CONCURRENCY = 8
+FINGERPRINTS = ["branches", "tags", "statistics", "variables"]
+# Only warned about, as Gitlab refreshes the statistics of an import asynchronously:
+# exact match expected, sizes only have to be close as the destination repacks
+EXACT_STATISTICS = ["commit_count"]
+SIZE_STATISTICS = ["repository_size", "lfs_objects_size", "wiki_size"]
+SIZE_TOLERANCE = 0.1
+
+
+def fingerprints(variables: bool = True):
+    """
+    Function to list the fingerprints to verify, variables only if they were migrated
+    @return: list
+    """
+    return [
+        fingerprint
+        for fingerprint in FINGERPRINTS
+        if variables or fingerprint != "variables"
+    ]
+
+
+class VERIFY:
+    """Cheap fingerprints of source & destination projects, fetched & compared in parallel"""
+
+    def __init__(
+        self,
+        api: gitlab.API,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        debug: bool = False,
+        fingerprints: list = None,
+    ) -> None:
+        """Initiate Verify object, `api` holds the session & tokens of both servers"""
+        self.api = api
+        self.concurrency = concurrency
+        self.debug = debug
+        self.fingerprints = fingerprints or FINGERPRINTS
+
+    def fetch(self, side: str, project_id: str, fingerprint: str):
+        """
+        Function to fetch one fingerprint of a project
+        @return: dict, or None when it could not be fetched
+        """
+        if side == "source":
+            url = f"{base_url(self.api.server_url)}/api/v4/projects/{project_id}"
+            headers = self.api.head_token
+        else:
+            url = f"{base_url(self.api.destination_server_url)}/api/v4/projects/{project_id}"
+            headers = self.api.destination_head_token
+        if fingerprint == "statistics":
+            request = self.api.session.get(
+                url, headers=headers, params={"statistics": "true"}
+            )
+            if request.status_code != 200:
+                LOG.error(
+                    f"## Unable to fetch {side} project {project_id}. Code: {request.status_code} | Reason: {request.reason} ##"
+                )
+                return None
+            return request.json().get("statistics", {})
+        resource = {
+            "branches": "/repository/branches",
+            "tags": "/repository/tags",
+            "variables": "/variables",
+        }[fingerprint]
+        try:
+            if fingerprint == "variables":
+                return {
+                    f"{variable['key']} [{variable['environment_scope']}]": None
+                    for variable in self.api.session.paginate(
+                        url + resource, headers=headers
+                    )
+                }
+            return {
+                ref["name"]: ref["commit"]["id"]
+                for ref in self.api.session.paginate(url + resource, headers=headers)
+            }
+        except SystemExit:
+            # paginate already logged why the page could not be fetched
+            return None
+
+    def compare(self, source: dict, destination: dict):
+        """
+        Function to list the differences between the fingerprints of two projects
+        @return: list of str
+        """
+        differences = []
+        for fingerprint in self.fingerprints:
+            if source[fingerprint] is None or destination[fingerprint] is None:
+                differences.append(f"{fingerprint}: could not be fetched")
+        for fingerprint in ["branches", "tags", "variables"]:
+            if fingerprint not in self.fingerprints:
+                continue
+            source_refs = source[fingerprint] or {}
+            destination_refs = destination[fingerprint] or {}
+            for name in sorted(source_refs.keys() - destination_refs.keys()):
+                differences.append(f"{fingerprint}: missing {name}")
+            for name in sorted(destination_refs.keys() - source_refs.keys()):
+                differences.append(f"{fingerprint}: extra {name}")
+            for name in sorted(source_refs.keys() & destination_refs.keys()):
+                if source_refs[name] != destination_refs[name]:
+                    differences.append(
+                        f"{fingerprint}: {name} at {destination_refs[name]} instead of {source_refs[name]}"
+                    )
+        return differences
+
+    def compare_statistics(self, source: dict, destination: dict):
+        """
+        Function to list the differences between the statistics of two projects, which
+        Gitlab refreshes in the background, a while after an import
+        @return: list of str
+        """
+        if "statistics" not in self.fingerprints:
+            return []
+        source_statistics = source["statistics"] or {}
+        destination_statistics = destination["statistics"] or {}
+        mismatches = []
+        for field in EXACT_STATISTICS:
+            if source_statistics.get(field) != destination_statistics.get(field):
+                mismatches.append(
+                    f"statistics: {field} is {destination_statistics.get(field)} instead of {source_statistics.get(field)}"
+                )
+        for field in SIZE_STATISTICS:
+            expected = source_statistics.get(field) or 0
+            actual = destination_statistics.get(field) or 0
+            if abs(actual - expected) > expected * SIZE_TOLERANCE:
+                mismatches.append(
+                    f"statistics: {field} is {actual} bytes instead of about {expected}"
+                )
+        return mismatches
+
+    def run(self, pairs: list):
+        """
+        Function to verify (source_project_id, destination_project_id) pairs, fetching
+        every fingerprint of every project with at most `concurrency` calls in flight
+        @return: dict of {(source_project_id, destination_project_id): list of differences}
+        """
+        LOG.info(
+            f"#### Verifying {len(pairs)} projects with a concurrency of {self.concurrency} ####"
+        )
+        tasks = [
+            (pair, side, project_id, fingerprint)
+            for pair in pairs
+            for side, project_id in zip(["source", "destination"], pair)
+            for fingerprint in self.fingerprints
+        ]
+        fingerprints = {pair: {"source": {}, "destination": {}} for pair in pairs}
+        for (pair, side, project_id, fingerprint), future in gitlab.bounded_map(
+            lambda task: self.fetch(*task[1:]), tasks, self.concurrency
+        ):
+            fingerprints[pair][side][fingerprint] = future.result()
+
+        results = {}
+        for pair in pairs:
+            results[pair] = self.compare(
+                fingerprints[pair]["source"], fingerprints[pair]["destination"]
+            )
+            for mismatch in self.compare_statistics(
+                fingerprints[pair]["source"], fingerprints[pair]["destination"]
+            ):
+                LOG.warning(
+                    f"## Project {pair[0]} -> {pair[1]}: {mismatch} (may not be refreshed yet) ##"
+                )
+            if results[pair]:
+                LOG.error(
+                    f"## Project {pair[0]} -> {pair[1]}: {len(results[pair])} differences ##"
+                )
+                for difference in results[pair]:
+                    LOG.error(f"##   {difference} ##")
+            else:
+                LOG.info(f"## Project {pair[0]} -> {pair[1]}: verified ##")
+        LOG.info(
+            f"## {sum(1 for differences in results.values() if not differences)}/{len(pairs)} projects verified ##"
+        )
+        return results
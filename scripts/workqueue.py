@@ -0,0 +1,307 @@
+"""
+Python3 -- Class for a work queue shared by several runners, with expiring leases
+
+LOG readability (Info, Error, Debug):
+
+- #### ---> Start of a function
+- ## ---> LOG withing a function
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+__appname__ = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+LOG = logging.getLogger(__appname__)
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+# Heartbeats per lease, so that a late heartbeat or two does not lose it
+HEARTBEATS_PER_LEASE = 3
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    job TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    stages TEXT NOT NULL DEFAULT '{}',
+    updated_at REAL
+)
+"""
+
+
+class WORK_QUEUE:
+    """SQLite file on a shared volume, where runners claim jobs with expiring leases
+
+    A claim is only valid while its lease is renewed by heartbeats. A job whose
+    lease expired (its runner crashed) is claimed again by another runner; the
+    attempt number of a claim fences off the runner that lost it, whose heartbeats
+    & release then change nothing.
+
+    The queue is also the journal of the jobs it holds (get, record & reset, like
+    journal.JOURNAL): their stages are kept in the shared row, so that the runner
+    taking a job over re-attaches to its export or import instead of starting
+    again. Every journal call checks the claim, which stops a runner that lost it
+    at its next stage.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        worker_id: str = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        debug: bool = False,
+    ) -> None:
+        """Initiate Work Queue object, creating the queue file if needed"""
+        self.path = path
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.debug = debug
+        self.lock = threading.Lock()
+        # Attempt of every job this runner holds a claim on
+        self.claimed = {}
+        # Rollback journal rather than WAL, which needs shared memory network volumes lack
+        self.connection = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute(SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Function to run statements in a write transaction, taking the file lock up front
+        so that two runners never claim the same job
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def load(self, jobs: list):
+        """
+        Function to add jobs to the queue, skipping the ones already in it, so that
+        every runner may load the same manifest
+        @return: int, number of jobs added
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            added = sum(
+                connection.execute(
+                    "INSERT OR IGNORE INTO jobs (key, job, updated_at) VALUES (?, ?, ?)",
+                    (job["key"], json.dumps(job), now),
+                ).rowcount
+                for job in jobs
+            )
+        LOG.info(f"## {added}/{len(jobs)} jobs added to the queue {self.path} ##")
+        return added
+
+    def claim(self, count: int = 1):
+        """
+        Function to claim pending jobs, or jobs whose lease expired, giving up on the
+        ones that already expired `max_attempts` times
+        @return: list of job dicts, each with its `attempt`
+        """
+        now = time.time()
+        claimed = []
+        with self.transaction() as connection:
+            abandoned = connection.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? "
+                "WHERE status = 'claimed' AND lease_until < ? AND attempts >= ?",
+                (
+                    f"lease expired {self.max_attempts} times",
+                    now,
+                    now,
+                    self.max_attempts,
+                ),
+            ).rowcount
+            rows = connection.execute(
+                "SELECT key, job, status, worker, attempts FROM jobs "
+                "WHERE status = 'pending' OR (status = 'claimed' AND lease_until < ?) "
+                "ORDER BY rowid LIMIT ?",
+                (now, count),
+            ).fetchall()
+            for key, job, status, worker, attempts in rows:
+                connection.execute(
+                    "UPDATE jobs SET status = 'claimed', worker = ?, lease_until = ?, "
+                    "attempts = ?, updated_at = ? WHERE key = ?",
+                    (self.worker_id, now + self.lease_seconds, attempts + 1, now, key),
+                )
+                if status == "claimed":
+                    LOG.warning(
+                        f"## [{key}] Lease of {worker} expired, claiming it again ##"
+                    )
+                claimed.append(dict(json.loads(job), attempt=attempts + 1))
+                self.claimed[key] = attempts + 1
+        if abandoned:
+            LOG.error(
+                f"## {abandoned} jobs failed: their lease expired {self.max_attempts} times ##"
+            )
+        metrics.REGISTRY.count("queue_claims_total", len(claimed))
+        return claimed
+
+    def heartbeat(self, job: dict):
+        """
+        Function to extend the lease of a claimed job
+        @return: boolean, False if the lease was lost to another runner
+        """
+        with self.transaction() as connection:
+            renewed = connection.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? "
+                "WHERE key = ? AND worker = ? AND attempts = ? AND status = 'claimed'",
+                (
+                    time.time() + self.lease_seconds,
+                    time.time(),
+                    job["key"],
+                    self.worker_id,
+                    job["attempt"],
+                ),
+            ).rowcount
+        if not renewed:
+            self.claimed.pop(job["key"], None)
+            LOG.error(
+                f"## [{job['key']}] Lease lost to another runner, cancelling the job at its next stage ##"
+            )
+        return bool(renewed)
+
+    def release(self, job: dict, error: str = None):
+        """
+        Function to mark a claimed job as done, or failed with `error`
+        @return: boolean, False if the lease was lost to another runner
+        """
+        with self.transaction() as connection:
+            released = connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ? "
+                "WHERE key = ? AND worker = ? AND attempts = ? AND status = 'claimed'",
+                (
+                    "failed" if error else "done",
+                    error,
+                    time.time(),
+                    job["key"],
+                    self.worker_id,
+                    job["attempt"],
+                ),
+            ).rowcount
+        self.claimed.pop(job["key"], None)
+        if not released:
+            LOG.error(
+                f"## [{job['key']}] Lease lost to another runner, result not recorded ##"
+            )
+        return bool(released)
+
+    @contextmanager
+    def keep_alive(self, jobs: list):
+        """
+        Function to send heartbeats for `jobs` from a background thread while they run
+        """
+        stopped = threading.Event()
+
+        alive = list(jobs)
+
+        def beat():
+            while alive and not stopped.wait(self.lease_seconds / HEARTBEATS_PER_LEASE):
+                for job in list(alive):
+                    if not self.heartbeat(job):
+                        alive.remove(job)
+
+        thread = threading.Thread(target=beat, name="heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def stages(self, connection, key: str):
+        """
+        Function to read the stages of a job this runner still holds the claim on,
+        failing the job otherwise so that two runners never carry it on together
+        @return: dict of {stage: data}
+        """
+        attempt = self.claimed.get(key)
+        row = (
+            connection.execute(
+                "SELECT stages FROM jobs "
+                "WHERE key = ? AND worker = ? AND attempts = ? AND status = 'claimed'",
+                (key, self.worker_id, attempt),
+            ).fetchone()
+            if attempt
+            else None
+        )
+        if row is None:
+            self.claimed.pop(key, None)
+            LOG.error(f"## [{key}] Lease lost to another runner, cancelling the job ##")
+            sys.exit(1)
+        return json.loads(row[0])
+
+    def get(self, key: str, stage: str):
+        """
+        Function to find the data recorded when a job completed a stage, on any runner
+        @return: dict, or None if the stage was not completed
+        """
+        with self.lock:
+            return self.stages(self.connection, key).get(stage)
+
+    def update(self, key: str, function):
+        """
+        Function to change the stages of a claimed job with `function(stages)`
+        """
+        with self.transaction() as connection:
+            stages = self.stages(connection, key)
+            function(stages)
+            connection.execute(
+                "UPDATE jobs SET stages = ?, updated_at = ? WHERE key = ?",
+                (json.dumps(stages), time.time(), key),
+            )
+
+    def record(self, key: str, stage: str, **data):
+        """
+        Function to record in the shared row that a job completed a stage
+        """
+        self.update(key, lambda stages: stages.update({stage: data}))
+        LOG.debug("## [%s] Queue: %s %s ##", key, stage, data)
+
+    def reset(self, key: str, stages: list):
+        """
+        Function to forget stages of a job that have to be run again
+        """
+
+        def forget(recorded: dict):
+            for stage in stages:
+                recorded.pop(stage, None)
+
+        self.update(key, forget)
+
+    def summary(self):
+        """
+        Function to count the jobs of the queue by status
+        @return: dict of {status: count}
+        """
+        with self.lock:
+            return dict(
+                self.connection.execute(
+                    "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+                ).fetchall()
+            )
+
+    def close(self):
+        """
+        Function to close the connection to the queue file
+        """
+        self.connection.close()